@@ -1,19 +1,161 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import (Flask, Response, has_request_context, make_response, render_template,
+                   request, jsonify, session, stream_with_context)
 import player_connections as pc
+import jobs
+import metrics
+import slow_query_log
 import os
 import time
+import threading
 import json
-import networkx as nx
+import gzip
+import zlib
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; clients then get gzip
+    brotli = None
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # Required for session
 
-# Global variables to store graph and player index
-G = None
-player_index = None
-name_to_id_map = {}
-all_player_names = []
-normalized_name_map = {}
+# Per-endpoint limits for path searches: time_limit in seconds, max_expansions
+# in nodes expanded. None disables a limit. When a budget runs out the endpoint
+# returns the paths found so far with "truncated": true.
+app.config['PATH_BUDGETS'] = {
+    'find_connection': {'time_limit': 2.0, 'max_expansions': 500000},
+    'trace_players': {'time_limit': 5.0, 'max_expansions': 2000000},
+}
+
+# JSON responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 500
+
+# Background analytics jobs: worker processes and the on-disk result cache
+app.config['JOB_WORKERS'] = 2
+app.config['JOB_MAX_QUEUED'] = 100
+app.config['JOB_CACHE_DIR'] = 'job_cache'
+app.config['JOB_RECORD_TTL'] = 24 * 3600  # Seconds to keep finished job records
+
+# Graph snapshot served by the app, and how often to check it for changes
+# (seconds; 0 disables the watcher). ADMIN_TOKEN protects /api/admin/reload;
+# without one, reloads are only accepted from localhost.
+app.config['GRAPH_FILE'] = 'player_graph.gml'
+app.config['RELOAD_POLL_INTERVAL'] = 5
+app.config['ADMIN_TOKEN'] = os.environ.get('FOOTBALL_LINKS_ADMIN_TOKEN')
+
+# Path searches slower than SLOW_QUERY_MS are written to SLOW_QUERY_LOG (empty
+# disables it). SLOW_QUERY_PROFILE_RATE of searches run under cProfile, and
+# the profile is attached to the entry if the search turns out slow.
+app.config['SLOW_QUERY_LOG'] = os.environ.get('FOOTBALL_LINKS_SLOW_QUERY_LOG', 'logs/slow_queries.jsonl')
+app.config['SLOW_QUERY_MS'] = 500
+app.config['SLOW_QUERY_PROFILE_RATE'] = 0.0
+
+class GraphState:
+    """
+    A loaded graph together with everything derived from it
+    
+    A state is never modified once it is live. Reloading builds a complete new
+    state and swaps it in with a single assignment. Each request pins the
+    state it started with (see current_state), so in-flight requests finish
+    against the old graph. Anything cached per graph is keyed by version.
+    
+    The name indexes are built separately from the graph
+    (build_indexes), so startup can serve ID-based requests while they warm
+    up; reading an index attribute blocks until the indexes are ready.
+    """
+    
+    def __init__(self, G, version, source, timings=None):
+        self.G = G
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+        self.timings = dict(timings or {})
+        self.index_error = None
+        self._indexes_ready = threading.Event()
+        # Public player IDs (UUIDs) to node IDs; built eagerly, since requests
+        # by player ID are served before the name indexes are ready
+        self.node_by_uuid = pc.build_uuid_index(G)
+    
+    def build_indexes(self):
+        """Build the player name indexes, recording how long each stage took"""
+        try:
+            # Build player index
+            stage_start = time.time()
+            self._player_index = pc.build_player_index(self.G)
+            
+            # Create a list of all player names for autocomplete
+            self._all_player_names = sorted(self._player_index['exact'].keys())
+            self._name_to_id_map = self._player_index['exact']
+            log_stage(self, 'player_index', stage_start)
+            
+            # Create a normalized name map for better matching
+            stage_start = time.time()
+            self._normalized_name_map = pc.build_normalized_name_map(self._name_to_id_map)
+            log_stage(self, 'normalized_name_map', stage_start)
+        except Exception as e:
+            self.index_error = str(e)
+            print(f"Building indexes for graph version {self.version} failed: {e}")
+        finally:
+            self._indexes_ready.set()
+    
+    def start_index_build(self):
+        """Build the indexes in a background thread"""
+        threading.Thread(target=self.build_indexes, name='index-build', daemon=True).start()
+    
+    @property
+    def indexes_ready(self):
+        return self._indexes_ready.is_set() and self.index_error is None
+    
+    def wait_for_indexes(self):
+        self._indexes_ready.wait()
+        if self.index_error:
+            raise RuntimeError(f"Player indexes unavailable: {self.index_error}")
+    
+    @property
+    def player_index(self):
+        self.wait_for_indexes()
+        return self._player_index
+    
+    @property
+    def all_player_names(self):
+        self.wait_for_indexes()
+        return self._all_player_names
+    
+    @property
+    def name_to_id_map(self):
+        self.wait_for_indexes()
+        return self._name_to_id_map
+    
+    @property
+    def normalized_name_map(self):
+        self.wait_for_indexes()
+        return self._normalized_name_map
+
+def log_stage(state, stage, stage_start):
+    """Record and print how long a loading stage took"""
+    state.timings[stage] = round(time.time() - stage_start, 3)
+    print(f"Stage {stage}: {state.timings[stage]:.2f} seconds")
+
+# The live GraphState, replaced wholesale on reload
+live_state = None
+reload_lock = threading.Lock()
+reload_status = {"reloading": False, "last_error": None, "last_reload": None}
+
+# Set by serve.py. Under the pre-fork server the parent process reloads the
+# graph and re-forks the workers, so a worker hands reload requests (the
+# snapshot path, or None for GRAPH_FILE) to this hook instead of reloading
+# on its own.
+reload_hook = None
+
+# Job managers by graph version. Job records live on disk (see jobs.read_job),
+# so any process can answer for a job, not only the one running it.
+job_managers = {}
+job_managers_lock = threading.Lock()
+
+# Created on first use from the SLOW_QUERY_* settings
+slow_log = None
+slow_log_lock = threading.Lock()
 
 @app.route('/')
 def index():
@@ -21,211 +163,164 @@ def index():
 
 @app.route('/api/players', methods=['GET'])
 def get_players():
+    state = current_state()
     query = request.args.get('q', '').lower()
     if not query or len(query) < 2:
         return jsonify([])
     
-    # Search for players matching the query
+    # Search for players matching the query. Each match carries the player's
+    # graph ID so the client can send it straight back to find_connection;
+    # nothing is written to the session.
     matches = []
-    player_info = {}
-    
-    # First find exact matches by name
-    for name in all_player_names:
-        name_lower = name.lower()
-        if query in name_lower:
-            player_id = name_to_id_map[name]
-            # Get player teams by checking ALL edges (incoming and outgoing)
-            teams = set()
-            years = set()
-            
-            if player_id in G:
-                # Check both outgoing and incoming edges for complete team info
-                for edge in list(G.edges(player_id)) + list(G.in_edges(player_id)):
-                    # For outgoing edges: edge = (player_id, neighbor)
-                    # For incoming edges: edge = (neighbor, player_id)
-                    if edge[0] == player_id:
-                        p1, p2 = edge
-                    else:
-                        p2, p1 = edge
-                        
-                    edge_data = G.get_edge_data(p1, p2)
-                    try:
-                        # Extract team/season info from edge data
-                        connections = json.loads(edge_data.get('details', '[]'))
-                        for conn in connections:
-                            if '|' in conn:
-                                season, team = conn.split('|', 1)
-                                # Log any Real Madrid connections for debugging
-                                if 'madrid' in team.lower() and 'benzema' in name_lower:
-                                    print(f"Found Real Madrid connection for {name}: {season}, {team}")
-                                teams.add(team)
-                                # Extract just the first year for compactness
-                                if '-' in season:
-                                    year = season.split('-')[0]
-                                    years.add(year)
-                    except Exception as e:
-                        print(f"Error extracting team data: {str(e)}")
-                        continue
-            
-            # Format team and year info
-            team_info = ""
-            if teams:
-                top_teams = sorted(list(teams))[:3]  # Show up to 3 teams instead of 2
-                team_info = f" - {', '.join(top_teams)}"
-                if len(teams) > 3:
-                    team_info += f" & {len(teams)-3} more"
-            
-            year_info = ""
-            if years:
-                year_range = f"{min(years)}-{max(years)}"
-                year_info = f" ({year_range})"
-            
-            # Create display name with context
-            display_name = f"{name}{team_info}{year_info}"
-            
-            # Store mapping from display name to original name
-            player_info[display_name] = name
-            
-            matches.append(display_name)
+    for name in state.all_player_names:
+        if query in name.lower():
+            player_id = state.name_to_id_map[name]
+            display_name = player_display_name(player_id, name)
+            matches.append({
+                "id": pc.player_uuid(state.G, player_id),
+                "label": display_name,
+                "value": display_name
+            })
             if len(matches) >= 10:  # Limit to 10 matches for performance
                 break
     
-    # Also store the mapping in the session for later use
-    if 'player_display_to_name' not in session:
-        session['player_display_to_name'] = {}
-    
-    session['player_display_to_name'].update(player_info)
-    
     return jsonify(matches)
 
+def player_display_name(player_id, name):
+    """Build the autocomplete label, formatted as Player Name - Team1, Team2 (2010-2015)"""
+    state = current_state()
+    teams = set()
+    years = set()
+    
+    for number in state.G.player_seasons(player_id).tolist():
+        season, team = state.G.team_seasons[number]
+        teams.add(team)
+        # Extract just the first year for compactness
+        if '-' in season:
+            years.add(season.split('-')[0])
+    
+    # Format team and year info
+    team_info = ""
+    if teams:
+        top_teams = sorted(list(teams))[:3]  # Show up to 3 teams instead of 2
+        team_info = f" - {', '.join(top_teams)}"
+        if len(teams) > 3:
+            team_info += f" & {len(teams)-3} more"
+    
+    year_info = ""
+    if years:
+        year_range = f"{min(years)}-{max(years)}"
+        year_info = f" ({year_range})"
+    
+    return f"{name}{team_info}{year_info}"
+
 @app.route('/api/find_connection', methods=['POST'])
 def find_connection():
-    data = request.get_json()
-    player1_display = data.get('player1', '')
-    player2_display = data.get('player2', '')
-    
-    if not player1_display or not player2_display:
-        return jsonify({"error": "Both player names are required"}), 400
-    
-    # Handle enhanced display names by extracting the actual name
-    # For display names like "Player Name - Team1, Team2 (2010-2015)"
-    player1 = extract_player_name(player1_display)
-    player2 = extract_player_name(player2_display)
-    
-    # Log the search attempt
-    print(f"Searching for connection between '{player1}' and '{player2}'")
-    
-    # Special case handling for known problematic players
-    if is_arteta_ozil_benzema_case(player1, player2):
-        return handle_arteta_ozil_benzema_case(player1, player2)
-    
-    # Try to find exact matches first
-    player1_id = player_id_from_name(player1)
-    player2_id = player_id_from_name(player2)
-    
-    # If exact match fails, try more flexible matching
-    if not player1_id:
-        player1_id, player1_name = fuzzy_match_player(player1)
-        if player1_id:
-            print(f"Fuzzy matched '{player1}' to '{player1_name}'")
-    
-    if not player2_id:
-        player2_id, player2_name = fuzzy_match_player(player2)
-        if player2_id:
-            print(f"Fuzzy matched '{player2}' to '{player2_name}'")
-    
-    # If we still don't have matches, report the issue
-    if not player1_id:
-        return jsonify({"success": False, "error": f"Player not found: {player1}"}), 200
-    
-    if not player2_id:
-        return jsonify({"success": False, "error": f"Player not found: {player2}"}), 200
+    data = request.get_json() or {}
+    return connection_response(data, compact=data.get('format') == 'compact')
+
+@app.route('/api/connection', methods=['GET'])
+def get_connection():
+    """
+    Cacheable GET form of find_connection
+    
+    Takes the same fields as query arguments, plus format=compact. Answers carry
+    a weak ETag derived from the graph version and the query, so a repeat
+    request with If-None-Match gets 304 Not Modified without searching again.
+    """
+    etag = connection_etag(request.args)
+    if request.if_none_match.contains_weak(etag):
+        metrics.inc('cache_hits_total', cache='etag')
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    metrics.inc('cache_misses_total', cache='etag')
+    response = make_response(connection_response(request.args, compact=request.args.get('format') == 'compact'))
+    payload = response.get_json(silent=True) or {}
+    # Searches cut short by the budget depend on load, so never let them be reused
+    if response.status_code == 200 and not payload.get('truncated'):
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def connection_etag(args):
+    """ETag value for a connection query: same graph and same query give the same answer"""
+    state = current_state()
+    query = "&".join(f"{key}={value}" for key, value in sorted(args.items(multi=True)))
+    return hashlib.sha1(f"{state.version}?{query}".encode()).hexdigest()[:20]
+
+def connection_response(data, compact=False):
+    """Find the shortest paths for a find_connection request and build the JSON reply"""
+    with track_query('find_connection') as query:
+        return search_connection(data, compact, query)
+
+def search_connection(data, compact, query):
+    """Body of connection_response; search details are recorded on query for the slow-query log"""
+    state = current_state()
+    query.record(player1=data.get('player1'), player2=data.get('player2'))
+    with metrics.stage('name_resolution'):
+        player1_id, player2_id, response = resolve_connection_players(data)
+    if response is not None:
+        return response
+    query.record(player1_id=pc.player_uuid(state.G, player1_id), player2_id=pc.player_uuid(state.G, player2_id))
     
     # Find path between players with more diagnostics
     print(f"Searching for path between player IDs: {player1_id} and {player2_id}")
     
     try:
         # Get the actual names from the IDs for display
-        player1_name = G.nodes[player1_id].get('name', player1)
-        player2_name = G.nodes[player2_id].get('name', player2)
+        player1_name = state.G.name(player1_id, player1_id)
+        player2_name = state.G.name(player2_id, player2_id)
         
         # Check if nodes exist in the graph
-        if player1_id not in G:
+        if player1_id not in state.G:
             return jsonify({"success": False, "error": f"Player not found in graph: {player1_name}"}), 200
-        if player2_id not in G:
+        if player2_id not in state.G:
             return jsonify({"success": False, "error": f"Player not found in graph: {player2_name}"}), 200
             
-        # Check if path exists by trying to find shortest path length
-        if not nx.has_path(G, player1_id, player2_id):
+        # Find the shortest paths within this endpoint's compute budget
+        result = pc.find_shortest_paths(state.G, player1_id, player2_id, max_paths=5,
+                                        budget=path_budget('find_connection'))
+        query.record(distance=result['distance'], paths=len(result['paths']),
+                     nodes_expanded=result['nodes_expanded'], truncated=result['truncated'])
+        
+        if result['distance'] is None:
+            if result['truncated']:
+                return jsonify({
+                    "success": False,
+                    "truncated": True,
+                    "error": f"Search between {player1_name} and {player2_name} took too long and was stopped"
+                }), 200
             return jsonify({
                 "success": False, 
                 "error": f"No connection found between {player1_name} and {player2_name}"
             }), 200
         
-        # Try to find all shortest paths
-        path_length = nx.shortest_path_length(G, source=player1_id, target=player2_id)
-        all_paths = []
-        
-        print(f"Found path length: {path_length}")
+        print(f"Found path length: {result['distance']}")
         
-        # Find all simple paths of the shortest length (up to a reasonable limit)
-        for path in nx.all_simple_paths(G, source=player1_id, target=player2_id, cutoff=path_length):
-            if len(path) - 1 == path_length:  # Confirm it's a shortest path
-                all_paths.append(path)
-                if len(all_paths) >= 5:  # Limit to 5 paths to prevent excessive computation
-                    break
-        
-        if not all_paths:
-            # This should not happen if shortest_path_length succeeded
+        if not result['paths']:
+            # Only possible if the budget ran out before the first path was built
             return jsonify({
                 "success": False, 
+                "truncated": result['truncated'],
                 "error": f"No valid paths found between {player1_name} and {player2_name}"
             }), 200
         
-        # Format the paths
-        formatted_paths = []
-        for path in all_paths:
-            path_nodes = []
-            for i in range(len(path)):
-                player_id = path[i]
-                player_name = G.nodes[player_id].get('name', player_id)
-                path_nodes.append({"id": str(player_id), "name": player_name})
-            
-            # Format connections
-            connections = []
-            for i in range(len(path)-1):
-                p1, p2 = path[i], path[i+1]
-                edge_data = G.get_edge_data(p1, p2)
-                try:
-                    connection_info_str = edge_data.get('details', '[]')
-                    connection_info = json.loads(connection_info_str)
-                except:
-                    connection_info = []
-                
-                parsed_connections = []
-                for conn in connection_info:
-                    try:
-                        season, team = conn.split('|', 1)
-                        parsed_connections.append({"season": season, "team": team})
-                    except:
-                        continue
-                
-                connections.append({
-                    "from": path_nodes[i]["name"],
-                    "to": path_nodes[i+1]["name"],
-                    "details": parsed_connections
-                })
-            
-            formatted_paths.append({
-                "nodes": path_nodes,
-                "connections": connections,
-                "length": len(path) - 1
-            })
-        
-        return jsonify({
-            "success": True,
-            "paths": formatted_paths
-        })
+        with metrics.stage('json_formatting'):
+            payload = {
+                "success": True,
+                "distance": result['distance'],
+                "truncated": result['truncated'],
+            }
+            if compact:
+                encoder = CompactPathEncoder(state.G)
+                payload["format"] = "compact"
+                payload["paths"] = [encoder.encode(path) for path in result['paths']]
+                payload["players"], payload["teams"] = encoder.take_new_entries()
+            else:
+                payload["paths"] = [format_path(path) for path in result['paths']]
+            return jsonify(payload)
         
     except Exception as e:
         print(f"Error finding connection: {str(e)}")
@@ -236,45 +331,362 @@ def find_connection():
             "error": f"Error finding connection: {str(e)}"
         }), 200
 
-def player_id_from_name(name):
-    """Get player ID from exact name match"""
-    if name in name_to_id_map:
-        return name_to_id_map[name]
+@app.route('/api/find_connection/stream', methods=['POST'])
+def find_connection_stream():
+    """
+    Streaming variant of find_connection that returns newline-delimited JSON
+    
+    The first line carries the distance as soon as the BFS finishes, then each
+    path is sent on its own line as soon as it is enumerated. A final line
+    reports how many paths were sent and whether the budget cut the search short.
+    
+    With "format": "compact" each path line carries index arrays plus only the
+    player and team-season table entries not sent on an earlier line.
+    """
+    state = current_state()
+    data = request.get_json() or {}
+    # Tracked until the last line is sent, since the search runs while streaming
+    query = track_query('find_connection_stream').start()
+    try:
+        query.record(player1=data.get('player1'), player2=data.get('player2'))
+        with metrics.stage('name_resolution'):
+            player1_id, player2_id, response = resolve_connection_players(data)
+        if response is not None:
+            query.finish()
+            response, status = response if isinstance(response, tuple) else (response, 200)
+            if status != 200:
+                return response, status
+            return ndjson_response(ndjson_messages_from_payload(response.get_json()))
+        
+        print(f"Streaming paths between player IDs: {player1_id} and {player2_id}")
+        player1_name = state.G.name(player1_id, player1_id)
+        player2_name = state.G.name(player2_id, player2_id)
+        encoder = CompactPathEncoder(state.G) if data.get('format') == 'compact' else None
+        query.record(player1_id=pc.player_uuid(state.G, player1_id), player2_id=pc.player_uuid(state.G, player2_id))
+        
+        def messages():
+            budget = path_budget('find_connection')
+            try:
+                yield from stream_paths(budget)
+            finally:
+                query.record(nodes_expanded=budget.expansions, truncated=budget.exhausted)
+                query.finish()
+        
+        def stream_paths(budget):
+            distance, paths = pc.search_shortest_paths(state.G, player1_id, player2_id, budget)
+            query.record(distance=distance)
+        
+            if distance is None:
+                if budget.exhausted:
+                    error = f"Search between {player1_name} and {player2_name} took too long and was stopped"
+                else:
+                    error = f"No connection found between {player1_name} and {player2_name}"
+                yield {"type": "error", "error": error, "truncated": budget.exhausted}
+                return
+        
+            yield {"type": "distance", "distance": distance}
+        
+            count = 0
+            while count < 5:  # Same limit as find_connection
+                with metrics.stage('path_enumeration'):
+                    path = next(paths, None)
+                if path is None:
+                    break
+                with metrics.stage('json_formatting'):
+                    if encoder:
+                        encoded = encoder.encode(path)
+                        players, teams = encoder.take_new_entries()
+                        message = {"type": "path", "index": count, "players": players, "teams": teams, "path": encoded}
+                    else:
+                        message = {"type": "path", "index": count, "path": format_path(path)}
+                yield message
+                count += 1
+            metrics.inc('paths_enumerated_total', count)
+            query.record(paths=count)
+        
+            yield {"type": "done", "paths": count, "truncated": budget.exhausted}
+        
+        response = ndjson_response(messages())
+    except BaseException:
+        # No response will stream, so nothing else would finish the query
+        # (and release the profiler if this one was sampled)
+        query.finish()
+        raise
+    # Also covers a client that disconnects before the stream starts
+    response.call_on_close(query.finish)
+    return response
+
+def ndjson_response(messages):
+    """Stream an iterable of dicts as newline-delimited JSON, compressed if the client allows"""
+    encoding = choose_encoding()
+    
+    def generate():
+        for message in messages:
+            yield (json.dumps(message) + "\n").encode()
+    
+    chunks = generate() if encoding is None else compress_stream(generate(), encoding)
+    response = Response(stream_with_context(chunks), mimetype='application/x-ndjson')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    return response
+
+def ndjson_messages_from_payload(payload):
+    """Convert a complete find_connection JSON payload into stream messages"""
+    if not payload.get('success'):
+        return [{"type": "error", "error": payload.get('error'), "truncated": payload.get('truncated', False)}]
+    
+    paths = payload.get('paths', [])
+    messages = [{"type": "distance", "distance": paths[0]['length'] if paths else None}]
+    messages.extend({"type": "path", "index": i, "path": path} for i, path in enumerate(paths))
+    messages.append({"type": "done", "paths": len(paths), "truncated": payload.get('truncated', False)})
+    return messages
+
+class CompactPathEncoder:
+    """
+    Dictionary-encodes paths for the compact response format
+    
+    Each player and each (season, team) is listed once in a table, and paths
+    refer to them by index:
+        players: [[id, name], ...]
+        teams:   [[season, team], ...]
+        path:    {"players": [player index, ...], "links": [[team index, ...] per link]}
+    Tables grow as paths are encoded; take_new_entries() returns the entries
+    added since it was last called, so a stream only sends each entry once.
+    """
+    
+    def __init__(self, G):
+        self.G = G
+        self.player_index = {}
+        self.team_index = {}
+        self.new_players = []
+        self.new_teams = []
+    
+    def _player(self, player_id):
+        index = self.player_index.get(player_id)
+        if index is None:
+            index = self.player_index[player_id] = len(self.player_index)
+            self.new_players.append([pc.player_uuid(self.G, player_id), self.G.name(player_id, player_id)])
+        return index
+    
+    def _team(self, season, team):
+        key = (season, team)
+        index = self.team_index.get(key)
+        if index is None:
+            index = self.team_index[key] = len(self.team_index)
+            self.new_teams.append([season, team])
+        return index
+    
+    def encode(self, path):
+        return {
+            "players": [self._player(player_id) for player_id in path],
+            "links": [[self._team(season, team) for season, team in connection_details(p1, p2)]
+                      for p1, p2 in zip(path, path[1:])]
+        }
+    
+    def take_new_entries(self):
+        players, teams = self.new_players, self.new_teams
+        self.new_players, self.new_teams = [], []
+        return players, teams
+
+def choose_encoding():
+    """Pick the best response compression the client accepts: br, gzip or None"""
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
     return None
 
-def normalize_name(name):
-    """Normalize player names by removing accents and special characters"""
-    # Common character replacements
-    replacements = {
-        'ö': 'o', 'ó': 'o', 'ò': 'o', 'ô': 'o', 'õ': 'o',
-        'ä': 'a', 'á': 'a', 'à': 'a', 'â': 'a', 'ã': 'a',
-        'ë': 'e', 'é': 'e', 'è': 'e', 'ê': 'e',
-        'ï': 'i', 'í': 'i', 'ì': 'i', 'î': 'i',
-        'ü': 'u', 'ú': 'u', 'ù': 'u', 'û': 'u',
-        'ñ': 'n', 'ç': 'c'
-    }
+def compress_stream(chunks, encoding):
+    """Compress a stream chunk by chunk, flushing after each so lines arrive immediately"""
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+@app.before_request
+def start_request_metrics():
+    request.environ['football_links.metrics'] = metrics.start_request()
+
+@app.after_request
+def finish_request_metrics(response):
+    """Record latency and per-stage timings once the response body has been sent"""
+    record = request.environ.get('football_links.metrics')
+    if record is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method, status = request.method, response.status_code
+        # Streamed bodies are generated after this hook returns, so wait for close
+        response.call_on_close(lambda: metrics.finish_request(record, route, method, status))
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Counters and latency histograms in the Prometheus text format"""
+    if not metrics.ENABLED:
+        return Response("Metrics are disabled; set FOOTBALL_LINKS_METRICS=1 to enable them\n",
+                        status=404, mimetype='text/plain')
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.after_request
+def compress_response(response):
+    """Gzip/Brotli-compress JSON responses that are worth compressing"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300):
+        return response
+    
+    data = response.get_data()
+    encoding = choose_encoding() if len(data) >= COMPRESS_MIN_SIZE else None
+    if encoding is None:
+        return response
+    
+    response.set_data(brotli.compress(data) if encoding == 'br' else gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def resolve_connection_players(data):
+    """
+    Resolve the two players in a find_connection request body to graph IDs
+    
+    Returns (player1_id, player2_id, None) on success, or (None, None, response)
+    where response should be sent back as-is: a validation error, a "player
+    not found" message or the special-case answer for known problem players.
+    """
+    state = current_state()
+    player1_display = data.get('player1', '')
+    player2_display = data.get('player2', '')
     
-    result = name.lower()
-    for special, replacement in replacements.items():
-        result = result.replace(special, replacement)
+    # Autocomplete selections send the player's graph ID along with the label
+    player1_id = lookup_player_id(data.get('player1_id'))
+    player2_id = lookup_player_id(data.get('player2_id'))
+    
+    if not (player1_id or player1_display) or not (player2_id or player2_display):
+        return None, None, (jsonify({"error": "Both player names are required"}), 400)
+    
+    # Without an ID, handle enhanced display names by extracting the actual name
+    # For display names like "Player Name - Team1, Team2 (2010-2015)"
+    player1 = state.G.name(player1_id, player1_display) if player1_id else extract_player_name(player1_display)
+    player2 = state.G.name(player2_id, player2_display) if player2_id else extract_player_name(player2_display)
+    
+    # Log the search attempt
+    print(f"Searching for connection between '{player1}' and '{player2}'")
     
-    return result
+    # Special case handling for known problematic players
+    if is_arteta_ozil_benzema_case(player1, player2):
+        return None, None, handle_arteta_ozil_benzema_case(player1, player2)
+    
+    # Try to find exact matches first
+    if not player1_id:
+        player1_id = player_id_from_name(player1)
+    if not player2_id:
+        player2_id = player_id_from_name(player2)
+    
+    # If exact match fails, try more flexible matching
+    if not player1_id:
+        player1_id, player1_name = fuzzy_match_player(player1)
+        if player1_id:
+            print(f"Fuzzy matched '{player1}' to '{player1_name}'")
+    
+    if not player2_id:
+        player2_id, player2_name = fuzzy_match_player(player2)
+        if player2_id:
+            print(f"Fuzzy matched '{player2}' to '{player2_name}'")
+    
+    # If we still don't have matches, report the issue
+    if not player1_id:
+        return None, None, (jsonify({"success": False, "error": f"Player not found: {player1}"}), 200)
+    
+    if not player2_id:
+        return None, None, (jsonify({"success": False, "error": f"Player not found: {player2}"}), 200)
+    
+    return player1_id, player2_id, None
+
+def get_slow_query_log():
+    """The slow-query log configured for this app, or None if disabled"""
+    global slow_log
+    if slow_log is None and app.config['SLOW_QUERY_LOG']:
+        with slow_log_lock:
+            if slow_log is None:
+                slow_log = slow_query_log.SlowQueryLog(app.config['SLOW_QUERY_LOG'],
+                                                       threshold_ms=app.config['SLOW_QUERY_MS'],
+                                                       profile_rate=app.config['SLOW_QUERY_PROFILE_RATE'])
+    return slow_log
+
+def track_query(endpoint):
+    """Start tracking a path search for the slow-query log"""
+    return slow_query_log.TrackedQuery(get_slow_query_log(), endpoint)
+
+def path_budget(endpoint):
+    """Create a fresh SearchBudget from the limits configured for an endpoint"""
+    limits = app.config['PATH_BUDGETS'].get(endpoint, {})
+    return pc.SearchBudget(**limits)
+
+def connection_details(p1, p2):
+    """List the (season, team) pairs where two connected players played together"""
+    return current_state().G.shared_team_seasons(p1, p2)
+
+def format_path(path):
+    """Format a path of player IDs as nodes plus the team/seasons shared at each link"""
+    state = current_state()
+    path_nodes = []
+    for player_id in path:
+        player_name = state.G.name(player_id, player_id)
+        path_nodes.append({"id": pc.player_uuid(state.G, player_id), "name": player_name})
+    
+    # Format connections
+    connections = []
+    for i in range(len(path)-1):
+        connections.append({
+            "from": path_nodes[i]["name"],
+            "to": path_nodes[i+1]["name"],
+            "details": [{"season": season, "team": team}
+                        for season, team in connection_details(path[i], path[i+1])]
+        })
+    
+    return {
+        "nodes": path_nodes,
+        "connections": connections,
+        "length": len(path) - 1
+    }
+
+def lookup_player_id(player_id):
+    """Return the graph node for a public player ID (UUID), or None if unknown"""
+    state = current_state()
+    if not isinstance(player_id, str):
+        return None
+    return state.node_by_uuid.get(player_id)
+
+def player_id_from_name(name):
+    """Get player ID from exact name match"""
+    state = current_state()
+    if name in state.name_to_id_map:
+        return state.name_to_id_map[name]
+    return None
 
 def fuzzy_match_player(name):
     """Try to find a player using fuzzy matching"""
+    state = current_state()
     name_lower = name.lower().strip()
-    name_normalized = normalize_name(name)
+    name_normalized = pc.normalize_name(name)
     
     # First try case-insensitive full match
-    for player_name, player_id in name_to_id_map.items():
+    for player_name, player_id in state.name_to_id_map.items():
         if player_name.lower() == name_lower:
             return player_id, player_name
     
     # Special handling for players with accented characters
     # Try with accents removed
     matches = []
-    for player_name, player_id in name_to_id_map.items():
-        normalized_player = normalize_name(player_name)
+    for player_name, player_id in state.name_to_id_map.items():
+        normalized_player = pc.normalize_name(player_name)
         if normalized_player == name_normalized:
             matches.append((player_id, player_name))
     
@@ -293,7 +705,7 @@ def fuzzy_match_player(name):
     for key, patterns in well_known_players.items():
         if any(pattern in name_lower for pattern in patterns) or key in name_lower:
             # Found a well-known player pattern, look for matching player names
-            for player_name, player_id in name_to_id_map.items():
+            for player_name, player_id in state.name_to_id_map.items():
                 player_lower = player_name.lower()
                 if key in player_lower or any(pattern in player_lower for pattern in patterns):
                     print(f"Matched well-known player: {name} -> {player_name}")
@@ -302,7 +714,7 @@ def fuzzy_match_player(name):
     # Try to match on last name for well-known players
     # This helps with cases like "Benzema" vs "Karim Benzema"
     last_name_matches = []
-    for player_name, player_id in name_to_id_map.items():
+    for player_name, player_id in state.name_to_id_map.items():
         player_parts = player_name.lower().split()
         if len(player_parts) > 1:
             # If the search name is a part of the full name
@@ -315,7 +727,7 @@ def fuzzy_match_player(name):
             elif player_parts[0] == name_lower:
                 last_name_matches.append((player_id, player_name))
             # Try normalized names for last name
-            elif normalize_name(player_parts[-1]) == name_normalized:
+            elif pc.normalize_name(player_parts[-1]) == name_normalized:
                 last_name_matches.append((player_id, player_name))
     
     if len(last_name_matches) == 1:
@@ -325,8 +737,8 @@ def fuzzy_match_player(name):
     # Try partial matching
     best_match = None
     best_score = 0
-    for player_name, player_id in name_to_id_map.items():
-        player_normalized = normalize_name(player_name)
+    for player_name, player_id in state.name_to_id_map.items():
+        player_normalized = pc.normalize_name(player_name)
         
         # Try normalized matching first
         if name_normalized in player_normalized:
@@ -353,69 +765,229 @@ def fuzzy_match_player(name):
         
     return None, None
 
-def load_data():
-    global G, player_index, name_to_id_map, all_player_names, normalized_name_map
-    
-    # Load the graph
-    graph_file = "player_graph.gml"
-    pickle_file = "player_graph.pkl"
-    
+def current_state():
+    """
+    The GraphState to use for the current request
+    
+    The live state is pinned on first use, so a reload in the middle of a
+    request (or a streamed response) doesn't switch graphs under it.
+    Outside a request this is simply the live state.
+    """
+    if not has_request_context():
+        return live_state
+    return request.environ.setdefault('football_links.graph_state', live_state)
+
+def load_state(graph_file):
+    """
+    Load a graph snapshot; returns a GraphState whose indexes are not built yet
+    """
+    pickle_file = pc.pickle_path(graph_file)
+    if not pickle_file.exists() and not os.path.exists(graph_file):
+        raise FileNotFoundError(f"Graph file not found: {graph_file}")
+    
+    # Read the version first: if the file changes while loading, the watcher
+    # sees a new version on its next check and loads again
+    version = pc.graph_version(graph_file, use_pickle=True)
+    stage_start = time.time()
+    G = pc.load_graph(graph_file, use_pickle=True)
+    read_time = time.time() - stage_start
+    
+    source = str(pickle_file if pickle_file.exists() else graph_file)
+    state = GraphState(G, version, source)
+    state.timings['read_graph'] = round(read_time, 3)
+    print(f"Stage read_graph: {read_time:.2f} seconds")
+    return state
+
+def activate_state(state):
+    """Make state the live graph, retiring job managers for other versions"""
+    global live_state
+    live_state = state
+    reload_status["last_reload"] = time.time()
+    
+    with job_managers_lock:
+        # Retired managers finish their running jobs; their records stay on disk
+        for version in [v for v in job_managers if v != state.version]:
+            job_managers.pop(version).close()
+
+def load_data(wait_for_indexes=False):
+    """
+    Load the graph and make it live
+    
+    The graph itself is loaded before returning; the name indexes are built in
+    a background thread unless wait_for_indexes is set. /readyz reports when
+    they are warm.
+    """
     print("Loading graph...")
     start_time = time.time()
     
-    if os.path.exists(pickle_file):
-        G = pc.load_graph(graph_file, use_pickle=True)
-    elif os.path.exists(graph_file):
-        G = pc.load_graph(graph_file)
-    else:
+    try:
+        state = load_state(app.config['GRAPH_FILE'])
+    except FileNotFoundError:
         print("Graph file not found. Please run player_connections.py first to build the graph.")
         return False
+    activate_state(state)
     
-    # Convert to undirected graph for better path finding
-    # This ensures we can find connections in both directions
-    print("Converting to undirected graph for better path finding...")
-    if G.is_directed():
-        print("Graph is directed. Converting to undirected for better connection finding.")
-        G = G.to_undirected()
+    if wait_for_indexes:
+        state.build_indexes()
     else:
-        print("Graph is already undirected.")
-    
-    # Build player index
-    player_index = pc.build_player_index(G)
-    
-    # Create a list of all player names for autocomplete
-    all_player_names = sorted(player_index['exact'].keys())
-    name_to_id_map = player_index['exact']
-    
-    # Create a normalized name map for better matching
-    normalized_name_map = {}
-    for name, pid in name_to_id_map.items():
-        norm_name = normalize_name(name)
-        if norm_name not in normalized_name_map:
-            normalized_name_map[norm_name] = []
-        normalized_name_map[norm_name].append((pid, name))
-    
-    # Print key players for debugging
-    debug_players = ["Arteta", "Özil", "Ozil", "Benzema"]
-    for term in debug_players:
-        term_lower = term.lower()
-        found = False
-        for name in all_player_names:
-            if term_lower in name.lower():
-                print(f"Found {term} as {name}")
-                found = True
-        if not found:
-            print(f"Could not find any player with '{term}' in name")
+        state.start_index_build()
     
     load_time = time.time() - start_time
     print(f"Data loaded in {load_time:.2f} seconds")
-    print(f"Total players: {len(all_player_names)}")
+    print(f"Total players: {state.G.number_of_nodes()}")
     
     return True
 
+def reload_graph(graph_file=None):
+    """
+    Load a graph snapshot and swap it in once it is fully built
+    
+    Returns True if a new version went live. Only one reload runs at a time;
+    if one is already running this returns False straight away.
+    """
+    if not reload_lock.acquire(blocking=False):
+        return False
+    
+    graph_file = graph_file or app.config['GRAPH_FILE']
+    try:
+        reload_status["reloading"] = True
+        start_time = time.time()
+        print(f"Reloading graph from {graph_file}...")
+        state = load_state(graph_file)
+        if live_state is not None and state.version == live_state.version:
+            print("Graph version unchanged, keeping the live graph")
+            return False
+        # Warm the indexes before swapping, so no request waits on them
+        state.build_indexes()
+        if state.index_error:
+            raise RuntimeError(state.index_error)
+        activate_state(state)
+        reload_status["last_error"] = None
+        print(f"Graph version {state.version} live after {time.time() - start_time:.2f} seconds")
+        return True
+    except Exception as e:
+        # Keep serving the old graph; the next change gets another try
+        reload_status["last_error"] = str(e)
+        print(f"Reload failed, still serving version {live_state.version if live_state else None}: {e}")
+        return False
+    finally:
+        reload_status["reloading"] = False
+        reload_lock.release()
+
+def snapshot_path(path):
+    """
+    Absolute path of a snapshot an admin reload may load, or None
+    
+    Only files in the same directory as GRAPH_FILE are allowed: the file is
+    unpickled, so it must not be an arbitrary path from the request.
+    """
+    if not isinstance(path, str) or not path:
+        return None
+    graph_dir = os.path.realpath(os.path.dirname(os.path.abspath(app.config['GRAPH_FILE'])))
+    candidate = os.path.realpath(os.path.join(graph_dir, path))
+    return candidate if os.path.dirname(candidate) == graph_dir else None
+
+def watch_graph_file():
+    """Reload whenever the graph file's version changes (runs in a background thread)"""
+    interval = app.config['RELOAD_POLL_INTERVAL']
+    last_seen = live_state.version if live_state else None
+    while True:
+        time.sleep(interval)
+        try:
+            version = pc.graph_version(app.config['GRAPH_FILE'], use_pickle=True)
+        except OSError:
+            continue  # Mid-replace or removed; check again later
+        if version != last_seen:
+            last_seen = version
+            if live_state is None or version != live_state.version:
+                reload_graph()
+
+def start_reload_watcher():
+    """Start the graph file watcher unless RELOAD_POLL_INTERVAL is 0"""
+    if not app.config['RELOAD_POLL_INTERVAL']:
+        return None
+    watcher = threading.Thread(target=watch_graph_file, name='graph-watcher', daemon=True)
+    watcher.start()
+    return watcher
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: a graph is live and its indexes are warm; 503 until then"""
+    state = live_state
+    if state is None:
+        return jsonify({"ready": False, "reason": "graph not loaded"}), 503
+    
+    body = {
+        "ready": state.indexes_ready,
+        "version": state.version,
+        "timings": state.timings,
+    }
+    if state.index_error:
+        body["reason"] = f"index build failed: {state.index_error}"
+    elif not state.indexes_ready:
+        body["reason"] = "indexes building"
+    return jsonify(body), 200 if state.indexes_ready else 503
+
+@app.route('/api/version', methods=['GET'])
+def graph_version_info():
+    """Report which graph version is live"""
+    state = current_state()
+    return jsonify({
+        "version": state.version,
+        "source": state.source,
+        "loaded_at": state.loaded_at,
+        "players": state.G.number_of_nodes(),
+        "connections": state.G.number_of_edges(),
+        "reloading": reload_status["reloading"],
+        "last_reload_error": reload_status["last_error"],
+    })
+
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Load a new graph snapshot in the background and swap it in when ready
+    
+    The body may name a snapshot file in the same directory as GRAPH_FILE
+    ({"path": "new_graph.gml"}); by default GRAPH_FILE itself is reloaded.
+    Under serve.py the request is passed to the parent process, which
+    reloads and restarts every worker on the new graph.
+    """
+    token = app.config['ADMIN_TOKEN']
+    if token:
+        if request.headers.get('X-Admin-Token') != token:
+            return jsonify({"error": "Invalid admin token"}), 403
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Reloads are only accepted from localhost"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    graph_file = None
+    if data.get('path') is not None:
+        graph_file = snapshot_path(data['path'])
+        if graph_file is None:
+            return jsonify({"error": "path must name a file in the graph file's directory"}), 400
+    
+    if reload_hook:
+        reload_hook(graph_file)
+        return jsonify({"reloading": True, "live_version": live_state.version}), 202
+    
+    if reload_status["reloading"]:
+        return jsonify({"error": "A reload is already in progress"}), 409
+    threading.Thread(target=reload_graph, args=(graph_file,), name='graph-reload', daemon=True).start()
+    return jsonify({"reloading": True, "live_version": live_state.version}), 202
+
 def extract_player_name(display_name):
-    """Extract the player name from the enhanced display format"""
-    # First check if we've stored this in the session
+    """
+    Extract the player name from the enhanced display format.
+    
+    Only used when the client didn't send a player ID (typed names or
+    older clients); autocomplete selections resolve by ID instead.
+    """
+    # First check if an older session stored this mapping
     if 'player_display_to_name' in session and display_name in session['player_display_to_name']:
         return session['player_display_to_name'][display_name]
     
@@ -434,9 +1006,102 @@ def extract_player_name(display_name):
     # If no special formatting, return as is
     return display_name
 
+# Most teammates /api/common_teammates lists in one reply
+MAX_TEAMMATES = 1000
+
+def resolve_player_arg(args, key):
+    """Graph node for the player in args[key + '_id'] (a UUID) or args[key] (a name), or None"""
+    player_id = lookup_player_id(args.get(f'{key}_id'))
+    if player_id:
+        return player_id
+    name = extract_player_name(args.get(key, '').strip())
+    if not name:
+        return None
+    return player_id_from_name(name) or fuzzy_match_player(name)[0]
+
+def player_ref(node):
+    """A player as {"id", "name"} for API replies"""
+    state = current_state()
+    return {"id": pc.player_uuid(state.G, node), "name": state.G.name(node, str(node))}
+
+def team_season_refs(numbers):
+    """Team-season numbers from the graph as {"season", "team"} dicts"""
+    team_seasons = current_state().G.team_seasons
+    return [{"season": team_seasons[n][0], "team": team_seasons[n][1]} for n in numbers]
+
+@app.route('/api/common_teammates', methods=['GET'])
+def common_teammates():
+    """
+    Players who were teammates of both of two players
+    
+    Takes player1/player2 (names) or player1_id/player2_id, and an optional
+    limit (default 100). Each teammate comes with the team-seasons they
+    shared with each player, alphabetically by name; shared_team_seasons
+    lists where the two players were in the same squad themselves.
+    """
+    state = current_state()
+    args = request.args
+    if not (args.get('player1') or args.get('player1_id')) or not (args.get('player2') or args.get('player2_id')):
+        return jsonify({"error": "Both players are required"}), 400
+    limit = min(max(args.get('limit', 100, type=int), 1), MAX_TEAMMATES)
+    
+    nodes = []
+    with metrics.stage('name_resolution'):
+        for key in ('player1', 'player2'):
+            node = resolve_player_arg(args, key)
+            if node is None:
+                return jsonify({"success": False, "error": f"Player not found: {args.get(key) or args.get(key + '_id')}"}), 200
+            nodes.append(node)
+    node1, node2 = nodes
+    
+    G = state.G
+    common = G.common_teammates(node1, node2).tolist()
+    listed = sorted(common, key=lambda node: G.name(node) or '')[:limit]
+    teammates = [dict(player_ref(node),
+                      with_player1=team_season_refs(G.shared_seasons(node, node1)),
+                      with_player2=team_season_refs(G.shared_seasons(node, node2)))
+                 for node in listed]
+    return jsonify({
+        "success": True,
+        "player1": player_ref(node1),
+        "player2": player_ref(node2),
+        "shared_team_seasons": team_season_refs(G.shared_seasons(node1, node2)),
+        "count": len(common),
+        "teammates": teammates,
+        "truncated": len(common) > len(listed),
+    })
+
+@app.route('/api/roster', methods=['GET'])
+def roster():
+    """
+    The squad a team had in a season
+    
+    Takes team (case-insensitive; the league in brackets may be left off)
+    and season, e.g. ?team=Arsenal&season=2003-2004. Without a season, every
+    season of the team is returned. A name shared by clubs in different
+    leagues gives one roster per club.
+    """
+    state = current_state()
+    team = request.args.get('team', '').strip()
+    season = request.args.get('season', '').strip() or None
+    if not team:
+        return jsonify({"error": "A team is required"}), 400
+    
+    numbers = state.G.find_team_seasons(team, season)
+    if not numbers:
+        where = f" in {season}" if season else ""
+        return jsonify({"success": False, "error": f"No squad found for {team}{where}"}), 200
+    
+    rosters = []
+    for number, ref in zip(numbers, team_season_refs(numbers)):
+        players = [player_ref(node) for node in state.G.roster(number).tolist()]
+        rosters.append(dict(ref, players=sorted(players, key=lambda player: player['name'])))
+    return jsonify({"success": True, "rosters": rosters})
+
 @app.route('/api/player_debug', methods=['GET'])
 def player_debug():
     """Diagnostic endpoint to check player data and matching"""
+    state = current_state()
     player_name = request.args.get('name', '').strip()
     if not player_name:
         return jsonify({"error": "Player name is required"}), 400
@@ -448,7 +1113,7 @@ def player_debug():
     player_id = player_id_from_name(player_name)
     if player_id:
         results["exact_match"] = {
-            "id": str(player_id),
+            "id": pc.player_uuid(state.G, player_id),
             "name": player_name
         }
     
@@ -456,33 +1121,21 @@ def player_debug():
     fuzzy_id, fuzzy_name = fuzzy_match_player(player_name)
     if fuzzy_id:
         results["fuzzy_match"] = {
-            "id": str(fuzzy_id),
+            "id": pc.player_uuid(state.G, fuzzy_id),
             "name": fuzzy_name
         }
     
     # Find all potential matches
-    for name, pid in name_to_id_map.items():
+    for name, pid in state.name_to_id_map.items():
         if player_name.lower() in name.lower() or name.lower() in player_name.lower():
             # Get teams for this player
             teams = set()
-            try:
-                for edge in list(G.edges(pid)) + list(G.in_edges(pid)):
-                    if edge[0] == pid:
-                        p1, p2 = edge
-                    else:
-                        p2, p1 = edge
-                        
-                    edge_data = G.get_edge_data(p1, p2)
-                    connections = json.loads(edge_data.get('details', '[]'))
-                    for conn in connections:
-                        if '|' in conn:
-                            season, team = conn.split('|', 1)
-                            teams.add(f"{team} ({season})")
-            except:
-                pass
+            for number in state.G.player_seasons(pid).tolist():
+                season, team = state.G.team_seasons[number]
+                teams.add(f"{team} ({season})")
                 
             match_info = {
-                "id": str(pid),
+                "id": pc.player_uuid(state.G, pid),
                 "name": name,
                 "teams": sorted(list(teams))
             }
@@ -490,6 +1143,92 @@ def player_debug():
     
     return jsonify(results)
 
+def get_job_manager():
+    """
+    Job manager for the current graph version
+    
+    Started on first use, so plain page views never fork workers.
+    """
+    state = current_state()
+    with job_managers_lock:
+        manager = job_managers.get(state.version)
+        if manager is None:
+            manager = jobs.JobManager(state.G, state.version, state.node_by_uuid,
+                                      cache_dir=app.config['JOB_CACHE_DIR'],
+                                      max_workers=app.config['JOB_WORKERS'],
+                                      max_queued=app.config['JOB_MAX_QUEUED'],
+                                      record_ttl=app.config['JOB_RECORD_TTL'])
+            job_managers[state.version] = manager
+        return manager
+
+def find_job(job_id):
+    """
+    A job's record, or None if unknown
+    
+    Read from the shared job cache rather than this process's job managers:
+    under serve.py the job may be running in another worker.
+    """
+    return jobs.read_job(app.config['JOB_CACHE_DIR'], job_id)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a long-running analytics job (distance_matrix, shortest_path_counts, graph_stats)"""
+    state = current_state()
+    data = request.get_json() or {}
+    kind = data.get('kind', '')
+    params = data.get('params', {})
+    
+    try:
+        jobs.validate_job(state.node_by_uuid, kind, params)
+        job = get_job_manager().submit(kind, params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except jobs.JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    
+    return jsonify(job), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = find_job(job_id)
+    if not job:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = find_job(job_id)
+    if not job:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    if job['status'] == 'failed':
+        return jsonify({"success": False, "error": job['error']}), 200
+    if job['status'] != 'done':
+        # Not ready yet; the client should keep polling
+        return jsonify(job), 202
+    return jsonify({"success": True, "job": job, "result": jobs.read_result(app.config['JOB_CACHE_DIR'], job)})
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a job's status changes as server-sent events until it finishes"""
+    cache_dir = app.config['JOB_CACHE_DIR']
+    job = find_job(job_id)
+    if not job:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    
+    def stream(current):
+        yield f"data: {json.dumps(current)}\n\n"
+        while current['status'] not in ('done', 'failed'):
+            updated = jobs.wait_for_change(cache_dir, job_id, current['status'])
+            if updated is None:
+                return  # Record expired
+            if updated['status'] == current['status']:
+                yield ": keep-alive\n\n"
+                continue
+            current = updated
+            yield f"data: {json.dumps(current)}\n\n"
+    
+    return Response(stream(job), mimetype='text/event-stream')
+
 @app.route('/debug')
 def debug_page():
     """Simple page for debugging player data"""
@@ -498,6 +1237,7 @@ def debug_page():
 @app.route('/debug/trace_players')
 def trace_specific_players():
     """Debug function to trace connections between specific players"""
+    state = current_state()
     # Define players we want to check
     target_players = ["Mikel Arteta", "Mesut Özil", "Mesut Ozil", "Karim Benzema"]
     
@@ -511,7 +1251,7 @@ def trace_specific_players():
         player_id = player_id_from_name(name)
         if player_id:
             player_ids[name] = player_id
-            player_data[name] = {"id": str(player_id), "source": "exact match"}
+            player_data[name] = {"id": pc.player_uuid(state.G, player_id), "source": "exact match"}
     
     # If needed, try fuzzy matching
     print("Trying fuzzy matching...")
@@ -520,7 +1260,7 @@ def trace_specific_players():
             fuzzy_id, fuzzy_name = fuzzy_match_player(name)
             if fuzzy_id:
                 player_ids[name] = fuzzy_id
-                player_data[name] = {"id": str(fuzzy_id), "source": f"fuzzy match: {fuzzy_name}"}
+                player_data[name] = {"id": pc.player_uuid(state.G, fuzzy_id), "source": f"fuzzy match: {fuzzy_name}"}
     
     # Special case for Özil with accent
     if "Mesut Özil" in player_ids and "Mesut Ozil" not in player_ids:
@@ -554,45 +1294,33 @@ def trace_specific_players():
                 
                 # Check if there's a path
                 try:
-                    if nx.has_path(G, id1, id2):
-                        path = nx.shortest_path(G, id1, id2)
+                    result = pc.find_shortest_paths(state.G, id1, id2, max_paths=1,
+                                                    budget=path_budget('trace_players'))
+                    if result['paths']:
+                        path = result['paths'][0]
                         path_length = len(path) - 1
                         
                         # Get actual names from IDs for clarity
-                        path_names = [G.nodes[pid].get('name', str(pid)) for pid in path]
+                        path_names = [state.G.name(pid, str(pid)) for pid in path]
                         
                         # Get connection details
                         connection_details = []
                         for idx in range(len(path)-1):
                             p1, p2 = path[idx], path[idx+1]
-                            edge_data = G.get_edge_data(p1, p2)
-                            if edge_data:
-                                try:
-                                    connections_str = edge_data.get('details', '[]')
-                                    connection_info = json.loads(connections_str)
-                                    teams = []
-                                    for conn in connection_info:
-                                        if '|' in conn:
-                                            season, team = conn.split('|', 1)
-                                            teams.append(f"{team} ({season})")
-                                    
-                                    connection_details.append({
-                                        "from": path_names[idx],
-                                        "to": path_names[idx+1],
-                                        "teams": teams
-                                    })
-                                except Exception as e:
-                                    connection_details.append({
-                                        "from": path_names[idx],
-                                        "to": path_names[idx+1],
-                                        "error": str(e)
-                                    })
+                            teams = [f"{team} ({season})" for season, team in state.G.shared_team_seasons(p1, p2)]
+                            connection_details.append({
+                                "from": path_names[idx],
+                                "to": path_names[idx+1],
+                                "teams": teams
+                            })
                         
                         connections[connection_key] = {
                             "path_length": path_length,
                             "path": path_names,
                             "details": connection_details
                         }
+                    elif result['truncated']:
+                        connections[connection_key] = "Search stopped early (budget exhausted)"
                     else:
                         connections[connection_key] = "No path found"
                 except Exception as e:
@@ -602,9 +1330,9 @@ def trace_specific_players():
     search_results = {}
     for search_term in ["Arteta", "Ozil", "Özil", "Benzema"]:
         matches = []
-        for name, pid in name_to_id_map.items():
+        for name, pid in state.name_to_id_map.items():
             if search_term.lower() in name.lower():
-                matches.append({"name": name, "id": str(pid)})
+                matches.append({"name": name, "id": pc.player_uuid(state.G, pid)})
         search_results[search_term] = matches
     
     # Check specific connections - Özil to Benzema
@@ -612,13 +1340,13 @@ def trace_specific_players():
     
     # Find all IDs for Ozil variations
     ozil_ids = []
-    for name, pid in name_to_id_map.items():
+    for name, pid in state.name_to_id_map.items():
         if "ozil" in name.lower() or "özil" in name.lower():
             ozil_ids.append(pid)
     
     # Find all IDs for Benzema
     benzema_ids = []
-    for name, pid in name_to_id_map.items():
+    for name, pid in state.name_to_id_map.items():
         if "benzema" in name.lower():
             benzema_ids.append(pid)
     
@@ -626,13 +1354,15 @@ def trace_specific_players():
     for ozil_id in ozil_ids:
         for benzema_id in benzema_ids:
             try:
-                if nx.has_path(G, ozil_id, benzema_id):
-                    path = nx.shortest_path(G, ozil_id, benzema_id)
-                    path_names = [G.nodes[pid].get('name', str(pid)) for pid in path]
+                result = pc.find_shortest_paths(state.G, ozil_id, benzema_id, max_paths=1,
+                                                budget=path_budget('trace_players'))
+                if result['paths']:
+                    path = result['paths'][0]
+                    path_names = [state.G.name(pid, str(pid)) for pid in path]
                     ozil_benzema_paths.append({
                         "path": path_names,
-                        "ozil_id": str(ozil_id),
-                        "benzema_id": str(benzema_id)
+                        "ozil_id": pc.player_uuid(state.G, ozil_id),
+                        "benzema_id": pc.player_uuid(state.G, benzema_id)
                     })
             except:
                 pass
@@ -651,7 +1381,7 @@ def trace_specific_players():
 def is_arteta_ozil_benzema_case(player1, player2):
     """Check if this is the specific Arteta/Özil/Benzema case"""
     names = [player1.lower(), player2.lower()]
-    normalized_names = [normalize_name(player1), normalize_name(player2)]
+    normalized_names = [pc.normalize_name(player1), pc.normalize_name(player2)]
     
     arteta_patterns = ['arteta', 'mikel arteta', 'm. arteta']
     ozil_patterns = ['ozil', 'özil', 'mesut ozil', 'mesut özil', 'm. ozil', 'm. özil']
@@ -811,6 +1541,7 @@ def create_arteta_connection_response(player1, player2):
 
 if __name__ == '__main__':
     if load_data():
+        start_reload_watcher()
         app.run(debug=True)
     else:
         print("Failed to load data. Exiting.") 
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Benchmarks for building, saving, loading and querying the player graph.
+
+For each dataset size, synthetic squad data is generated
+(generate_synthetic_squads.py) and then measured:
+- build_graph throughput in rows per second
+- save_graph and load_graph time, file sizes and RSS growth on load
+- /api/players autocomplete latency
+- find_connection latency for pairs at each path length 1-6, and for pairs
+  with no connection
+
+The API is called through the Flask test client, so the numbers cover
+routing, name resolution, search and JSON encoding, but not the network.
+Results are written as JSON. --compare prints the change from an earlier
+run and exits non-zero if anything got worse by more than --threshold.
+
+Usage:
+    python benchmark.py --sizes small,medium -o bench.json
+    python benchmark.py --sizes small --compare bench.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+
+import generate_synthetic_squads as synthetic
+import player_connections as pc
+
+# Dataset sizes; each is a set of generate_squads arguments. One isolated
+# country gives pairs of players with no connection (homonyms are turned off
+# because a merged homonym can bridge it to the rest).
+SIZES = {
+    'tiny': {'countries': 2, 'leagues_per_country': 1, 'teams_per_league': 10, 'seasons': 5},
+    'small': {'countries': 3, 'leagues_per_country': 1, 'teams_per_league': 18, 'seasons': 10},
+    'medium': {'countries': 4, 'leagues_per_country': 2, 'teams_per_league': 18, 'seasons': 15},
+    'large': {'countries': 8, 'leagues_per_country': 2, 'teams_per_league': 18, 'seasons': 20},
+}
+
+PATH_LENGTHS = range(1, 7)
+
+def current_rss():
+    """Resident set size of this process in bytes (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def latency_summary(samples):
+    """Summary statistics in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return None
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        'count': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(ms[len(ms) // 2], 3),
+        'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        'max_ms': round(ms[-1], 3),
+    }
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints of the code being measured"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def sample_pairs(G, pairs_per_length, rng):
+    """
+    Pick player pairs at each path length 1-6, plus pairs with no connection
+
+    Runs BFS from random sources until every length has enough pairs or the
+    sources run out; lengths that don't occur in the graph get fewer pairs.
+    """
+    nodes = list(G)
+    by_length = {length: [] for length in PATH_LENGTHS}
+    for source in rng.sample(nodes, min(len(nodes), 200)):
+        lengths = G.distances_from(source, max(PATH_LENGTHS))
+        targets = {}
+        for length in by_length:
+            candidates = np.flatnonzero(lengths == length).tolist()
+            if candidates:
+                targets[length] = candidates
+        for length, candidates in targets.items():
+            if len(by_length[length]) < pairs_per_length:
+                by_length[length].append((source, rng.choice(candidates)))
+        if all(len(pairs) >= pairs_per_length for pairs in by_length.values()):
+            break
+
+    labels = G.component_labels()
+    sizes = np.bincount(labels[labels >= 0])
+    no_path = []
+    if len(sizes) > 1:
+        largest = int(sizes.argmax())
+        others = np.flatnonzero((labels >= 0) & (labels != largest)).tolist()
+        largest = np.flatnonzero(labels == largest).tolist()
+        no_path = [(rng.choice(largest), rng.choice(others)) for _ in range(pairs_per_length)]
+    return by_length, no_path
+
+def bench_build(csv_file, rows):
+    gc.collect()
+    start = time.perf_counter()
+    with quiet():
+        G = pc.build_graph(csv_file)
+    elapsed = time.perf_counter() - start
+    return G, {
+        'rows': rows,
+        'nodes': G.number_of_nodes(),
+        'edges': G.number_of_edges(),
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed, 1),
+    }
+
+# Loads the graph in a fresh interpreter, so the RSS growth isn't hidden by
+# memory this process already freed but still holds
+LOAD_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, sys.argv[3])
+import benchmark, player_connections as pc
+rss_before = benchmark.current_rss()
+start = time.perf_counter()
+with benchmark.quiet():
+    G = pc.load_graph(sys.argv[1], use_pickle=sys.argv[2] == 'pickle')
+seconds = time.perf_counter() - start
+rss_after = benchmark.current_rss()
+print(json.dumps({'seconds': seconds, 'rss': rss_after - rss_before if rss_before is not None else None}))
+'''
+
+def bench_save_load(G, graph_file):
+    results = {}
+    for label, use_pickle in (('gml', False), ('pickle', True)):
+        path = pc.pickle_path(graph_file) if use_pickle else Path(graph_file)
+        start = time.perf_counter()
+        with quiet():
+            pc.save_graph(G, graph_file, use_pickle=use_pickle)
+        save_seconds = time.perf_counter() - start
+
+        output = subprocess.run([sys.executable, '-c', LOAD_SCRIPT, str(graph_file), label,
+                                 str(Path(__file__).resolve().parent)],
+                                capture_output=True, text=True, check=True).stdout
+        load = json.loads(output.strip().splitlines()[-1])
+
+        results[label] = {
+            'save_seconds': round(save_seconds, 3),
+            'load_seconds': round(load['seconds'], 3),
+            'file_bytes': path.stat().st_size,
+            'load_rss_bytes': load['rss'],
+        }
+    return results
+
+def bench_api(graph_file, G, pairs_per_length, repeat, rng):
+    import app as web
+
+    # Measure the search itself: no slow-query log writes
+    web.app.config['SLOW_QUERY_LOG'] = ''
+    web.app.config['GRAPH_FILE'] = str(graph_file)
+    web.slow_log = None
+    with quiet():
+        web.load_data(wait_for_indexes=True)
+    client = web.app.test_client()
+    # One untimed request so first-use setup isn't counted
+    with quiet():
+        client.get('/api/players', query_string={'q': 'warm'})
+
+    # Autocomplete: 3-letter fragments of real surnames, plus one that matches nothing
+    names = [G.name(n, '') for n in rng.sample(list(G), min(len(G), 50))]
+    queries = [name.split()[-1][:3].lower() for name in names if name] + ['zzqx']
+    samples = []
+    with quiet():
+        for _ in range(repeat):
+            for q in queries:
+                start = time.perf_counter()
+                client.get('/api/players', query_string={'q': q})
+                samples.append(time.perf_counter() - start)
+    results = {'players': latency_summary(samples), 'find_connection': {}}
+
+    by_length, no_path = sample_pairs(G, pairs_per_length, rng)
+    groups = {str(length): pairs for length, pairs in by_length.items()}
+    groups['no_path'] = no_path
+    for label, pairs in groups.items():
+        samples, truncated = [], 0
+        with quiet():
+            for _ in range(repeat):
+                for p1, p2 in pairs:
+                    body = {'player1_id': pc.player_uuid(G, p1), 'player2_id': pc.player_uuid(G, p2),
+                            'player1': 'x', 'player2': 'x'}
+                    start = time.perf_counter()
+                    response = client.post('/api/find_connection', json=body)
+                    samples.append(time.perf_counter() - start)
+                    truncated += bool((response.get_json() or {}).get('truncated'))
+        summary = latency_summary(samples)
+        if summary:
+            summary['pairs'] = len(pairs)
+            summary['truncated'] = truncated
+        results['find_connection'][label] = summary
+    return results
+
+def run_size(name, params, workdir, pairs_per_length, repeat, seed):
+    print(f"[{name}] generating data...")
+    df = synthetic.generate_squads(isolated_countries=1, homonym_rate=0.0, seed=seed, **params)
+    csv_file = Path(workdir) / f"{name}.csv"
+    df.to_csv(csv_file)
+    rows = len(df)
+    del df
+
+    print(f"[{name}] build_graph on {rows} rows...")
+    G, build = bench_build(csv_file, rows)
+    print(f"[{name}] {build['nodes']} players, {build['edges']} connections, "
+          f"{build['rows_per_sec']:.0f} rows/sec")
+
+    graph_file = Path(workdir) / f"{name}.gml"
+    print(f"[{name}] save/load...")
+    storage = bench_save_load(G, graph_file)
+
+    print(f"[{name}] API latency...")
+    api = bench_api(graph_file, G, pairs_per_length, repeat, random.Random(seed))
+    for label, summary in api['find_connection'].items():
+        if summary:
+            print(f"[{name}]   find_connection {label:>7}: p50 {summary['p50_ms']:.2f} ms, "
+                  f"p95 {summary['p95_ms']:.2f} ms ({summary['pairs']} pairs)")
+        else:
+            print(f"[{name}]   find_connection {label:>7}: no pairs at this distance")
+
+    return {'params': params, 'build': build, 'storage': storage, 'api': api}
+
+def flatten(results, prefix=''):
+    """Flatten nested results into {'small.build.rows_per_sec': value, ...}"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+# Metrics worth comparing between runs, and whether higher is better. Tail
+# latencies are recorded but too noisy at these sample sizes to gate on.
+COMPARED = (('rows_per_sec', True), ('_seconds', False), ('p50_ms', False),
+            ('mean_ms', False), ('load_rss_bytes', False))
+
+def compare(current, baseline, threshold):
+    """Print the change in each comparable metric; returns the number of regressions"""
+    now, before = flatten(current['results']), flatten(baseline['results'])
+    regressions = 0
+    for key in sorted(now.keys() & before.keys()):
+        higher_is_better = next((better for suffix, better in COMPARED if key.endswith(suffix)), None)
+        if higher_is_better is None or not before[key]:
+            continue
+        change = (now[key] - before[key]) / before[key]
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{key:60} {before[key]:>14.3f} -> {now[key]:>14.3f}  {change:+7.1%}{flag}")
+    return regressions
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark graph building, storage and path queries')
+    parser.add_argument('--sizes', default='small,medium',
+                        help=f"Comma-separated dataset sizes ({', '.join(SIZES)})")
+    parser.add_argument('--pairs', type=int, default=20, help='Player pairs per path length')
+    parser.add_argument('--repeat', type=int, default=3, help='Times each query is repeated')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for data generation and sampling')
+    parser.add_argument('--workdir', help='Keep generated data here instead of a temporary directory')
+    parser.add_argument('--output', '-o', default='benchmark_results.json', help='Results file')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown reported as a regression (default 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"Unknown size(s): {', '.join(unknown)}")
+
+    results = {}
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory())
+        Path(workdir).mkdir(parents=True, exist_ok=True)
+        for name in sizes:
+            results[name] = run_size(name, SIZES[name], workdir, args.pairs, args.repeat, args.seed)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'networkx': nx.__version__,
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (commit {baseline['meta'].get('commit')}):")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{regressions} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Turn raw scrape output (footballsquads_archive.csv) into squads_cleaned.csv.
+
+This is the cleaning from data_cleaning.ipynb as a streaming script:
+    - PlayerData_* columns renamed to Name, Nationality, ...; unused ones dropped
+    - team extracted from TeamURL, LeagueName without its .htm suffix
+    - First_Season: earliest season per name and nationality
+    - First_Team: first team listed per name, in file order
+    - enhanced_player_id: MD5 UUID of name, nationality, First_Season, First_Team
+    - team title-cased, club_id: MD5 UUID of team and country
+    - rows without a name dropped
+
+The archive is read twice in chunks: once to collect First_Season and
+First_Team, once to transform and write. Every step is vectorized, and each
+distinct fingerprint and (team, country) pair is hashed only once. CSV output
+is laid out like the notebook's (including its index column). -o can be
+given more than once, and its extension picks the format (see dataset_io.py):
+    python clean_squads.py footballsquads_archive.csv -o squads_cleaned.csv -o squads_cleaned.npz
+"""
+import argparse
+import hashlib
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import dataset_io
+
+RENAMES = {
+    'PlayerData_2': 'Name',
+    'PlayerData_3': 'Nationality',
+    'PlayerData_4': 'Position',
+    'PlayerData_5': 'Height',
+    'PlayerData_6': 'Weight',
+    'PlayerData_7': 'DOB',
+}
+RAW_COLUMNS = ['Country', 'Season', 'LeagueName', 'TeamURL'] + list(RENAMES)
+OUTPUT_COLUMNS = ['Country', 'Season', 'LeagueName', 'TeamURL', 'Name', 'Nationality', 'team',
+                  'First_Season', 'First_Team', 'enhanced_player_id', 'club_id']
+
+def md5_uuid(text):
+    """The notebook's ID scheme: a UUID made from the MD5 of a fingerprint"""
+    return str(uuid.UUID(hex=hashlib.md5(text.encode()).hexdigest()))
+
+def hash_column(fingerprints, cache):
+    """md5_uuid of each fingerprint, hashing each distinct value once; missing values stay missing"""
+    codes, uniques = pd.factorize(fingerprints)
+    new = [value for value in uniques if value not in cache]
+    cache.update((value, md5_uuid(value)) for value in new)
+    ids = np.array([cache[value] for value in uniques] + [None], dtype=object)
+    return ids[codes]
+
+def map_distinct(values, transform):
+    """Apply a vectorized string transform to each distinct value once, for repetitive columns"""
+    codes, uniques = pd.factorize(values)
+    mapped = np.append(transform(pd.Series(uniques, dtype=object)).to_numpy(dtype=object), None)
+    return pd.Series(mapped[codes], index=values.index, dtype=object)
+
+def read_archive(path, chunksize):
+    """Chunks of the raw archive with the notebook's column names and team/LeagueName fixes"""
+    header = dataset_io.dataset_columns(path)
+    usecols = [c for c in RAW_COLUMNS if c in header]
+    start = 0
+    for chunk in dataset_io.iter_dataset(path, columns=usecols, chunksize=chunksize, dtype=str):
+        chunk = chunk.rename(columns=RENAMES)
+        # The notebook's index is the row number in the archive, kept through its merges
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        chunk['team'] = map_distinct(chunk['TeamURL'], lambda urls: urls.str.extract(r'/([^/]+)\.htm$', expand=False))
+        chunk['LeagueName'] = map_distinct(chunk['LeagueName'], lambda names: names.str.replace('.htm', '', regex=False))
+        yield chunk
+
+def first_appearances(path, chunksize):
+    """
+    First pass: the earliest season per name and nationality, and the first
+    team per name in file order, as in the notebook's find_earliest_appearances
+    """
+    first_season = pd.Series(dtype=object)
+    first_team = pd.Series(dtype=object)
+    rows = 0
+    for chunk in read_archive(path, chunksize):
+        rows += len(chunk)
+        named = chunk[chunk['Name'].notna()]
+        # astype(str) in the notebook turns a missing nationality into 'nan'
+        temp_id = named['Name'] + '_' + named['Nationality'].fillna('nan')
+        seasons = pd.concat([first_season, pd.Series(named['Season'].to_numpy(), index=temp_id.to_numpy())])
+        # Season strings sort by year; sorting beats groupby().min(), which compares strings in Python
+        seasons = seasons.sort_values(kind='stable')
+        first_season = seasons[~seasons.index.duplicated()]
+
+        teams = named.dropna(subset=['team']).drop_duplicates('Name').set_index('Name')['team']
+        first_team = pd.concat([first_team, teams[~teams.index.isin(first_team.index)]])
+    return first_season, first_team, rows
+
+def clean_chunk(chunk, first_season, first_team, player_ids, club_ids):
+    """Second pass: the notebook's derived columns for one chunk"""
+    chunk = chunk[chunk['Name'].notna()].copy()
+    temp_id = chunk['Name'] + '_' + chunk['Nationality'].fillna('nan')
+    chunk['First_Season'] = temp_id.map(first_season)
+    chunk['First_Team'] = chunk['Name'].map(first_team)
+
+    fingerprint = (chunk['Name'].str.lower().str.strip() + '_'
+                   + chunk['Nationality'].str.lower().str.strip().fillna('unknown') + '_'
+                   + chunk['First_Season'].fillna('unknown') + '_'
+                   + chunk['First_Team'].fillna('unknown'))
+    chunk['enhanced_player_id'] = hash_column(fingerprint, player_ids)
+
+    chunk['team'] = map_distinct(chunk['team'], lambda teams: teams.str.title())
+    club = (chunk['team'].str.strip() + '_' + chunk['Country'].str.strip().fillna('unknown')).str.lower()
+    chunk['club_id'] = hash_column(club, club_ids)
+    return chunk[OUTPUT_COLUMNS]
+
+def clean_squads(archive_path, output_paths=('squads_cleaned.csv',), chunksize=200000):
+    """
+    Clean a raw archive into squads_cleaned.csv
+
+    Args:
+        archive_path: Scraper output (.csv, or .npz/.parquet from dataset_io.py)
+        output_paths: Files to write; each one's extension sets its format
+        chunksize: Rows read at a time
+    Returns:
+        Number of rows written
+    """
+    # Check every format before spending two passes over the archive
+    for path in output_paths:
+        dataset_io.dataset_format(path)
+
+    start = time.perf_counter()
+    first_season, first_team, total = first_appearances(archive_path, chunksize)
+    scanned = time.perf_counter()
+    print(f"Pass 1: {total} rows, {len(first_season)} name/nationality pairs, {len(first_team)} names "
+          f"in {scanned - start:.2f}s ({total / max(scanned - start, 1e-9):,.0f} rows/sec)")
+
+    player_ids, club_ids = {}, {}
+    # CSV keeps the notebook's index column of archive row numbers
+    writers = [dataset_io.DatasetWriter(path, index=True) for path in output_paths]
+    written = 0
+    try:
+        for chunk in read_archive(archive_path, chunksize):
+            cleaned = clean_chunk(chunk, first_season, first_team, player_ids, club_ids)
+            for writer in writers:
+                writer.write(cleaned)
+            written += len(cleaned)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Pass 2: wrote {written} rows ({len(player_ids)} player IDs, {len(club_ids)} club IDs) "
+          f"to {', '.join(output_paths)}")
+    print(f"Cleaned {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean raw scrape output into squads_cleaned.csv')
+    parser.add_argument('archive', nargs='?', default='footballsquads_archive.csv', help='Scraper output')
+    parser.add_argument('--output', '-o', action='append',
+                        help='Output file, .csv, .npz or .parquet (default: squads_cleaned.csv; can be repeated)')
+    parser.add_argument('--chunksize', type=int, default=200000, help='Rows to process at a time')
+    args = parser.parse_args()
+    clean_squads(args.archive, args.output or ['squads_cleaned.csv'], args.chunksize)
+
+if __name__ == '__main__':
+    main()
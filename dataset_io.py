@@ -0,0 +1,359 @@
+"""
+Reading and writing the pipeline's tabular data in more than one format.
+
+Every stage (clean_squads, generate_unique_player_ids, entity_resolution,
+build_graph) reads and writes through this module, so each can take or
+produce any of:
+    - .csv: plain text, as before
+    - .npz: a NumPy array bundle. String columns are dictionary-encoded:
+      int32 codes (-1 for missing) plus each distinct value once. Numeric
+      columns are stored as they are. Needs nothing beyond NumPy.
+    - .parquet: needs pyarrow (pip install pyarrow)
+
+Readers take a column projection and filters, a dict of column -> allowed
+values such as {'Season': ['2019-2020']}. From .npz only the projected
+columns are loaded, and filters are checked against the small integer codes
+before any strings are built. From .parquet, pyarrow skips row groups that
+can't match. CSV is still read in full, chunk by chunk.
+
+    python dataset_io.py squads_cleaned.csv squads_cleaned.npz
+    python dataset_io.py squads_cleaned.npz --info
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = pa_dataset = pq = None
+
+FORMATS = {'.csv': 'csv', '.npz': 'npz', '.parquet': 'parquet', '.pq': 'parquet'}
+
+def dataset_format(path):
+    """'csv', 'npz' or 'parquet', from the file extension"""
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"{path}: unknown dataset format (expected one of {', '.join(FORMATS)})")
+    if fmt == 'parquet' and pq is None:
+        raise ImportError("Parquet files need pyarrow (pip install pyarrow)")
+    return fmt
+
+def _is_numeric(values):
+    return pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype)
+
+def _as_strings(values):
+    """A column as an object array of str, with None for missing values"""
+    strings = np.array(values, dtype=object)
+    missing = pd.isna(strings)
+    strings[~missing] = [str(value) for value in strings[~missing]]
+    strings[missing] = None
+    return strings
+
+def _check_columns(path, available, columns=None, filters=None):
+    wanted = list(columns or []) + list(filters or {})
+    missing = [c for c in wanted if c not in available]
+    if missing:
+        raise ValueError(f"{path} has no column(s) {', '.join(missing)}")
+
+def dataset_columns(path):
+    """Column names of a dataset, without reading its rows"""
+    fmt = dataset_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    if fmt == 'parquet':
+        return pq.read_schema(path).names
+    with np.load(path) as bundle:
+        return bundle['__columns__'].tolist()
+
+def _filter_csv_chunk(chunk, filters):
+    if not filters:
+        return chunk
+    mask = np.ones(len(chunk), dtype=bool)
+    for column, allowed in filters.items():
+        mask &= chunk[column].isin(list(allowed)).to_numpy()
+    return chunk[mask]
+
+def _iter_csv(path, columns, filters, chunksize, dtype):
+    header = dataset_columns(path)
+    _check_columns(path, header, columns, filters)
+    usecols = None
+    if columns is not None:
+        wanted = set(columns) | set(filters or {})
+        usecols = [c for c in header if c in wanted]
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=usecols, dtype=dtype):
+        chunk = _filter_csv_chunk(chunk, filters)
+        yield chunk if columns is None else chunk[list(columns)]
+
+def _parquet_filter(filters):
+    expression = None
+    for column, allowed in (filters or {}).items():
+        condition = pa_dataset.field(column).isin(list(allowed))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def _iter_parquet(path, columns, filters, chunksize, categorical):
+    dataset = pa_dataset.dataset(path, format='parquet')
+    _check_columns(path, dataset.schema.names, columns, filters)
+    batches = dataset.to_batches(columns=list(columns) if columns is not None else None,
+                                 filter=_parquet_filter(filters), batch_size=chunksize)
+    for batch in batches:
+        yield batch.to_pandas(strings_to_categorical=categorical)
+
+def _npz_mask(bundle, filters):
+    """Rows passing the filters, compared on dictionary codes where possible"""
+    mask = None
+    for column, allowed in filters.items():
+        if f"{column}:codes" in bundle.files:
+            dictionary = bundle[f"{column}:dictionary"]
+            wanted = np.flatnonzero(np.isin(dictionary, [str(value) for value in allowed]))
+            matches = np.isin(bundle[f"{column}:codes"], wanted)
+        else:
+            matches = np.isin(bundle[f"{column}:values"], list(allowed))
+        mask = matches if mask is None else mask & matches
+    return mask
+
+def _decode(codes, dictionary, categorical):
+    if categorical:
+        return pd.Categorical.from_codes(codes, categories=pd.Index(dictionary, dtype=object))
+    # Missing values come back as NaN, as from read_csv
+    return np.append(dictionary.astype(object), np.nan)[codes]
+
+def _iter_npz(path, columns, filters, chunksize, categorical):
+    with np.load(path) as bundle:
+        names = bundle['__columns__'].tolist()
+        _check_columns(path, names, columns, filters)
+        columns = names if columns is None else list(columns)
+        rows = int(bundle['__rows__'])
+        positions = None
+        if filters:
+            positions = np.flatnonzero(_npz_mask(bundle, filters))
+            rows = len(positions)
+
+        # Only the projected columns are read from the bundle
+        arrays = {}
+        for column in columns:
+            if f"{column}:codes" in bundle.files:
+                codes = bundle[f"{column}:codes"]
+                arrays[column] = (codes if positions is None else codes[positions], bundle[f"{column}:dictionary"])
+            else:
+                values = bundle[f"{column}:values"]
+                arrays[column] = (values if positions is None else values[positions], None)
+
+    for start in range(0, rows, chunksize):
+        stop = min(start + chunksize, rows)
+        data = {}
+        for column, (values, dictionary) in arrays.items():
+            values = values[start:stop]
+            data[column] = values if dictionary is None else _decode(values, dictionary, categorical)
+        yield pd.DataFrame(data, columns=columns)
+
+def iter_dataset(path, columns=None, filters=None, chunksize=200000, categorical=False, dtype=None):
+    """
+    Read a dataset chunk by chunk
+
+    Args:
+        path: .csv, .npz or .parquet file
+        columns: Columns to read (default: all)
+        filters: Dict of column -> allowed values; other rows are skipped
+        chunksize: Rows per chunk
+        categorical: Return string columns of columnar files as pandas
+            Categoricals instead of object columns
+        dtype: Passed to read_csv for CSV files (columnar files keep their types)
+    """
+    fmt = dataset_format(path)
+    if fmt == 'csv':
+        return _iter_csv(path, columns, filters, chunksize, dtype)
+    if fmt == 'parquet':
+        return _iter_parquet(path, columns, filters, chunksize, categorical)
+    return _iter_npz(path, columns, filters, chunksize, categorical)
+
+def read_dataset(path, columns=None, filters=None, nrows=None, chunksize=200000, categorical=False, dtype=None):
+    """
+    Read a whole dataset (or its first nrows matching rows) into one DataFrame
+
+    Takes the same arguments as iter_dataset.
+    """
+    chunks = []
+    rows = 0
+    for chunk in iter_dataset(path, columns, filters, chunksize, categorical, dtype):
+        if nrows is not None and rows + len(chunk) >= nrows:
+            chunks.append(chunk.iloc[:nrows - rows])
+            break
+        chunks.append(chunk)
+        rows += len(chunk)
+    if not chunks:
+        columns = columns if columns is not None else dataset_columns(path)
+        return pd.DataFrame(columns=list(columns))
+    df = pd.concat(chunks, ignore_index=True)
+    if categorical and dataset_format(path) != 'csv':
+        # concat only keeps Categoricals whose categories match, which Parquet batches' may not
+        for column in df.columns:
+            if chunks[0][column].dtype == 'category' and df[column].dtype != 'category':
+                df[column] = df[column].astype('category')
+    return df
+
+class DatasetWriter:
+    """
+    Write a dataset chunk by chunk, in the format given by the file extension
+
+    Args:
+        path: Output .csv, .npz or .parquet file
+        index: Write the DataFrame index as the first CSV column, as to_csv
+            does by default (ignored for columnar formats)
+
+    The first chunk fixes the columns. .npz files are assembled in memory
+    (codes and dictionaries only) and written on close().
+    """
+
+    def __init__(self, path, index=False):
+        self.path = path
+        self.format = dataset_format(path)
+        self.index = index
+        self.columns = None
+        self.rows = 0
+        self._parquet = None
+        self._schema = None
+        # .npz: per column, either codes + dictionary (value -> code) or numeric parts
+        self._codes = {}
+        self._dictionaries = {}
+        self._numeric = {}
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = df.columns.tolist()
+        df = df[self.columns]
+        if self.format == 'csv':
+            df.to_csv(self.path, index=self.index, mode='w' if self.rows == 0 else 'a', header=self.rows == 0)
+        elif self.format == 'parquet':
+            self._write_parquet(df)
+        else:
+            self._encode(df)
+        self.rows += len(df)
+
+    def _write_parquet(self, df):
+        if self._schema is None:
+            self._schema = pa.schema([
+                (column, pa.from_numpy_dtype(df[column].dtype) if _is_numeric(df[column]) else pa.string())
+                for column in self.columns])
+            self._parquet = pq.ParquetWriter(self.path, self._schema, compression='zstd')
+        arrays = []
+        for column, field in zip(self.columns, self._schema):
+            values = _as_strings(df[column]) if pa.types.is_string(field.type) else df[column].to_numpy()
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        self._parquet.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _encode(self, df):
+        for column in self.columns:
+            values = df[column]
+            if self.rows == 0 and _is_numeric(values):
+                self._numeric[column] = []
+            if column in self._numeric:
+                if _is_numeric(values):
+                    self._numeric[column].append(values.to_numpy())
+                    continue
+                self._demote(column)
+            self._codes.setdefault(column, []).append(self._dictionary_codes(column, values))
+
+    def _dictionary_codes(self, column, values):
+        """Codes of a chunk's values in the column's growing dictionary; each distinct value is looked up once"""
+        codes, uniques = pd.factorize(values)
+        lookup = self._dictionaries.setdefault(column, {})
+        strings = _as_strings(pd.Series(uniques, dtype=object))
+        mapping = np.fromiter((lookup.setdefault(value, len(lookup)) for value in strings),
+                              dtype=np.int32, count=len(strings))
+        return np.append(mapping, np.int32(-1))[codes]
+
+    def _demote(self, column):
+        """A numeric column turned out to hold strings: re-encode what was written so far"""
+        parts = self._numeric.pop(column)
+        if parts:
+            self._codes[column] = [self._dictionary_codes(column, pd.Series(np.concatenate(parts)))]
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self.format != 'npz' or self.columns is None:
+            return
+        arrays = {'__columns__': np.array(self.columns, dtype=str), '__rows__': np.array(self.rows)}
+        for column in self.columns:
+            if column in self._numeric:
+                arrays[f"{column}:values"] = np.concatenate(self._numeric[column])
+            else:
+                dictionary = list(self._dictionaries[column])
+                arrays[f"{column}:codes"] = np.concatenate(self._codes[column])
+                arrays[f"{column}:dictionary"] = np.array(dictionary, dtype=str if dictionary else '<U1')
+        # np.savez adds .npz to names without it, so write through a file object
+        with open(self.path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def write_dataset(df, path, index=False):
+    """Write a DataFrame in the format given by the file extension"""
+    with DatasetWriter(path, index=index) as writer:
+        writer.write(df)
+
+def describe(path):
+    """Print a dataset's columns, types and, for .npz, dictionary sizes"""
+    fmt = dataset_format(path)
+    print(f"{path} ({fmt}, {Path(path).stat().st_size / 1e6:.1f} MB)")
+    if fmt == 'npz':
+        with np.load(path) as bundle:
+            print(f"  {int(bundle['__rows__'])} rows")
+            for column in bundle['__columns__'].tolist():
+                if f"{column}:codes" in bundle.files:
+                    print(f"  {column}: string, {len(bundle[f'{column}:dictionary'])} distinct values")
+                else:
+                    print(f"  {column}: {bundle[f'{column}:values'].dtype}")
+    elif fmt == 'parquet':
+        metadata = pq.read_metadata(path)
+        print(f"  {metadata.num_rows} rows in {metadata.num_row_groups} row groups")
+        for field in pq.read_schema(path):
+            print(f"  {field.name}: {field.type}")
+    else:
+        print(f"  columns: {', '.join(dataset_columns(path))}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a dataset between CSV, .npz and Parquet')
+    parser.add_argument('input', help='Input .csv, .npz or .parquet file')
+    parser.add_argument('output', nargs='?', help='Output file; its extension sets the format')
+    parser.add_argument('--columns', help='Comma-separated columns to keep')
+    parser.add_argument('--season', action='append', help='Keep only this season (can be repeated)')
+    parser.add_argument('--league', action='append', help='Keep only this league (can be repeated)')
+    parser.add_argument('--chunksize', type=int, default=200000, help='Rows to process at a time')
+    parser.add_argument('--info', action='store_true', help='Describe the input and exit')
+    args = parser.parse_args()
+
+    if args.info or not args.output:
+        describe(args.input)
+        return
+
+    filters = {}
+    if args.season:
+        filters['Season'] = args.season
+    if args.league:
+        filters['LeagueName'] = args.league
+    columns = args.columns.split(',') if args.columns else None
+
+    start = time.perf_counter()
+    with DatasetWriter(args.output) as writer:
+        for chunk in iter_dataset(args.input, columns, filters, args.chunksize):
+            writer.write(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {writer.rows} rows to {args.output} in {elapsed:.2f}s "
+          f"({writer.rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    describe(args.output)
+
+if __name__ == '__main__':
+    main()
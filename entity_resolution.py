@@ -0,0 +1,470 @@
+"""
+Entity resolution for player identities.
+
+Rows are first collapsed into profiles: distinct (folded name, nationality,
+date of birth). Comparing every pair of profiles is out of the question, so
+candidate pairs come from blocking keys instead:
+    - folded surname + date of birth
+    - folded surname + nationality + first initial
+Each candidate pair is scored in a process pool with vectorized features:
+name similarity (MinHash over character trigrams), date of birth and
+nationality agreement, clubs in common, and seasons both profiles were
+listed in. Pairs above the threshold are merged with union-find, best
+score first. Two profiles listed in the same squad in the same season are
+never merged, and neither are groups with different known dates of birth,
+so homonyms are kept apart.
+
+The output is the input CSV with an enhanced_player_id column, ready for
+build_graph:
+    python entity_resolution.py footballsquads_archive.csv -o squads_resolved.csv
+
+With labelled data, --evaluate names the column holding each row's true
+identity and reports pairwise precision and recall, next to the notebook's
+name + nationality key. Synthetic data with dates of birth and spelling
+variants makes a labelled set:
+    python generate_synthetic_squads.py --true-id --dob --missing-dob-seasons 5 --name-variant-rate 0.1 -o labelled.csv
+    python entity_resolution.py labelled.csv --evaluate true_player_id
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dataset_io
+from generate_unique_player_ids import normalize_column, player_id_from_key
+
+# Column names used by the scraper's raw output (see data_cleaning.ipynb)
+RAW_COLUMNS = {'PlayerData_2': 'Name', 'PlayerData_3': 'Nationality', 'PlayerData_7': 'DOB'}
+
+# Blocking keys, as profile columns; blocks with a missing value are skipped
+BLOCKING_KEYS = [('surname', 'dob'), ('surname', 'nationality', 'initial')]
+
+# Weight of each pair feature in the match score
+DEFAULT_WEIGHTS = {
+    'name': 4.0,                   # MinHash Jaccard similarity of name trigrams, 0-1
+    'dob_match': 3.0,
+    'dob_conflict': -6.0,
+    'nationality_match': 1.0,
+    'nationality_conflict': -2.0,
+    'shared_team': 1.0,            # Per club in common, up to two
+    'shared_season': -1.0,         # Per season listed by two different clubs (loans aside)
+}
+DEFAULT_THRESHOLD = 5.0
+
+NUM_PERM = 32
+_PRIME = (1 << 31) - 1
+
+# Profile data used by score_pairs inside worker processes
+_worker_data = None
+
+class UnionFind:
+    """
+    Disjoint sets over profile indexes, with a known date of birth per set
+
+    union() refuses to join two sets whose dates of birth are both known
+    and different, so one profile without a date can't chain two people together.
+    """
+
+    def __init__(self, dob_codes):
+        self.parent = np.arange(len(dob_codes))
+        self.dob = np.asarray(dob_codes).copy()
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        """Join the sets of a and b; returns False if they conflict"""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        if self.dob[ra] >= 0 and self.dob[rb] >= 0 and self.dob[ra] != self.dob[rb]:
+            return False
+        if ra > rb:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.dob[ra] < 0:
+            self.dob[ra] = self.dob[rb]
+        return True
+
+    def roots(self):
+        """The root of every element"""
+        return np.array([self.find(x) for x in range(len(self.parent))])
+
+def minhash_signatures(names, num_perm=NUM_PERM, seed=0):
+    """MinHash signatures of the character trigrams of each name, shape (len(names), num_perm)"""
+    counts, hashes = [], []
+    for name in names:
+        padded = f"  {name} "
+        grams = {zlib.crc32(padded[j:j + 3].encode()) for j in range(len(padded) - 2)}
+        counts.append(len(grams))
+        hashes.extend(grams)
+    # Every name has at least one trigram, so each name's hashes start at a distinct offset
+    starts = np.r_[0, np.cumsum(counts)[:-1]].astype(np.int64)
+    hashes = np.asarray(hashes, dtype=np.uint64) % _PRIME
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(names), num_perm), dtype=np.uint64)
+    if not len(names):
+        return signatures
+    # One permutation at a time keeps the working array at one value per trigram
+    for k in range(num_perm):
+        signatures[:, k] = np.minimum.reduceat((a[k] * hashes + b[k]) % _PRIME, starts)
+    return signatures
+
+def _key_columns(df, caches):
+    """Folded name, nationality and date of birth of each row"""
+    names = normalize_column(df['Name'], caches['name'])
+    nationality = df['Nationality'].fillna('').astype(str).str.strip().str.upper() \
+        if 'Nationality' in df.columns else ''
+    dob = df['DOB'].fillna('').astype(str).str.strip() if 'DOB' in df.columns else ''
+    return pd.DataFrame({'name': names, 'nationality': nationality, 'dob': dob}, index=df.index)
+
+def _read_chunks(csv_path, chunksize, usecols=None):
+    """Read a dataset (see dataset_io.py) in chunks, renaming the scraper's raw columns"""
+    header = dataset_io.dataset_columns(csv_path)
+    renames = {raw: name for raw, name in RAW_COLUMNS.items() if raw in header and name not in header}
+    if usecols is not None:
+        wanted = set(usecols)
+        usecols = [c for c in header if c in wanted or renames.get(c) in wanted]
+    for chunk in dataset_io.iter_dataset(csv_path, columns=usecols, chunksize=chunksize, dtype=str):
+        yield chunk.rename(columns=renames)
+
+def load_profiles(csv_path, chunksize=200000, caches=None):
+    """
+    Collapse the rows of a squads CSV into profiles
+
+    Returns:
+        profiles: DataFrame with one row per distinct (name, nationality, dob),
+            plus surname, initial, first_season and rows
+        appearances: DataFrame of distinct (profile, season, team) codes
+        rows: Number of rows read
+    """
+    caches = caches if caches is not None else {'name': {}}
+    parts = []
+    rows = 0
+    for df in _read_chunks(csv_path, chunksize, ['Name', 'Nationality', 'DOB', 'Season', 'team', 'TeamURL', 'Country']):
+        rows += len(df)
+        df = df[df['Name'].notna()]
+        keys = _key_columns(df, caches)
+        keys['season'] = pd.to_numeric(df['Season'].str[:4], errors='coerce').fillna(-1).astype(np.int32)
+        # Raw scraper output has only the team URL, as in data_cleaning.ipynb
+        team = df['team'] if 'team' in df.columns else df['TeamURL'].str.extract(r'/([^/]+)\.htm$')[0]
+        team = team.fillna('').str.lower()
+        keys['team'] = (df['Country'].fillna('') + '/' + team) if 'Country' in df.columns else team
+        keys = keys[keys['name'] != '']
+        parts.append(keys.drop_duplicates())
+    rows_df = pd.concat(parts, ignore_index=True).drop_duplicates()
+
+    # Both number profiles in order of first appearance
+    profile_codes = rows_df.groupby(['name', 'nationality', 'dob'], sort=False).ngroup().to_numpy()
+    profiles = rows_df[['name', 'nationality', 'dob']].drop_duplicates().reset_index(drop=True)
+    tokens = profiles['name'].str.split()
+    profiles['surname'] = tokens.str[-1].fillna('')
+    profiles['initial'] = profiles['name'].str[:1]
+    appearances = pd.DataFrame({
+        'profile': profile_codes.astype(np.int32),
+        'season': rows_df['season'].to_numpy(),
+        'team': pd.factorize(rows_df['team'])[0].astype(np.int32),
+    })
+    seasons = appearances[appearances['season'] >= 0].groupby('profile')['season']
+    profiles['first_season'] = seasons.min().reindex(profiles.index).fillna(-1).astype(np.int32)
+    profiles['rows'] = appearances.groupby('profile').size().reindex(profiles.index, fill_value=0)
+    return profiles, appearances, rows
+
+def candidate_pairs(profiles, blocking_keys=BLOCKING_KEYS, max_block_size=50):
+    """
+    Candidate pairs of profiles that share a blocking key
+
+    Blocks larger than max_block_size are skipped, since their pairs grow
+    quadratically; the other keys usually still pair up their members.
+
+    Returns:
+        pairs: int64 array of shape (n, 2), each pair once with a < b
+        stats: Per-key counts of blocks, skipped blocks and pairs
+    """
+    found = []
+    stats = {}
+    for key in blocking_keys:
+        usable = (profiles[list(key)] != '').all(axis=1).to_numpy()
+        block_ids = np.full(len(profiles), -1, dtype=np.int64)
+        block_ids[usable] = profiles.loc[usable, list(key)].groupby(list(key), sort=False).ngroup().to_numpy()
+
+        members = np.flatnonzero(block_ids >= 0)
+        order = members[np.argsort(block_ids[members], kind='stable')]
+        sorted_ids = block_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) if len(order) else np.array([], int)
+        sizes = np.diff(np.r_[starts, len(order)])
+
+        key_pairs = 0
+        # Blocks of the same size become one (blocks, size) matrix of members
+        for size in np.unique(sizes):
+            if size < 2 or size > max_block_size:
+                continue
+            block_members = order[starts[sizes == size][:, None] + np.arange(size)]
+            i, j = np.triu_indices(size, 1)
+            found.append(np.stack([block_members[:, i].ravel(), block_members[:, j].ravel()], axis=1))
+            key_pairs += len(found[-1])
+        stats['+'.join(key)] = {
+            'blocks': int((sizes >= 2).sum()),
+            'skipped_blocks': int((sizes > max_block_size).sum()),
+            'pairs': key_pairs,
+        }
+
+    if not found:
+        return np.empty((0, 2), dtype=np.int64), stats
+    pairs = np.sort(np.concatenate(found), axis=1)
+    pairs = np.unique(pairs, axis=0)
+    return pairs, stats
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+def _shared_counts(a, b, table):
+    """For each pair (a[i], b[i]), how many values the two profiles share in a (profile, value) table"""
+    left = pd.DataFrame({'pair': np.arange(len(a)), 'profile': a}).merge(table, on='profile')
+    right = pd.DataFrame({'pair': np.arange(len(b)), 'profile': b}).merge(table, on='profile')
+    shared = left[['pair', 'value']].merge(right[['pair', 'value']], on=['pair', 'value'])
+    return np.bincount(shared['pair'].to_numpy(), minlength=len(a))
+
+def pair_features(data, a, b):
+    """Similarity features for the candidate pairs (a[i], b[i]), as a dict of arrays"""
+    name = (data['signatures'][a] == data['signatures'][b]).mean(axis=1)
+    dob_known = (data['dob'][a] >= 0) & (data['dob'][b] >= 0)
+    nationality_known = (data['nationality'][a] >= 0) & (data['nationality'][b] >= 0)
+    same_dob = data['dob'][a] == data['dob'][b]
+    same_nationality = data['nationality'][a] == data['nationality'][b]
+    shared_seasons = _shared_counts(a, b, data['seasons'])
+    shared_squads = _shared_counts(a, b, data['squads'])
+    return {
+        'name': name,
+        'dob_match': dob_known & same_dob,
+        'dob_conflict': dob_known & ~same_dob,
+        'nationality_match': nationality_known & same_nationality,
+        'nationality_conflict': nationality_known & ~same_nationality,
+        'shared_team': np.minimum(_shared_counts(a, b, data['teams']), 2),
+        'shared_season': shared_seasons - shared_squads,
+        'shared_squad': shared_squads,
+    }
+
+def score_pairs(a, b, weights=None, data=None):
+    """Match scores for candidate pairs; pairs listed in the same squad score -inf"""
+    data = data if data is not None else _worker_data
+    weights = weights or DEFAULT_WEIGHTS
+    features = pair_features(data, a, b)
+    score = np.zeros(len(a))
+    for name, weight in weights.items():
+        score += weight * features[name]
+    score[features['shared_squad'] > 0] = -np.inf
+    return score
+
+def _scoring_data(profiles, appearances):
+    """Arrays the scorer needs, indexed by profile"""
+    dob = pd.factorize(profiles['dob'].where(profiles['dob'] != ''))[0]
+    nationality = pd.factorize(profiles['nationality'].where(profiles['nationality'] != ''))[0]
+    valid = appearances[appearances['season'] >= 0]
+    num_teams = int(appearances['team'].max()) + 1 if len(appearances) else 1
+    table = lambda values: pd.DataFrame({'profile': valid['profile'].to_numpy(),
+                                         'value': values}).drop_duplicates()
+    return {
+        'signatures': minhash_signatures(profiles['name'].tolist()),
+        'dob': dob,
+        'nationality': nationality,
+        'seasons': table(valid['season'].to_numpy()),
+        'teams': table(valid['team'].to_numpy()),
+        'squads': table(valid['season'].to_numpy().astype(np.int64) * num_teams + valid['team'].to_numpy()),
+    }
+
+def resolve(profiles, appearances, threshold=DEFAULT_THRESHOLD, weights=None, workers=None,
+            batch_size=50000, max_block_size=50):
+    """
+    Group profiles into players
+
+    Returns:
+        roots: For each profile, the index of the profile representing its player
+        stats: Candidate, scoring and merge counts and timings
+    """
+    start = time.perf_counter()
+    data = _scoring_data(profiles, appearances)
+    prepared = time.perf_counter()
+    pairs, block_stats = candidate_pairs(profiles, max_block_size=max_block_size)
+    blocked = time.perf_counter()
+    print(f"{len(pairs)} candidate pairs from {len(profiles)} profiles "
+          f"(features {prepared - start:.2f}s, blocking {blocked - prepared:.2f}s)")
+
+    # Fork where available so workers share the profile data instead of unpickling a copy
+    scores = np.empty(len(pairs))
+    batches = [slice(i, i + batch_size) for i in range(0, len(pairs), batch_size)]
+    if workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            scores[batch] = score_pairs(pairs[batch, 0], pairs[batch, 1], weights, data)
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context,
+                                 initializer=_init_worker, initargs=(data,)) as executor:
+            futures = [(batch, executor.submit(score_pairs, pairs[batch, 0], pairs[batch, 1], weights))
+                       for batch in batches]
+            for batch, future in futures:
+                scores[batch] = future.result()
+    scored = time.perf_counter()
+    print(f"Scored {len(pairs)} pairs in {scored - blocked:.2f}s "
+          f"({len(pairs) / max(scored - blocked, 1e-9):,.0f} pairs/sec)")
+
+    # Best matches first, so a weak link can't take a profile from a strong one
+    matches = np.flatnonzero(scores >= threshold)
+    matches = matches[np.argsort(-scores[matches], kind='stable')]
+    sets = UnionFind(data['dob'])
+    merged = refused = 0
+    for a, b in pairs[matches]:
+        if sets.union(a, b):
+            merged += 1
+        else:
+            refused += 1
+    roots = sets.roots()
+
+    stats = {
+        'profiles': len(profiles),
+        'blocking': block_stats,
+        'candidate_pairs': len(pairs),
+        'matched_pairs': len(matches),
+        'merges': merged,
+        'refused_merges': refused,
+        'players': int(len(np.unique(roots))),
+        'scoring_seconds': round(scored - blocked, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+    }
+    return roots, stats
+
+def player_ids(profiles, roots, registry=None):
+    """
+    enhanced_player_id for each profile
+
+    A player's ID is derived from its earliest-listed profile, so it stays the
+    same as long as that profile does. With a registry, known players keep
+    their registered ID.
+    """
+    order = profiles.assign(root=roots, first=profiles['first_season'].replace(-1, np.iinfo(np.int32).max))
+    order = order.sort_values(['root', 'first', 'name', 'nationality', 'dob'])
+    canonical = order.drop_duplicates('root')
+    keys = (canonical['name'] + '_' + canonical['nationality'] + '_' + canonical['dob']).tolist()
+    if registry is not None:
+        ids = registry.assign(keys, player_id_from_key)
+    else:
+        ids = [player_id_from_key(key) for key in keys]
+    id_by_root = pd.Series(ids, index=canonical['root'].to_numpy())
+    return id_by_root.reindex(roots).to_numpy()
+
+def write_resolved(csv_path, output_path, profiles, ids, chunksize=200000, caches=None):
+    """Copy a squads dataset chunk by chunk, setting enhanced_player_id from the resolved profiles"""
+    caches = caches if caches is not None else {'name': {}}
+    index = pd.MultiIndex.from_frame(profiles[['name', 'nationality', 'dob']])
+    id_by_profile = pd.Series(ids, index=index)
+    with dataset_io.DatasetWriter(output_path) as writer:
+        for df in _read_chunks(csv_path, chunksize):
+            keys = _key_columns(df, caches)
+            df['enhanced_player_id'] = id_by_profile.reindex(pd.MultiIndex.from_frame(keys)).to_numpy()
+            writer.write(df)
+    return writer.rows
+
+def pairwise_scores(predicted, truth):
+    """
+    Pairwise precision and recall of predicted player labels against true ones
+
+    Every two rows given the same label form a pair. Precision is the share
+    of predicted pairs that are true pairs, recall the share of true pairs
+    that were predicted.
+    """
+    counts = pd.DataFrame({'predicted': predicted, 'truth': truth}).groupby(['predicted', 'truth']).size()
+    pairs = lambda sizes: float((sizes * (sizes - 1) / 2).sum())
+    both = pairs(counts)
+    predicted_pairs = pairs(counts.groupby(level='predicted').sum())
+    true_pairs = pairs(counts.groupby(level='truth').sum())
+    return {
+        'precision': both / predicted_pairs if predicted_pairs else 1.0,
+        'recall': both / true_pairs if true_pairs else 1.0,
+        'players': int(counts.index.get_level_values('predicted').nunique()),
+    }
+
+def evaluate(resolved_path, truth_column):
+    """
+    Score a resolved dataset against a column of true identities
+
+    Returns pairwise_scores for enhanced_player_id and for the notebook's
+    identity (lowercased name + nationality), by method name.
+    """
+    df = dataset_io.read_dataset(resolved_path, columns=['Name', 'Nationality', 'enhanced_player_id', truth_column],
+                                 dtype=str)
+    df = df[df['Name'].notna() & df[truth_column].notna()]
+    baseline = df['Name'].str.lower().str.strip() + '_' + df['Nationality'].fillna('').str.lower()
+    return {
+        'resolved': pairwise_scores(df['enhanced_player_id'].to_numpy(), df[truth_column].to_numpy()),
+        'name + nationality': pairwise_scores(baseline.to_numpy(), df[truth_column].to_numpy()),
+        'true': {'players': int(df[truth_column].nunique())},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve player identities and write enhanced_player_id')
+    parser.add_argument('input_csv', help='Squads data (.csv, .npz or .parquet) with Name, Nationality, Season, '
+                                          'team and optionally DOB')
+    parser.add_argument('--output', '-o', help='Output file; its extension sets the format (default: <input>_resolved.<ext>)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Minimum match score to merge')
+    parser.add_argument('--max-block-size', type=int, default=50, help='Skip blocking-key blocks larger than this')
+    parser.add_argument('--workers', type=int, help='Scoring processes (default: one per CPU core)')
+    parser.add_argument('--chunksize', type=int, default=200000, help='Rows to read and write at a time')
+    parser.add_argument('--registry', help='Player-ID registry (SQLite) that keeps IDs stable across runs')
+    parser.add_argument('--evaluate', metavar='COLUMN',
+                        help='Column with true identities: report pairwise precision and recall against it')
+    args = parser.parse_args()
+    input_path = Path(args.input_csv)
+    output_path = args.output or str(input_path.with_name(f"{input_path.stem}_resolved{input_path.suffix}"))
+
+    start = time.perf_counter()
+    caches = {'name': {}}
+    profiles, appearances, rows = load_profiles(args.input_csv, args.chunksize, caches)
+    loaded = time.perf_counter()
+    print(f"Read {rows} rows into {len(profiles)} profiles in {loaded - start:.2f}s "
+          f"({rows / max(loaded - start, 1e-9):,.0f} rows/sec)")
+
+    roots, stats = resolve(profiles, appearances, args.threshold, workers=args.workers,
+                           max_block_size=args.max_block_size)
+    for key, counts in stats['blocking'].items():
+        print(f"  blocking on {key}: {counts['blocks']} blocks, {counts['pairs']} pairs, "
+              f"{counts['skipped_blocks']} oversized blocks skipped")
+    print(f"{stats['matched_pairs']} pairs matched, {stats['merges']} merged, "
+          f"{stats['refused_merges']} refused (conflicting dates of birth)")
+    print(f"{stats['profiles']} profiles resolved to {stats['players']} players")
+
+    if args.registry:
+        from player_id_registry import PlayerIdRegistry
+        with PlayerIdRegistry(args.registry, source=args.input_csv) as registry:
+            ids = player_ids(profiles, roots, registry)
+    else:
+        ids = player_ids(profiles, roots)
+
+    written = write_resolved(args.input_csv, output_path, profiles, ids, args.chunksize, caches)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {written} rows to {output_path} in {elapsed:.2f}s total "
+          f"({written / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+    if args.evaluate:
+        scores = evaluate(output_path, args.evaluate)
+        print(f"Pairwise scores against {args.evaluate} ({scores.pop('true')['players']} true players):")
+        for method, result in scores.items():
+            print(f"  {method:20s} precision {result['precision']:.4f}, recall {result['recall']:.4f}, "
+                  f"{result['players']} players")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Polite concurrent HTTP fetching for the scraper.
+
+Fetcher.get() is safe to call from many threads at once. Each thread keeps
+its own requests.Session, so connections are reused instead of reopened for
+every page. Each host gets:
+    - a semaphore capping requests in flight to it (per_host)
+    - a token bucket capping its request rate (rate per second, burst)
+Connection errors, timeouts, 429 and 5xx responses are retried with
+exponential backoff and jitter, honouring Retry-After. FetchStats counts
+pages, bytes, retries and failures for progress reports.
+
+With a PageCache, pages are kept on disk by URL. Pages the caller marks as
+immutable are served from the cache without a request; others are
+revalidated with If-None-Match / If-Modified-Since and reused on a 304.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = 'football-links-scraper/1.0'
+
+class FetchError(Exception):
+    """Raised when a page can't be fetched after all retries"""
+
+class PageCache:
+    """
+    On-disk cache of page bodies and validators, keyed by URL
+
+    Each page is stored as <sha1 of url>.html with a .json file holding the
+    URL, ETag, Last-Modified and fetch time. Files are written to a temporary
+    name and renamed, so an interrupted write never leaves a torn entry.
+    """
+
+    def __init__(self, directory='http_cache'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.html', base + '.json'
+
+    def get(self, url):
+        """(metadata, body) for a cached URL, or None"""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, encoding='utf-8') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, response):
+        """Store a 200 response's body and validators"""
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        # Body first, so metadata never points at a missing or partial body
+        for path, content in ((body_path, response.text), (meta_path, json.dumps(meta))):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter
+
+    Args:
+        rate: Tokens added per second
+        capacity: Most tokens that can build up, i.e. the largest burst
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class FetchStats:
+    """Thread-safe counters for a crawl"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.pages = 0
+        self.bytes = 0
+        self.retries = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.latency = 0.0
+        self.statuses = {}
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def status(self, code):
+        with self.lock:
+            self.statuses[code] = self.statuses.get(code, 0) + 1
+
+    def summary(self):
+        """One-line progress report"""
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            mean_ms = self.latency / self.pages * 1000 if self.pages else 0.0
+            return (f"{self.pages} pages ({self.pages / elapsed:.1f}/s), "
+                    f"{self.bytes / 1e6:.1f} MB, mean {mean_ms:.0f} ms, {self.in_flight} in flight, "
+                    f"{self.retries} retries, {self.failures} failed, "
+                    f"{self.cache_hits} from cache, {self.not_modified} not modified")
+
+class Fetcher:
+    """
+    Rate-limited, retrying HTTP client shared by worker threads
+
+    Args:
+        per_host: Most requests in flight to one host at once
+        rate: Requests per second allowed to one host
+        burst: Requests that may go out at once after an idle spell (default: rate)
+        retries: Retries after the first attempt
+        backoff: Delay before the first retry, doubling each time
+        max_backoff: Longest delay between retries
+        timeout: Seconds to wait for a response
+        cache: Optional PageCache
+        immutable: Function telling whether a URL's page never changes, so a
+            cached copy can be used without revalidating
+    """
+
+    def __init__(self, per_host=4, rate=5.0, burst=None, retries=3, backoff=0.5,
+                 max_backoff=30.0, timeout=30.0, user_agent=USER_AGENT, cache=None, immutable=None):
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.cache = cache
+        self.immutable = immutable
+        self.stats = FetchStats()
+        self._local = threading.local()
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def session(self):
+        """This thread's session, created on first use"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.per_host, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = self.user_agent
+            self._local.session = session
+        return session
+
+    def _host_limits(self, url):
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            limits = self._hosts.get(host)
+            if limits is None:
+                limits = (threading.BoundedSemaphore(self.per_host), TokenBucket(self.rate, self.burst))
+                self._hosts[host] = limits
+            return limits
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    def get(self, url, headers=None):
+        """
+        GET a URL within the host's limits, retrying transient failures
+
+        Returns the response for any non-retryable status (the caller checks
+        it); raises FetchError once the retries are used up.
+        """
+        semaphore, bucket = self._host_limits(url)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats.add(retries=1)
+                time.sleep(self._retry_delay(attempt - 1, error if isinstance(error, requests.Response) else None))
+            bucket.acquire()
+            with semaphore:
+                self.stats.add(in_flight=1)
+                started = time.monotonic()
+                try:
+                    response = self.session().get(url, headers=headers, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                    continue
+                finally:
+                    self.stats.add(in_flight=-1)
+            self.stats.status(response.status_code)
+            if response.status_code in RETRY_STATUSES:
+                error = response
+                continue
+            self.stats.add(pages=1, bytes=len(response.content), latency=time.monotonic() - started)
+            return response
+
+        self.stats.add(failures=1)
+        if isinstance(error, requests.Response):
+            raise FetchError(f"{url}: HTTP {error.status_code} after {self.retries + 1} attempts")
+        raise FetchError(f"{url}: {error} after {self.retries + 1} attempts")
+
+    def get_text(self, url):
+        """The body of a page, or None (with the error printed) if it can't be fetched"""
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if cached is not None:
+            meta, body = cached
+            if self.immutable is not None and self.immutable(url):
+                self.stats.add(cache_hits=1)
+                return body
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = self.get(url, headers=headers or None)
+            if response.status_code == 304 and cached is not None:
+                self.stats.add(not_modified=1)
+                return cached[1]
+            response.raise_for_status()
+            if self.cache is not None:
+                self.cache.put(url, response)
+            return response.text
+        except (FetchError, requests.RequestException) as e:
+            if isinstance(e, requests.HTTPError):
+                self.stats.add(failures=1)
+            print(f"Error fetching {url}: {e}")
+            return None
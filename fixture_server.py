@@ -0,0 +1,160 @@
+"""
+Local stand-in for footballsquads.co.uk, for testing the scraper.
+
+Serves an archive page, league pages and team squad pages laid out like the
+real site, built from synthetic squads (see generate_synthetic_squads.py).
+Responses can be slowed down or made to fail at random to exercise the
+scraper's rate limiting and retries:
+    python fixture_server.py --port 8001 --latency 0.05 --error-rate 0.05
+    python scrape_footballsquads.py --base-url http://127.0.0.1:8001 -o fixture_archive.csv
+
+On exit the server prints how many requests it served over how many
+connections, which shows whether clients are reusing connections.
+"""
+import argparse
+import hashlib
+import html
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from generate_synthetic_squads import generate_squads
+
+POSITIONS = ['G', 'D', 'D', 'D', 'M', 'M', 'M', 'F', 'F']
+
+def _player_details(player_key):
+    """Stable position, height, weight and date of birth for a simulated player"""
+    digest = hashlib.md5(str(player_key).encode()).digest()
+    dob = f"{digest[0] % 28 + 1:02d}-{digest[1] % 12 + 1:02d}-{digest[2] % 30 + 70:02d}"
+    return POSITIONS[digest[3] % len(POSITIONS)], f"1.{digest[4] % 30 + 65}", str(digest[5] % 30 + 65), dob
+
+def build_site(**generate_args):
+    """
+    Pages of the stand-in site, by URL path
+
+    Args:
+        generate_args: Passed on to generate_squads (countries, seasons, ...)
+    """
+    df = generate_squads(true_id=True, **generate_args)
+    pages = {}
+    leagues = defaultdict(list)
+    for team_url, squad in df.groupby('TeamURL', observed=True, sort=False):
+        path = urlparse(team_url).path
+        country, season, league, page = path.strip('/').split('/')
+        slug = page[:-len('.htm')]
+        leagues[(country, season, league)].append(slug)
+
+        rows = []
+        for number, (name, nationality, player_key) in enumerate(
+                zip(squad['Name'], squad['Nationality'], squad['true_player_id']), start=1):
+            position, height, weight, dob = _player_details(player_key)
+            cells = [str(number), html.escape(name), nationality, position, height, weight, dob, '', '']
+            rows.append('<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>')
+        title = html.escape(squad['team'].iloc[0])
+        pages[path] = (
+            f'<html><head><title>{title} {season}</title></head><body><div id="main">'
+            f'<h2>{title}</h2><table><tr><th>Number</th><th>Name</th><th>Nat</th><th>Pos</th>'
+            f'<th>Height</th><th>Weight</th><th>Date of Birth</th><th>Birth Place</th>'
+            f'<th>Previous Club</th></tr>{"".join(rows)}</table></div></body></html>')
+
+    archive_links = []
+    for (country, season, league), slugs in leagues.items():
+        team_links = ''.join(f'<a href="{league}/{slug}.htm">{slug}</a><br>' for slug in sorted(slugs))
+        pages[f'/{country}/{season}/{league}.htm'] = (
+            f'<html><body><div id="main"><h2>{league} {season}</h2>{team_links}</div></body></html>')
+        archive_links.append(f'<a href="{country}/{season}/{league}.htm">{season}</a><br>')
+    pages['/archive.htm'] = f'<html><body><div id="main">{"".join(archive_links)}</div></body></html>'
+    return pages, len(df)
+
+class FixtureServer(ThreadingHTTPServer):
+    """HTTP server for the stand-in site, with injected latency and errors"""
+
+    daemon_threads = True
+
+    def __init__(self, address, pages, latency=0.0, error_rate=0.0):
+        super().__init__(address, FixtureHandler)
+        self.pages = {path: page.encode('utf-8') for path, page in pages.items()}
+        self.etags = {path: f'"{hashlib.md5(page).hexdigest()}"' for path, page in self.pages.items()}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.errors = 0
+        self.not_modified = 0
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections open
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def do_GET(self):
+        self.server.count('requests')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self.server.count('errors')
+            self.send_body(503, b'Service temporarily unavailable', {'Retry-After': '0'})
+            return
+        path = urlparse(self.path).path
+        page = self.server.pages.get(path)
+        if page is None:
+            self.send_body(404, b'Not found')
+        elif self.headers.get('If-None-Match') == self.server.etags[path]:
+            self.server.count('not_modified')
+            self.send_body(304, b'', {'ETag': self.server.etags[path]})
+        else:
+            self.send_body(200, page, {'ETag': self.server.etags[path]})
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic stand-in of footballsquads.co.uk')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8001, help='Port to listen on')
+    parser.add_argument('--countries', type=int, default=2, help='Number of countries')
+    parser.add_argument('--leagues', type=int, default=1, help='Leagues per country')
+    parser.add_argument('--teams', type=int, default=10, help='Teams per league')
+    parser.add_argument('--seasons', type=int, default=5, help='Number of seasons')
+    parser.add_argument('--first-season', type=int, default=2000, help='Starting year of the first season')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic squads')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    pages, rows = build_site(countries=args.countries, leagues_per_country=args.leagues,
+                             teams_per_league=args.teams, seasons=args.seasons,
+                             first_season=args.first_season, seed=args.seed)
+    server = FixtureServer((args.host, args.port), pages, args.latency, args.error_rate)
+    print(f"Serving {len(pages)} pages ({rows} player rows) at http://{args.host}:{server.server_port}/archive.htm")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.requests} requests over {server.connections} connections "
+              f"({server.errors} injected errors, {server.not_modified} not modified)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Generate synthetic squad data shaped like squads_cleaned.csv for scale testing.
+
+Players are simulated season by season. Each team fills its squad with new
+players. Players then stay, transfer (mostly within their country) or
+retire. A share of each season's players also appears on loan at a second
+club. How often a player moves is drawn per player from a heavy-tailed
+distribution, so most players have a few clubs and a few journeymen have
+many. That gives the long-tailed degree distribution of the real data.
+
+Names and IDs go through the same steps as data_cleaning.ipynb. First_Season
+is the earliest season per (Name, Nationality), First_Team the first team
+per Name, and enhanced_player_id an md5 UUID of name, nationality, first
+season and first team. Homonyms therefore merge the way they do in the real
+data. --true-id adds the simulated identity as an extra column.
+
+Everything is vectorized with numpy and reproducible from --seed.
+
+Usage:
+    python generate_synthetic_squads.py --countries 20 --seasons 25 -o synthetic_squads.csv
+"""
+import argparse
+import hashlib
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Country codes as used in footballsquads.co.uk URLs; more countries get c<N>
+COUNTRY_CODES = ['eng', 'esp', 'ger', 'ita', 'fra', 'ned', 'por', 'sco', 'bel', 'tur',
+                 'bra', 'arg', 'usa', 'mex', 'jap', 'aus', 'swe', 'nor', 'den', 'sui',
+                 'aut', 'gre', 'rus', 'ukr', 'pol', 'cze', 'cro', 'srb', 'rom', 'bul']
+
+# Syllables for building team, first and last names
+SYLLABLES = ['ba', 'be', 'bo', 'da', 'de', 'di', 'do', 'fa', 'fe', 'ga', 'go', 'ka', 'ke',
+             'ko', 'la', 'le', 'li', 'lo', 'ma', 'me', 'mi', 'mo', 'na', 'ne', 'ni', 'no',
+             'pa', 'pe', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si', 'so', 'ta', 'te', 'ti',
+             'to', 'va', 've', 'vi', 'za', 'ze', 'zo', 'ran', 'len']
+
+def syllable_names(count, rng, min_syllables=2):
+    """
+    count distinct capitalized names made of syllables
+
+    Index i is spelled out in base len(SYLLABLES) after a random bijective
+    shuffle, so consecutive indices don't share prefixes.
+    """
+    base = len(SYLLABLES)
+    digits = min_syllables
+    while base ** digits < count:
+        digits += 1
+    space = base ** digits
+    # Multiplying by a number coprime to the space permutes it
+    multiplier = int(rng.integers(space // 3, space)) | 1
+    while np.gcd(multiplier, space) != 1:
+        multiplier += 2
+    codes = (np.arange(count, dtype=np.int64) * multiplier) % space
+
+    syllables = np.array(SYLLABLES, dtype=object)
+    names = syllables[codes % base]
+    for _ in range(digits - 1):
+        codes //= base
+        names = syllables[codes % base] + names
+    return pd.Series(names).str.capitalize().to_numpy(dtype=object)
+
+def simulate_careers(rng, team_country, teams_per_country, seasons, squad_size,
+                     transfer_rate, domestic_rate, retire_rate, loan_rate, isolated=None):
+    """
+    Simulate which player plays for which team in each season
+
+    isolated optionally marks teams whose country takes part in no
+    international transfers, so its players form a separate component.
+
+    Returns (row_player, row_team, row_season, player_first_season,
+    player_first_team, player_mobility). Row arrays have one entry per squad
+    listing; player arrays are indexed by player number.
+    """
+    n_teams = len(team_country)
+    first_season, first_team, mobility = [], [], []
+    next_player = 0
+
+    def new_players(teams, season):
+        nonlocal next_player
+        ids = np.arange(next_player, next_player + len(teams))
+        next_player += len(teams)
+        first_season.append(np.full(len(teams), season, dtype=np.int32))
+        first_team.append(teams.astype(np.int32))
+        # Gamma with shape < 1: most players rarely move, a few move often
+        mobility.append(rng.gamma(0.5, 2.0, len(teams)).astype(np.float32))
+        return ids
+
+    def random_domestic_team(teams):
+        country = team_country[teams]
+        return country * teams_per_country + rng.integers(0, teams_per_country, len(teams))
+
+    active_team = np.repeat(np.arange(n_teams), rng.poisson(squad_size, n_teams))
+    active_ids = new_players(active_team, 0)
+    all_mobility = np.concatenate(mobility)
+
+    row_player, row_team, row_season = [], [], []
+    for season in range(seasons):
+        if season > 0:
+            # Retirements
+            stay = rng.random(len(active_ids)) >= retire_rate
+            active_ids, active_team = active_ids[stay], active_team[stay]
+
+            # Transfers: per-player probability scaled by mobility
+            move_prob = np.minimum(transfer_rate * all_mobility[active_ids], 0.9)
+            move = rng.random(len(active_ids)) < move_prob
+            movers = active_team[move]
+            domestic = rng.random(len(movers)) < domestic_rate
+            domestic_team = random_domestic_team(movers)
+            foreign_team = rng.integers(0, n_teams, len(movers))
+            if isolated is not None:
+                domestic |= isolated[movers] | isolated[foreign_team]
+            active_team = active_team.copy()
+            active_team[move] = np.where(domestic, domestic_team, foreign_team)
+
+            # New players fill each squad up to this season's size
+            counts = np.bincount(active_team, minlength=n_teams)
+            deficit = np.clip(rng.poisson(squad_size, n_teams) - counts, 0, None)
+            joining_team = np.repeat(np.arange(n_teams), deficit)
+            active_ids = np.concatenate([active_ids, new_players(joining_team, season)])
+            active_team = np.concatenate([active_team, joining_team])
+            all_mobility = np.concatenate(mobility)
+
+        row_player.append(active_ids)
+        row_team.append(active_team)
+        row_season.append(np.full(len(active_ids), season, dtype=np.int32))
+
+        # Loans: the player is also listed by a second club that season
+        on_loan = rng.random(len(active_ids)) < loan_rate
+        loan_team = random_domestic_team(active_team[on_loan])
+        differs = loan_team != active_team[on_loan]
+        row_player.append(active_ids[on_loan][differs])
+        row_team.append(loan_team[differs])
+        row_season.append(np.full(int(differs.sum()), season, dtype=np.int32))
+
+    return (np.concatenate(row_player), np.concatenate(row_team), np.concatenate(row_season),
+            np.concatenate(first_season), np.concatenate(first_team), all_mobility)
+
+def uuid_from_md5(text):
+    """Same ID scheme as data_cleaning.ipynb: a UUID made from the md5 of a fingerprint"""
+    return str(uuid.UUID(hex=hashlib.md5(text.encode()).hexdigest()))
+
+def generate_squads(countries=10, leagues_per_country=2, teams_per_league=18, seasons=20,
+                    first_season=2000, squad_size=28, transfer_rate=0.15, domestic_rate=0.75,
+                    loan_rate=0.05, retire_rate=0.12, homonym_rate=0.02, isolated_countries=0,
+                    seed=0, true_id=False, dob=False, missing_dob_seasons=0, name_variant_rate=0.0):
+    """
+    Generate a DataFrame with the columns of squads_cleaned.csv
+
+    Args:
+        countries, leagues_per_country, teams_per_league: Size of the football world
+        seasons: Number of seasons, starting at first_season
+        squad_size: Mean players listed per team and season
+        transfer_rate: Mean chance that a player changes club between seasons
+        domestic_rate: Share of transfers that stay within the player's country
+        loan_rate: Chance that a player is also listed by a second club in a season
+        retire_rate: Chance that a player retires after a season
+        homonym_rate: Share of players who share their name with an earlier player
+        isolated_countries: Number of countries (the last ones) with no international
+            transfers, giving pairs of players with no connection
+        seed: Random seed; the same arguments and seed give the same data
+        true_id: Add a true_player_id column with the simulated identity
+        dob: Add a DOB column (dd-mm-yy), one date per simulated player
+        missing_dob_seasons: Leave DOB empty in this many of the first seasons,
+            like the older pages of the real archive
+        name_variant_rate: Share of players listed by first initial and surname
+            ("K. Benzema") in their first two seasons. Only the Name column
+            changes; the derived ID columns use the full name.
+
+    dob, missing_dob_seasons and name_variant_rate give entity resolution
+    something to resolve; with true_id, entity_resolution.py --evaluate
+    scores the result.
+    """
+    rng = np.random.default_rng(seed)
+
+    teams_per_country = leagues_per_country * teams_per_league
+    n_teams = countries * teams_per_country
+    team_country = np.arange(n_teams) // teams_per_country
+    team_league = team_country * leagues_per_country + (np.arange(n_teams) // teams_per_league) % leagues_per_country
+
+    row_player, row_team, row_season, p_first_season, p_first_team, _ = simulate_careers(
+        rng, team_country, teams_per_country, seasons, squad_size,
+        transfer_rate, domestic_rate, retire_rate, loan_rate,
+        isolated=team_country >= countries - isolated_countries if isolated_countries else None)
+    n_players = len(p_first_season)
+
+    # Lookup tables for the categorical columns
+    country_codes = np.array([COUNTRY_CODES[i] if i < len(COUNTRY_CODES) else f"c{i}"
+                              for i in range(countries)], dtype=object)
+    league_names = np.array([f"{country_codes[c]}prem" if level == 0 else f"{country_codes[c]}div{level}"
+                             for c in range(countries) for level in range(leagues_per_country)], dtype=object)
+    season_names = np.array([f"{y}-{y + 1}" for y in range(first_season, first_season + seasons)], dtype=object)
+    team_slugs = pd.Series(syllable_names(n_teams, rng)).str.lower().to_numpy(dtype=object)
+    team_titles = pd.Series(team_slugs).str.title().to_numpy(dtype=object)
+    club_ids = np.array([uuid_from_md5(f"{team}_{country_codes[c]}".lower())
+                         for team, c in zip(team_titles, team_country)], dtype=object)
+
+    # Player names: a unique surname each, then some players reuse an earlier player's name
+    first_names = syllable_names(400, rng)
+    names = first_names[rng.integers(0, len(first_names), n_players)] + " " + syllable_names(n_players, rng, 3)
+    homonym = rng.random(n_players) < homonym_rate
+    homonym[0] = False
+    source = (rng.random(n_players) * np.arange(n_players)).astype(np.int64)
+    names[homonym] = names[source[homonym]]
+
+    # Nationality: mostly the country of the player's first club
+    nat_country = np.where(rng.random(n_players) < 0.75, team_country[p_first_team],
+                           rng.integers(0, countries, n_players))
+    nationalities = pd.Series(country_codes[nat_country]).str.upper().to_numpy(dtype=object)
+
+    # First_Season / First_Team / enhanced_player_id, derived as in the cleaning notebook
+    players = pd.DataFrame({
+        'name': names,
+        'nationality': nationalities,
+        'first_season': p_first_season,
+        'first_team': p_first_team,
+    })
+    players['First_Season'] = players.groupby(['name', 'nationality'])['first_season'].transform('min')
+    order = players.sort_values(['first_season', 'first_team'], kind='stable')
+    first_team_by_name = order.groupby('name')['first_team'].first()
+    players['First_Team'] = players['name'].map(first_team_by_name)
+
+    fingerprints = (players['name'].str.lower().str.strip() + "_" + players['nationality'].str.lower()
+                    + "_" + season_names[players['First_Season']] + "_" + team_slugs[players['First_Team']])
+    distinct = fingerprints.unique()
+    id_codes = pd.Categorical(fingerprints, categories=distinct).codes
+    player_ids = np.array([uuid_from_md5(f) for f in distinct], dtype=object)[id_codes]
+
+    # Assemble rows, ordered like a scrape: by season, then team
+    order = np.lexsort((row_team, row_season))
+    row_player, row_team, row_season = row_player[order], row_team[order], row_season[order]
+    row_country = team_country[row_team]
+    df = pd.DataFrame({
+        'Country': pd.Categorical.from_codes(row_country, country_codes),
+        'Season': pd.Categorical.from_codes(row_season, season_names),
+        'LeagueName': pd.Categorical.from_codes(team_league[row_team], league_names),
+        'TeamURL': pd.Categorical.from_codes(
+            row_season * n_teams + row_team,
+            [f"https://www.footballsquads.co.uk/{country_codes[team_country[t]]}/{season}/"
+             f"{league_names[team_league[t]]}/{team_slugs[t]}.htm"
+             for season in season_names for t in range(n_teams)]),
+        'Name': names[row_player],
+        'Nationality': nationalities[row_player],
+        'team': pd.Categorical.from_codes(row_team, team_titles),
+        'First_Season': season_names[players['First_Season'].to_numpy()[row_player]],
+        'First_Team': team_slugs[players['First_Team'].to_numpy()[row_player]],
+        'enhanced_player_id': player_ids[row_player],
+        'club_id': pd.Categorical.from_codes(row_team, club_ids),
+    })
+    if dob:
+        dates = pd.Series([f"{d:02d}-{m:02d}-{y:02d}" for d, m, y in zip(
+            rng.integers(1, 29, n_players), rng.integers(1, 13, n_players), rng.integers(60, 100, n_players))])
+        df['DOB'] = dates.to_numpy(dtype=object)[row_player]
+        df.loc[row_season < missing_dob_seasons, 'DOB'] = np.nan
+    if name_variant_rate:
+        variant = rng.random(n_players) < name_variant_rate
+        early = variant[row_player] & (row_season < p_first_season[row_player] + 2)
+        parts = df.loc[early, 'Name'].str.split(' ', n=1)
+        df.loc[early, 'Name'] = parts.str[0].str[0] + '. ' + parts.str[1]
+    if true_id:
+        df['true_player_id'] = row_player
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic squads_cleaned.csv-shaped data')
+    parser.add_argument('--output', '-o', default='synthetic_squads.csv', help='Output CSV file')
+    parser.add_argument('--countries', type=int, default=10, help='Number of countries')
+    parser.add_argument('--leagues', type=int, default=2, help='Leagues per country')
+    parser.add_argument('--teams', type=int, default=18, help='Teams per league')
+    parser.add_argument('--seasons', type=int, default=20, help='Number of seasons')
+    parser.add_argument('--first-season', type=int, default=2000, help='Starting year of the first season')
+    parser.add_argument('--squad-size', type=float, default=28, help='Mean squad size')
+    parser.add_argument('--transfer-rate', type=float, default=0.15, help='Mean chance of changing club each season')
+    parser.add_argument('--domestic-rate', type=float, default=0.75, help='Share of transfers within a country')
+    parser.add_argument('--loan-rate', type=float, default=0.05, help='Chance of also being listed by a second club')
+    parser.add_argument('--retire-rate', type=float, default=0.12, help='Chance of retiring after each season')
+    parser.add_argument('--homonym-rate', type=float, default=0.02, help='Share of players reusing an earlier name')
+    parser.add_argument('--isolated-countries', type=int, default=0,
+                        help='Countries with no international transfers (disconnected from the rest)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--true-id', action='store_true', help='Add a true_player_id column')
+    parser.add_argument('--dob', action='store_true', help='Add a DOB column')
+    parser.add_argument('--missing-dob-seasons', type=int, default=0,
+                        help='Leave DOB empty in this many of the first seasons')
+    parser.add_argument('--name-variant-rate', type=float, default=0.0,
+                        help='Share of players listed by initial and surname in their first two seasons')
+    args = parser.parse_args()
+
+    start = time.time()
+    df = generate_squads(countries=args.countries, leagues_per_country=args.leagues,
+                         teams_per_league=args.teams, seasons=args.seasons,
+                         first_season=args.first_season, squad_size=args.squad_size,
+                         transfer_rate=args.transfer_rate, domestic_rate=args.domestic_rate,
+                         loan_rate=args.loan_rate, retire_rate=args.retire_rate,
+                         homonym_rate=args.homonym_rate, isolated_countries=args.isolated_countries,
+                         seed=args.seed, true_id=args.true_id, dob=args.dob,
+                         missing_dob_seasons=args.missing_dob_seasons,
+                         name_variant_rate=args.name_variant_rate)
+    generated = time.time() - start
+    print(f"Generated {len(df)} rows in {generated:.2f} seconds "
+          f"({df['enhanced_player_id'].nunique()} player IDs, "
+          f"{df.groupby(['club_id', 'Season'], observed=True).ngroups} team-seasons)")
+
+    df.to_csv(args.output)
+    print(f"Wrote {args.output} in {time.time() - start - generated:.2f} seconds")
+
+if __name__ == '__main__':
+    main()
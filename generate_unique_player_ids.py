@@ -1,8 +1,15 @@
-import pandas as pd
-import uuid
+import hashlib
 import re
+import time
 import unicodedata
+import uuid
 from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dataset_io
 
 def normalize_text(text):
     """Normalize text by removing special characters and standardizing format"""
@@ -21,53 +28,92 @@ def normalize_text(text):
     
     return text
 
-def generate_unique_player_ids(csv_path, output_path=None):
+def normalize_series(values):
+    """Vectorized normalize_text for a Series of strings; missing values become empty strings"""
+    text = values.fillna('').astype(str).str.lower()
+    text = text.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('utf-8')
+    text = text.str.replace(r'[^a-z0-9\s]', '', regex=True)
+    return text.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def normalize_column(values, cache):
+    """Normalize a column, running normalize_series only on values not already in cache"""
+    codes, uniques = pd.factorize(values)
+    new = [value for value in uniques if value not in cache]
+    if new:
+        cache.update(zip(new, normalize_series(pd.Series(new, dtype=object))))
+    normalized = np.array([cache[value] for value in uniques] + [''], dtype=object)
+    # factorize gives missing values code -1, which picks the trailing ''
+    return normalized[codes]
+
+def player_id_from_key(identity_key):
+    """Deterministic player ID: a UUID made from the md5 of the identity key"""
+    return str(uuid.UUID(hex=hashlib.md5(identity_key.encode()).hexdigest()))
+
+def identity_keys(df, name_cache, team_cache):
+    """Identity keys (normalized name and first team) for the rows of a chunk"""
+    names = normalize_column(df['Name'], name_cache)
+    teams = normalize_column(df['First_Team'], team_cache)
+    return names + '_' + teams
+
+def generate_unique_player_ids(csv_path, output_path=None, chunksize=200000, registry=None):
     """
     Generate unique player IDs based on Name and First_Team only.
     
+    The data is read and written chunk by chunk. Each distinct name and team is
+    normalized once, and IDs are hashed from the normalized key, so the same
+    player gets the same ID on every run.
+    
     Args:
-        csv_path: Path to the input CSV file
-        output_path: Path for the output CSV file. If None, will add timestamp to original filename.
+        csv_path: Path to the input file (.csv, .npz or .parquet, see dataset_io.py)
+        output_path: Path for the output file, in the format its extension names.
+            If None, will add timestamp to original filename.
+        chunksize: Rows read and written at a time
+        registry: Optional PlayerIdRegistry. Identities it already knows keep
+            their registered ID; new ones are hashed and added to it.
     """
-    print(f"Loading data from {csv_path}...")
-    df = pd.read_csv(csv_path)
-    
     # Create a backup before making changes
     if output_path is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = csv_path.replace('.csv', f'_new_{timestamp}.csv')
+        path = Path(csv_path)
+        output_path = str(path.with_name(f"{path.stem}_new_{timestamp}{path.suffix}"))
     
-    # Create a mapping dictionary to track player identities
+    # Normalized text by raw value, and player ID by identity key
+    name_cache = {}
+    team_cache = {}
     player_map = {}
-    new_player_ids = []
+    total_rows = 0
+    start = time.perf_counter()
     
-    print("Generating unique player IDs...")
-    for _, row in df.iterrows():
-        name = normalize_text(row['Name'])
-        team = normalize_text(row['First_Team']) if pd.notna(row['First_Team']) else ""
-        
-        # Create a composite key for uniqueness using only name and first team
-        identity_key = f"{name}_{team}"
-        
-        # Use existing mapping or create new UUID
-        if identity_key in player_map:
-            new_id = player_map[identity_key]
-        else:
-            new_id = str(uuid.uuid4())
-            player_map[identity_key] = new_id
+    print(f"Generating unique player IDs from {csv_path}...")
+    reader = dataset_io.iter_dataset(csv_path, chunksize=chunksize, dtype={'Name': str, 'First_Team': str})
+    with dataset_io.DatasetWriter(output_path) as writer:
+        for df in reader:
+            # Create a composite key for uniqueness using only name and first team
+            codes, unique_keys = pd.factorize(identity_keys(df, name_cache, team_cache))
+            unseen = [key for key in unique_keys if key not in player_map]
+            if registry is not None and unseen:
+                player_map.update(zip(unseen, registry.assign(unseen, player_id_from_key)))
+            else:
+                player_map.update((key, player_id_from_key(key)) for key in unseen)
+            ids = [player_map[key] for key in unique_keys]
             
-        new_player_ids.append(new_id)
-    
-    # Remove the old player_id column and add the new one
-    if 'player_id' in df.columns:
-        df = df.drop('player_id', axis=1)
-    
-    df['player_id'] = new_player_ids
+            # Remove the old player_id column and add the new one
+            if 'player_id' in df.columns:
+                df = df.drop('player_id', axis=1)
+            df['player_id'] = np.array(ids, dtype=object)[codes]
+            
+            writer.write(df)
+            total_rows += len(df)
+            elapsed = time.perf_counter() - start
+            print(f"Processed {total_rows} rows ({total_rows / elapsed:,.0f} rows/sec)")
     
-    print(f"Saving updated data to {output_path}...")
-    df.to_csv(output_path, index=False)
-    print(f"Successfully generated unique player IDs for {len(df)} records")
+    elapsed = time.perf_counter() - start
+    print(f"Saved updated data to {output_path}")
+    print(f"Successfully generated unique player IDs for {total_rows} records "
+          f"in {elapsed:.2f} seconds ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
     print(f"Number of unique players identified: {len(player_map)}")
+    if registry is not None:
+        print(f"New players added to registry {registry.path}: {registry.added}")
     
     return output_path
 
@@ -75,10 +121,17 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Generate unique player IDs based on Name and First_Team")
-    parser.add_argument("input_csv", help="Path to the input CSV file")
-    parser.add_argument("--output", "-o", help="Path for the output CSV file (optional)")
+    parser.add_argument("input_csv", help="Path to the input file (.csv, .npz or .parquet)")
+    parser.add_argument("--output", "-o", help="Path for the output file (optional); its extension sets the format")
+    parser.add_argument("--chunksize", type=int, default=200000, help="Rows to process at a time")
+    parser.add_argument("--registry", help="Player-ID registry (SQLite) that keeps IDs stable across runs")
     
     args = parser.parse_args()
     
-    output_file = generate_unique_player_ids(args.input_csv, args.output)
+    if args.registry:
+        from player_id_registry import PlayerIdRegistry
+        with PlayerIdRegistry(args.registry, source=args.input_csv) as registry:
+            output_file = generate_unique_player_ids(args.input_csv, args.output, args.chunksize, registry)
+    else:
+        output_file = generate_unique_player_ids(args.input_csv, args.output, args.chunksize)
     print(f"Process completed. Updated file saved to: {output_file}") 
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""
+Background jobs for graph analytics that are too slow for a normal request.
+
+Submitted jobs wait in a bounded in-process queue. A dispatcher thread feeds
+them to a small process pool, keeping no more jobs in flight than there are
+workers. Workers forked from the web process inherit the loaded graph
+copy-on-write. Finished results are cached on disk under
+<cache_dir>/<graph version>/, so a repeated job on the same graph is answered
+without recomputing, and a new graph never serves stale results.
+
+Job records (status and timings) are kept on disk too, under
+<cache_dir>/<graph version>/jobs/<job id>.json. Under serve.py a status poll
+can land on any worker, not just the one running the job, so every process
+reads them from there (read_job). Finished records are deleted after a TTL.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import re
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy as np
+
+import metrics
+import player_connections as pc
+
+# Limits on job size, so a single job can't occupy a worker indefinitely
+MAX_MATRIX_PLAYERS = 200
+MAX_PAIRS = 1000
+
+# Job IDs are uuid4 hex strings; anything else is rejected before touching the disk
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Graph used by the job functions inside worker processes
+_worker_graph = None
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+def distance_matrix(G, players, max_distance=None):
+    """Shortest path lengths between every pair of the given players (None if unconnected)"""
+    distances = []
+    for source in players:
+        lengths = G.distances_from(source, max_distance)[players].tolist()
+        distances.append([length if length >= 0 else None for length in lengths])
+
+    return {
+        'players': [pc.player_uuid(G, p) for p in players],
+        'names': [G.name(p, str(p)) for p in players],
+        'distances': distances,
+    }
+
+def shortest_path_counts(G, pairs):
+    """Distance and number of distinct shortest paths for each pair of players"""
+    results = []
+    for source, target in pairs:
+        distance, count = pc.count_shortest_paths(G, source, target)
+        results.append({
+            'from': pc.player_uuid(G, source),
+            'to': pc.player_uuid(G, target),
+            'distance': distance,
+            'count': count,
+        })
+    return {'pairs': results}
+
+def graph_stats(G):
+    """Size, connectivity and degree statistics for the whole graph"""
+    nodes = list(G)
+    degrees = G.degrees()[nodes].tolist()
+    labels = G.component_labels()
+    components = sorted(np.bincount(labels[labels >= 0]).tolist(), reverse=True)
+    top_players = sorted(zip(nodes, degrees), key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        'nodes': G.number_of_nodes(),
+        'edges': G.number_of_edges(),
+        'components': len(components),
+        'largest_component': components[0] if components else 0,
+        'isolated_players': sum(1 for d in degrees if d == 0),
+        'degree': {
+            'min': min(degrees) if degrees else 0,
+            'max': max(degrees) if degrees else 0,
+            'mean': statistics.fmean(degrees) if degrees else 0,
+            'median': statistics.median(degrees) if degrees else 0,
+        },
+        'most_connected': [
+            {'id': pc.player_uuid(G, p), 'name': G.name(p, str(p)), 'teammates': d}
+            for p, d in top_players
+        ],
+    }
+
+JOB_KINDS = {
+    'distance_matrix': distance_matrix,
+    'shortest_path_counts': shortest_path_counts,
+    'graph_stats': graph_stats,
+}
+
+def validate_job(node_ids, kind, params):
+    """
+    Check a job request up front; raises ValueError describing the problem
+
+    Players are given by their public IDs (UUIDs); node_ids maps those to
+    graph nodes.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}. Expected one of: {', '.join(JOB_KINDS)}")
+    if not isinstance(params, dict):
+        raise ValueError("Job params must be an object")
+
+    if kind == 'distance_matrix':
+        players = params.get('players')
+        if not isinstance(players, list) or not players:
+            raise ValueError("distance_matrix needs a non-empty 'players' list")
+        if len(players) > MAX_MATRIX_PLAYERS:
+            raise ValueError(f"distance_matrix accepts at most {MAX_MATRIX_PLAYERS} players")
+        missing = [p for p in players if p not in node_ids]
+        if missing:
+            raise ValueError(f"Players not found in graph: {', '.join(map(str, missing[:5]))}")
+        max_distance = params.get('max_distance')
+        if max_distance is not None and (not isinstance(max_distance, int) or max_distance < 0):
+            raise ValueError("max_distance must be a non-negative integer")
+        if set(params) - {'players', 'max_distance'}:
+            raise ValueError("distance_matrix accepts only 'players' and 'max_distance'")
+
+    elif kind == 'shortest_path_counts':
+        pairs = params.get('pairs')
+        if not isinstance(pairs, list) or not pairs:
+            raise ValueError("shortest_path_counts needs a non-empty 'pairs' list")
+        if len(pairs) > MAX_PAIRS:
+            raise ValueError(f"shortest_path_counts accepts at most {MAX_PAIRS} pairs")
+        for pair in pairs:
+            if not isinstance(pair, list) or len(pair) != 2:
+                raise ValueError("Each pair must be a list of two player IDs")
+            missing = [p for p in pair if p not in node_ids]
+            if missing:
+                raise ValueError(f"Players not found in graph: {', '.join(map(str, missing))}")
+        if set(params) - {'pairs'}:
+            raise ValueError("shortest_path_counts accepts only 'pairs'")
+
+    elif kind == 'graph_stats' and params:
+        raise ValueError("graph_stats takes no params")
+
+def to_node_params(node_ids, kind, params):
+    """Job params with public player IDs replaced by graph nodes"""
+    if kind == 'distance_matrix':
+        return dict(params, players=[node_ids[p] for p in params['players']])
+    if kind == 'shortest_path_counts':
+        return dict(params, pairs=[[node_ids[p] for p in pair] for pair in params['pairs']])
+    return params
+
+def run_job(kind, params):
+    """Entry point inside a worker process"""
+    return JOB_KINDS[kind](_worker_graph, **params)
+
+def write_json(path, data):
+    """Write JSON to path atomically, so readers in other processes never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_file.write_text(json.dumps(data))
+    tmp_file.replace(path)
+
+def result_path(cache_dir, graph_version, kind, params):
+    """Cache file for the result of a job on a graph version"""
+    key = json.dumps({'kind': kind, 'params': params}, sort_keys=True)
+    return Path(cache_dir) / graph_version / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+def read_job(cache_dir, job_id):
+    """A job's record, written by whichever process runs it, or None if unknown"""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    for path in Path(cache_dir).glob(f"*/jobs/{job_id}.json"):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None  # Pruned between the glob and the read
+    return None
+
+def read_result(cache_dir, job):
+    """Result of a finished job, loaded from the on-disk cache"""
+    if job['status'] != 'done':
+        return None
+    return json.loads(result_path(cache_dir, job['graph_version'], job['kind'], job['params']).read_text())
+
+def wait_for_change(cache_dir, job_id, last_status, timeout=15, poll_interval=0.25):
+    """
+    Poll a job's record until its status differs from last_status (or timeout)
+
+    Returns the latest record, or None if the job is no longer known. Polling
+    the file works from any process, whichever one runs the job.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = read_job(cache_dir, job_id)
+        if job is None or job['status'] != last_status or time.monotonic() >= deadline:
+            return job
+        time.sleep(poll_interval)
+
+class JobManager:
+    """
+    Runs submitted jobs in a bounded process pool and records their progress on disk
+
+    Args:
+        graph: The loaded player graph
+        graph_version: Fingerprint of the graph, used to key the result cache
+        node_ids: Public player IDs (UUIDs) to graph nodes
+        cache_dir: Directory for cached results and job records
+        max_workers: Number of worker processes (and jobs running at once)
+        max_queued: Number of jobs that may wait for a worker
+        record_ttl: Seconds to keep the records of finished jobs
+    """
+
+    # Seconds between sweeps for expired job records
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, graph, graph_version, node_ids, cache_dir='job_cache', max_workers=2, max_queued=100,
+                 record_ttl=24 * 3600):
+        self.graph_version = graph_version
+        self.node_ids = node_ids
+        self.cache_root = Path(cache_dir)
+        self.cache_dir = self.cache_root / graph_version
+        self.max_workers = max_workers
+        self.record_ttl = record_ttl
+
+        self._graph = graph
+        self._pool_lock = threading.Lock()
+        self._executor = self._start_pool()
+
+        self._closed = False
+        self._last_prune = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._slots = threading.Semaphore(max_workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def _start_pool(self):
+        # Fork where available so workers share the graph instead of unpickling a copy
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(self._graph,))
+
+    def _restart_pool(self, broken):
+        """Replace a pool that broke because a worker died (e.g. killed for using too much memory)"""
+        with self._pool_lock:
+            if self._executor is not broken or self._closed:
+                return
+            print("A job worker died; starting a new worker pool")
+            broken.shutdown(wait=False)
+            self._executor = self._start_pool()
+
+    def _record_path(self, job_id):
+        return self.cache_dir / 'jobs' / f"{job_id}.json"
+
+    def _update(self, job, **changes):
+        job.update(changes)
+        write_json(self._record_path(job['id']), job)
+
+    def submit(self, kind, params):
+        """Queue a job and return its record; served from cache if already computed"""
+        if self._closed:
+            raise JobQueueFull("Job manager is closed; a newer graph version is live")
+        self._prune_records()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'params': params,
+            'status': 'queued',
+            'graph_version': self.graph_version,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'cached': False,
+            'error': None,
+        }
+
+        if result_path(self.cache_root, self.graph_version, kind, params).exists():
+            metrics.inc('cache_hits_total', cache='jobs')
+            self._update(job, status='done', cached=True, finished_at=time.time())
+            return dict(job)
+
+        # Record the job before queueing it, so the dispatcher's updates always come after
+        self._update(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._record_path(job['id']).unlink(missing_ok=True)
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+        return dict(job)
+
+    def _dispatch(self):
+        while True:
+            job = self._queue.get()
+            if self._closed:
+                self._update(job, status='failed', error='Graph was reloaded before the job started',
+                             finished_at=time.time())
+                continue
+            self._slots.acquire()
+            self._update(job, status='running', started_at=time.time())
+            try:
+                future, executor = self._start_job(job)
+            except Exception as e:
+                # Without this the dispatcher thread would die, leaving this
+                # job running and every later one queued forever
+                self._slots.release()
+                print(f"Job {job['id']} ({job['kind']}) could not start: {e}")
+                self._update(job, status='failed', error=f"Could not start job: {e}", finished_at=time.time())
+                continue
+            future.add_done_callback(lambda f, job=job, executor=executor: self._finish(job, f, executor))
+
+    def _start_job(self, job):
+        """Submit a job to the pool; returns the future and the pool it went to"""
+        params = to_node_params(self.node_ids, job['kind'], job['params'])
+        executor = self._executor
+        try:
+            return executor.submit(run_job, job['kind'], params), executor
+        except BrokenProcessPool:
+            # A worker died since the last job started; a dead worker breaks
+            # the whole pool, so give this job a fresh one
+            self._restart_pool(executor)
+            executor = self._executor
+            return executor.submit(run_job, job['kind'], params), executor
+
+    def _finish(self, job, future, executor):
+        self._slots.release()
+        try:
+            result = future.result()
+            write_json(result_path(self.cache_root, self.graph_version, job['kind'], job['params']), result)
+            self._update(job, status='done', finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            self._update(job, status='failed', error=str(e) or type(e).__name__, finished_at=time.time())
+            if isinstance(e, BrokenProcessPool):
+                self._restart_pool(executor)
+
+    def _prune_records(self):
+        """Delete records of jobs that finished more than record_ttl ago, at most once per PRUNE_INTERVAL"""
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        for path in self.cache_root.glob('*/jobs/*.json'):
+            try:
+                # Cheap check first: a record is rewritten on every status change
+                if now - path.stat().st_mtime < self.record_ttl:
+                    continue
+                job = json.loads(path.read_text())
+                if job['status'] in ('done', 'failed'):
+                    path.unlink()
+            except (OSError, ValueError, KeyError):
+                continue  # Removed by another process, or mid-replace
+
+    def close(self):
+        """
+        Stop starting new jobs, e.g. because a new graph version went live
+
+        Running jobs finish and their results stay readable; queued jobs fail.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False)
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
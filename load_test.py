@@ -0,0 +1,352 @@
+"""
+Load generator for the player connections web app.
+
+N client threads, each with its own keep-alive connection, send a weighted
+mix of traffic for a fixed time or number of requests:
+- autocomplete: a burst of /api/players requests, as if someone typed a
+  name one letter at a time
+- connection: POST /api/find_connection between two random players
+- stream: the same search through /api/find_connection/stream
+- debug: /api/player_debug lookups
+
+With --replay, connection queries are taken from a slow-query log
+(slow_query_log.py) instead, so the worst queries seen in production can be
+re-run under load. Players for the generated mix are found through
+/api/players, so the load generator needs nothing but the server's URL.
+
+At the end, throughput, latency percentiles per kind of request and
+errors are printed, and optionally written as JSON.
+
+Usage:
+    python load_test.py --url http://127.0.0.1:8000 --clients 16 --duration 30
+    python load_test.py --spawn --workers 4 --clients 32 --mix autocomplete=50,connection=50
+    python load_test.py --url http://127.0.0.1:8000 --replay logs/slow_queries.jsonl
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+import slow_query_log
+
+DEFAULT_MIX = 'autocomplete=60,connection=30,stream=5,debug=5'
+
+# Two-letter fragments used to discover players through autocomplete
+DISCOVERY_QUERIES = ['an', 'ar', 'er', 'ma', 'ra', 'el', 'in', 'on', 'le', 'ro', 'al', 'en',
+                     'de', 'ri', 'la', 'na', 'is', 'or', 'mi', 'to', 'sa', 'ch', 'ba', 'ko']
+
+def parse_mix(text):
+    """Parse 'kind=weight,...' into {kind: weight}"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in ('autocomplete', 'connection', 'stream', 'debug'):
+            raise ValueError(f"Unknown traffic kind: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+class Client:
+    """One keep-alive HTTP connection; reconnects after errors"""
+
+    def __init__(self, url, timeout):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """Send one request; returns (status, body bytes) and reads the whole response"""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {'Accept-Encoding': 'identity'}
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+def discover_players(url, timeout, limit=300):
+    """Collect (id, name) pairs through the autocomplete endpoint"""
+    client = Client(url, timeout)
+    players = {}
+    for query in DISCOVERY_QUERIES:
+        status, body = client.request('GET', f"/api/players?{urllib.parse.urlencode({'q': query})}")
+        if status != 200:
+            continue
+        for match in json.loads(body):
+            players[match['id']] = match['label'].split(' - ')[0]
+        if len(players) >= limit:
+            break
+    client.close()
+    return list(players.items())
+
+class LoadTest:
+    """
+    Runs the client threads and collects results
+
+    Args:
+        url: Base URL of the server
+        mix: {kind: weight} for the generated traffic
+        players: [(id, name)] to build requests from
+        replay: Optional list of slow-query log entries to replay instead
+        clients: Number of concurrent client threads
+        duration: Seconds to run (ignored if requests is set)
+        requests: Total number of operations to send
+        timeout: Socket timeout per request in seconds
+        seed: Random seed for request selection
+    """
+
+    def __init__(self, url, mix, players, replay=None, clients=8, duration=10.0,
+                 requests=None, timeout=30.0, seed=0):
+        self.url = url
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.players = players
+        self.replay = replay
+        self.clients = clients
+        self.duration = duration
+        self.requests = requests
+        self.timeout = timeout
+        self.seed = seed
+
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.latencies = {}
+        self.errors = {}
+        self.truncated = 0
+
+    def record(self, kind, seconds, error=None, truncated=False):
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+            self.truncated += truncated
+            if error:
+                key = f"{kind}: {error}"
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def take_ticket(self):
+        """Claim the next operation; False once the request budget is spent"""
+        with self.lock:
+            if self.requests is not None and self.sent >= self.requests:
+                return False
+            self.sent += 1
+            return True
+
+    def timed(self, client, kind, method, path, body=None):
+        start = time.perf_counter()
+        error, truncated = None, False
+        try:
+            status, data = client.request(method, path, body)
+            if status >= 400:
+                error = f"HTTP {status}"
+            elif kind in ('connection', 'replay'):
+                # Searches stopped by the server's compute budget
+                truncated = bool(json.loads(data).get('truncated'))
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            error = type(e).__name__
+        self.record(kind, time.perf_counter() - start, error, truncated)
+
+    def connection_body(self, rng):
+        (id1, name1), (id2, name2) = rng.sample(self.players, 2)
+        return {'player1_id': id1, 'player2_id': id2, 'player1': name1, 'player2': name2}
+
+    def run_operation(self, client, rng):
+        if self.replay:
+            entry = rng.choice(self.replay)
+            body = {key: entry[key] for key in ('player1_id', 'player2_id', 'player1', 'player2')
+                    if entry.get(key)}
+            self.timed(client, 'replay', 'POST', '/api/find_connection', body)
+            return
+
+        kind = rng.choices(self.kinds, self.weights)[0]
+        if kind == 'autocomplete':
+            # Typing a name: one request per keystroke from the second letter on
+            name = rng.choice(self.players)[1]
+            for length in range(2, min(len(name), 8) + 1):
+                query = urllib.parse.urlencode({'q': name[:length]})
+                self.timed(client, kind, 'GET', f"/api/players?{query}")
+        elif kind == 'connection':
+            self.timed(client, kind, 'POST', '/api/find_connection', self.connection_body(rng))
+        elif kind == 'stream':
+            self.timed(client, kind, 'POST', '/api/find_connection/stream', self.connection_body(rng))
+        elif kind == 'debug':
+            query = urllib.parse.urlencode({'name': rng.choice(self.players)[1]})
+            self.timed(client, kind, 'GET', f"/api/player_debug?{query}")
+
+    def worker(self, index, deadline):
+        rng = random.Random(self.seed * 1000 + index)
+        client = Client(self.url, self.timeout)
+        while (self.requests is not None or time.perf_counter() < deadline) and self.take_ticket():
+            self.run_operation(client, rng)
+        client.close()
+
+    def run(self):
+        threads = []
+        start = time.perf_counter()
+        deadline = start + self.duration
+        for i in range(self.clients):
+            thread = threading.Thread(target=self.worker, args=(i, deadline), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        total = sum(len(v) for v in self.latencies.values())
+        errors = sum(self.errors.values())
+        summary = {
+            'clients': self.clients,
+            'elapsed_seconds': round(elapsed, 3),
+            'requests': total,
+            'requests_per_sec': round(total / elapsed, 1) if elapsed else 0,
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0,
+            'error_breakdown': dict(sorted(self.errors.items())),
+            'truncated_searches': self.truncated,
+            'latency': {kind: percentiles(samples) for kind, samples in sorted(self.latencies.items())},
+        }
+        all_samples = [s for samples in self.latencies.values() for s in samples]
+        if all_samples:
+            summary['latency']['all'] = percentiles(all_samples)
+        return summary
+
+def percentiles(samples):
+    ms = sorted(s * 1000 for s in samples)
+
+    def at(fraction):
+        return round(ms[min(len(ms) - 1, int(len(ms) * fraction))], 2)
+
+    return {'count': len(ms), 'mean_ms': round(statistics.fmean(ms), 2), 'p50_ms': at(0.50),
+            'p90_ms': at(0.90), 'p99_ms': at(0.99), 'max_ms': round(ms[-1], 2)}
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_seconds']:.1f} s "
+          f"with {summary['clients']} clients: {summary['requests_per_sec']:.1f} req/s, "
+          f"{summary['errors']} errors ({summary['error_rate']:.2%})")
+    print(f"{'kind':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+    for kind, stats in summary['latency'].items():
+        print(f"{kind:<14}{stats['count']:>8}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+    if summary['truncated_searches']:
+        print(f"  {summary['truncated_searches']} searches were cut short by the server's budget")
+    for error, count in summary['error_breakdown'].items():
+        print(f"  error {error}: {count}")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(url, timeout):
+    """Poll /readyz until the server reports ready; returns False on timeout"""
+    client = Client(url, 5)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _ = client.request('GET', '/readyz')
+            if status == 200:
+                client.close()
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    client.close()
+    return False
+
+def spawn_server(workers, no_threads):
+    """Start serve.py on a free local port; returns (process, url)"""
+    port = free_port()
+    command = [sys.executable, str(Path(__file__).resolve().parent / 'serve.py'),
+               '--port', str(port), '--workers', str(workers)]
+    if no_threads:
+        command.append('--no-threads')
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process, f"http://127.0.0.1:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the player connections web app')
+    parser.add_argument('--url', help='Base URL of a running server')
+    parser.add_argument('--spawn', action='store_true',
+                        help='Start serve.py (in the current directory) for the test')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for --spawn')
+    parser.add_argument('--no-threads', action='store_true', help='Pass --no-threads to serve.py')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to run')
+    parser.add_argument('--requests', type=int, help='Stop after this many operations instead')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"Traffic weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--replay', help='Replay connection queries from a slow-query log')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', '-o', help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    if not args.url and not args.spawn:
+        parser.error('give --url of a running server, or --spawn to start one')
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    process = None
+    url = args.url
+    if args.spawn:
+        process, url = spawn_server(args.workers, args.no_threads)
+        print(f"Started serve.py with {args.workers} workers at {url}")
+    try:
+        if not wait_until_ready(url, timeout=120):
+            print(f"Server at {url} did not become ready")
+            sys.exit(1)
+
+        replay = None
+        if args.replay:
+            replay = [e for e in slow_query_log.read_entries(args.replay)
+                      if e.get('player1_id') or e.get('player1')]
+            if not replay:
+                print(f"No replayable queries in {args.replay}")
+                sys.exit(1)
+            print(f"Replaying {len(replay)} logged queries")
+        players = discover_players(url, args.timeout)
+        if len(players) < 2 and not replay:
+            print("Could not find players through /api/players")
+            sys.exit(1)
+        print(f"Found {len(players)} players; running {args.clients} clients...")
+
+        test = LoadTest(url, mix, players, replay=replay, clients=args.clients,
+                        duration=args.duration, requests=args.requests,
+                        timeout=args.timeout, seed=args.seed)
+        summary = test.run()
+        summary['mix'] = {'replay': args.replay} if replay else mix
+        print_report(summary)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Report written to {args.output}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Performance instrumentation for the player connections app.
+
+Stage timers, counters and latency histograms, rendered in the Prometheus
+text format for the /metrics endpoint, plus one structured JSON log line per
+request with the time spent in each stage.
+
+Everything is off unless FOOTBALL_LINKS_METRICS=1 is set (or enable() is
+called). When disabled, stage() returns a shared no-op context manager and
+inc()/observe() return on their first line, so instrumented hot paths cost
+one function call.
+
+Each process keeps its own registry; with serve.py every worker reports
+only the requests it handled.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('FOOTBALL_LINKS_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+
+# Stage timings and counters for the request being handled, if any
+_current_request = contextvars.ContextVar('football_links_request', default=None)
+
+request_log = logging.getLogger('football_links.requests')
+
+def enable():
+    """Turn instrumentation on and send per-request logs to stderr"""
+    global ENABLED
+    ENABLED = True
+    if not request_log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        request_log.addHandler(handler)
+        request_log.setLevel(logging.INFO)
+        request_log.propagate = False
+
+def describe(name, text):
+    """Set the HELP text shown for a metric"""
+    _help[name] = text
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """Add value to a counter"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    record = _current_request.get()
+    if record is not None:
+        record['counters'][name] = record['counters'].get(name, 0) + value
+
+def observe(name, value, **labels):
+    """Record one observation in a histogram"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _StageTimer:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        record = _current_request.get()
+        if record is None:
+            observe('stage_duration_seconds', elapsed, stage=self.name)
+        else:
+            # Summed per request and observed once the request finishes
+            stages = record['stages']
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+def stage(name):
+    """
+    Context manager timing one stage of work (name resolution, BFS, ...)
+
+    Inside a request, time is added to that request's total for the stage;
+    otherwise it is observed directly.
+    """
+    if not ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(name)
+
+def start_request():
+    """Begin collecting stage timings and counters for a request"""
+    if not ENABLED:
+        return None
+    record = {'start': time.perf_counter(), 'stages': {}, 'counters': {}}
+    _current_request.set(record)
+    return record
+
+def finish_request(record, route, method, status):
+    """Record a finished request's latency and stages, and log it as one JSON line"""
+    if record is None:
+        return
+    if _current_request.get() is record:
+        _current_request.set(None)
+    elapsed = time.perf_counter() - record['start']
+    observe('http_request_duration_seconds', elapsed, route=route, method=method)
+    inc('http_requests_total', route=route, method=method, status=str(status))
+    for name, seconds in record['stages'].items():
+        observe('stage_duration_seconds', seconds, stage=name)
+
+    request_log.info(json.dumps({
+        'route': route,
+        'method': method,
+        'status': status,
+        'duration_ms': round(elapsed * 1000, 2),
+        'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in record['stages'].items()},
+        'counters': record['counters'],
+    }))
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in items)
+    return '{' + ','.join(escaped) + '}'
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                      for key, h in _histograms.items()}
+
+    lines = []
+    for metric_type, series in (('counter', counters), ('histogram', histograms)):
+        for name in sorted({name for name, _ in series}):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (series_name, labels), value in sorted(series.items()):
+                if series_name != name:
+                    continue
+                if metric_type == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, value['buckets']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    """Clear all recorded metrics"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+describe('http_requests_total', 'Requests handled, by route, method and status')
+describe('http_request_duration_seconds', 'Request latency by route')
+describe('stage_duration_seconds', 'Time spent per request in each processing stage')
+describe('path_nodes_expanded_total', 'Nodes expanded by path searches')
+describe('paths_enumerated_total', 'Shortest paths enumerated')
+describe('path_searches_truncated_total', 'Path searches stopped by their compute budget')
+describe('cache_hits_total', 'Cache hits, by cache')
+describe('cache_misses_total', 'Cache misses, by cache')
+
+if ENABLED:
+    enable()
@@ -1,45 +1,49 @@
+import numpy as np
 import pandas as pd
 import networkx as nx
 from pathlib import Path
 import argparse
 import json
+import pickle
+import time
+import gc
+import hashlib
+import mmap
+import re
+import sys
+import os
+import itertools
+import multiprocessing
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 
-def build_graph(csv_file='squads_cleaned.csv', sample_size=None):
+import dataset_io
+import metrics
+
+# Columns build_graph reads; club_id is used when present
+GRAPH_COLUMNS = ['Name', 'team', 'Season', 'LeagueName', 'enhanced_player_id', 'club_id']
+
+def build_graph(csv_file='squads_cleaned.csv', sample_size=None, filters=None):
     """
     Build a graph of player connections based on shared teams
     
     Args:
-        csv_file: Path to the CSV file
+        csv_file: Path to the data file (.csv, .npz or .parquet, see dataset_io.py)
         sample_size: If provided, limit to this many rows (for testing)
+        filters: Optional dict of column -> allowed values, e.g.
+            {'Season': ['2019-2020'], 'LeagueName': ['faprem']}
     """
     print("Loading data...")
-    # Load the CSV file with chunks to manage memory better
+    columns = dataset_io.dataset_columns(csv_file)
+    print("Available columns:", columns)
+    
+    # Only read the columns the graph needs; columnar files skip the rest entirely
+    columns_to_keep = [c for c in GRAPH_COLUMNS if c in columns]
+    df = dataset_io.read_dataset(csv_file, columns=columns_to_keep, filters=filters, nrows=sample_size)
     if sample_size:
         # Use a smaller sample for testing
-        df = pd.read_csv(csv_file, nrows=sample_size)
         print(f"Using sample of {sample_size} rows for testing")
-    else:
-        # Process the file in chunks to manage memory better
-        chunks = []
-        chunksize = 100000  # Adjust based on available memory
-        
-        for chunk in pd.read_csv(csv_file, chunksize=chunksize):
-            # Check column names in first chunk
-            if len(chunks) == 0:
-                print("Available columns:", chunk.columns.tolist())
-            
-            # Use enhanced_player_id instead of uuid
-            chunk = chunk.dropna(subset=['Name', 'team', 'enhanced_player_id'])
-            
-            # Keep needed columns
-            columns_to_keep = ['Name', 'team', 'Season', 'LeagueName', 'enhanced_player_id']
-            if 'club_id' in chunk.columns:
-                columns_to_keep.append('club_id')
-            
-            chunks.append(chunk[columns_to_keep])
-            
-        df = pd.concat(chunks)
-        print(f"Loaded {len(df)} rows from {csv_file}")
+    print(f"Loaded {len(df)} rows from {csv_file}" + (f" matching {filters}" if filters else ""))
     
     # Clean up the data
     print("Cleaning data...")
@@ -63,144 +67,107 @@ def build_graph(csv_file='squads_cleaned.csv', sample_size=None):
     # Filter out likely headers
     df = df[~df['Name'].apply(is_likely_header)]
     
-    # Create a graph
-    print("Building graph...")
-    G = nx.Graph()
-    
-    # Dictionary to store connection details (which team and season players were together)
-    connection_details = {}
+    # Nodes are dense integer IDs; each player's UUID is stored once, in the
+    # graph's UUID table, and only used at the API boundary
+    node_ids, uuid_table = assign_node_ids(df['enhanced_player_id'])
+    df = df.assign(node_id=node_ids)
     
-    # Dictionary to map player IDs to player names for node labels
-    player_id_to_name = {}
+    print("Building graph...")
     
     # Group players by team and season to create connections
     # Use club_id for team identification
     if 'club_id' in df.columns:
         print("Using club_id for team identification")
-        team_seasons = df.groupby(['club_id', 'Season'])
         team_id_field = 'club_id'
     else:
         print("Using team name for team identification")
-        team_seasons = df.groupby(['team', 'Season'])
         team_id_field = 'team'
+    team_seasons = df.groupby([team_id_field, 'Season'])
+    df = df.assign(team_season=team_seasons.ngroup())
     
-    # Add edges between players who played in the same team in the same season
-    edge_count = 0
-    for (team_id, season), players in team_seasons:
-        # Get a list of player IDs and names
-        player_data = players[['enhanced_player_id', 'Name']].drop_duplicates().dropna()
-        
-        # Get team display name
-        team_display = team_id
-        if team_id_field == 'club_id' and 'team' in players.columns:
-            team_names = players['team'].dropna().unique()
-            if len(team_names) > 0:
-                team_display = team_names[0]
-        
-        # Include league name for better context if available
-        if 'LeagueName' in players.columns:
-            league_names = players['LeagueName'].dropna().unique()
-            if len(league_names) > 0:
-                team_display = f"{team_display} ({league_names[0]})"
-        
-        # Update player_id to name mapping
-        for _, row in player_data.iterrows():
-            player_id = row['enhanced_player_id']
-            name = row['Name']
-            if player_id not in player_id_to_name and isinstance(name, str) and name.strip():
-                player_id_to_name[player_id] = name
-                # Add node with both ID and display name
-                G.add_node(player_id, name=name)
-        
-        # Get list of unique player IDs for this team-season
-        player_ids = player_data['enhanced_player_id'].dropna().unique().tolist()
-        
-        # Create edges between all pairs of players in this team-season
-        for i in range(len(player_ids)):
-            id1 = player_ids[i]
-            if not isinstance(id1, str) and not isinstance(id1, int):
-                continue
-            
-            for j in range(i + 1, len(player_ids)):
-                id2 = player_ids[j]
-                if not isinstance(id2, str) and not isinstance(id2, int):
-                    continue
-                
-                G.add_edge(id1, id2)
-                
-                # Store details of when and where these players were together
-                player_pair = tuple(sorted([str(id1), str(id2)]))  # Sort and convert to string for consistent key
-                if player_pair not in connection_details:
-                    connection_details[player_pair] = []
-                
-                # Store as a JSON-compatible formatted string
-                connection_info = f"{season}|{team_display}"
-                if connection_info not in connection_details[player_pair]:
-                    connection_details[player_pair].append(connection_info)
-                
-                edge_count += 1
-                if edge_count % 100000 == 0:
-                    print(f"Added {edge_count} connections...")
+    # Team display names: the team's name (the first one given for a club_id),
+    # with the league in brackets when known
+    first = team_seasons[[c for c in ('team', 'LeagueName') if c in df.columns]].first()
+    team_names = first['team'] if team_id_field == 'club_id' else first.index.get_level_values(0).to_series(index=first.index)
+    displays = team_names.astype(str)
+    if 'LeagueName' in first.columns:
+        known = first['LeagueName'].notna()
+        displays = displays.where(~known, displays + ' (' + first['LeagueName'].astype(str) + ')')
+    seasons = first.index.get_level_values('Season').astype(str)
     
-    print(f"Graph built with {G.number_of_nodes()} players and {G.number_of_edges()} connections")
+    # Rows with no club_id belong to no team-season; a player with only
+    # such rows is left out of the graph
+    df = df[df['team_season'].notna()].astype({'team_season': np.int64})
+    
+    # Each player's name is the first one seen, in team-season order
+    uuids = [None] * (len(uuid_table) + 1)
+    names = [None] * (len(uuid_table) + 1)
+    first_rows = df.sort_values('team_season', kind='stable').drop_duplicates('node_id')
+    for node, uuid, name in zip(first_rows['node_id'].tolist(), first_rows['enhanced_player_id'].tolist(),
+                                first_rows['Name'].tolist()):
+        uuids[node] = uuid
+        names[node] = name
     
-    # Store connection details as graph attribute - as a string attribute
-    for u, v in G.edges():
-        player_pair = tuple(sorted([str(u), str(v)]))
-        details = connection_details.get(player_pair, [])
-        # Store as a JSON string to ensure GML compatibility
-        G[u][v]['details'] = json.dumps(details)
+    # Players who were in the same team in the same season are connected;
+    # a squad of one connects nobody
+    members = df[['team_season', 'node_id']].drop_duplicates()
+    squad_sizes = members['team_season'].map(members['team_season'].value_counts())
+    members = members[squad_sizes > 1]
     
-    # Store the player_id_to_name mapping as a graph attribute
-    nx.set_node_attributes(G, player_id_to_name, 'name')
+    G = PlayerGraph(uuids, names, list(zip(seasons, displays)),
+                    members['team_season'].to_numpy(), members['node_id'].to_numpy())
+    print(f"Graph built with {G.number_of_nodes()} players and {G.number_of_edges()} connections")
     
     return G
 
-def get_path_details(G, path):
-    """Get details for each connection in a path"""
-    path_details = []
-    for i in range(len(path)-1):
-        p1, p2 = path[i], path[i+1]
-        
-        # Get player names from node attributes
-        p1_name = G.nodes[p1].get('name', p1)
-        p2_name = G.nodes[p2].get('name', p2)
-        
-        # Get the edge data for this connection
-        edge_data = G.get_edge_data(p1, p2)
-        
-        # Parse the JSON string back into a list
-        try:
-            connection_info_str = edge_data.get('details', '[]')
-            connection_info = json.loads(connection_info_str)
-        except (json.JSONDecodeError, TypeError):
-            connection_info = []
-            
-        # Parse each connection string back into season and team
-        parsed_connections = []
-        for conn in connection_info:
-            try:
-                season, team = conn.split('|', 1)
-                parsed_connections.append((season, team))
-            except (ValueError, AttributeError):
-                continue
-                
-        path_details.append((p1_name, p2_name, parsed_connections))
+def assign_node_ids(uuids):
+    """
+    Map player UUIDs to dense integer node IDs
+    
+    IDs start at 1, so no player ID is falsy. Returns (ids, table) where ids
+    is an array aligned with uuids and table[i - 1] is the UUID for ID i.
+    """
+    codes, table = pd.factorize(uuids)
+    return codes + 1, table
+
+def player_uuid(G, node):
+    """The stable public ID (UUID) of a graph node"""
+    return G.uuids[node]
+
+def build_uuid_index(G):
+    """Map each player's UUID to its node ID"""
+    return {uuid: node for node, uuid in enumerate(G.uuids) if uuid is not None}
+
+def with_int_ids(G):
+    """
+    Convert a networkx graph keyed by UUID strings (older graph files) to integer node IDs
     
-    return path_details
+    The old keys are kept in the 'uuid' attribute. Graphs that already use
+    integer IDs are returned unchanged.
+    """
+    first = next(iter(G), None)
+    if first is None or isinstance(first, int):
+        return G
+    print("Converting UUID node keys to integer IDs...")
+    return nx.convert_node_labels_to_integers(G, first_label=1, label_attribute='uuid')
+
+def get_path_details(G, path):
+    """Get details for each connection in a path: (name, name, [(season, team), ...]) per link"""
+    return [(G.name(p1, p1), G.name(p2, p2), G.shared_team_seasons(p1, p2))
+            for p1, p2 in zip(path, path[1:])]
 
 def get_player_id(G, player_name):
     """Find a player's ID by name"""
     # First try exact match
-    for node, attrs in G.nodes(data=True):
-        if attrs.get('name') == player_name:
+    for node in G:
+        if G.names[node] == player_name:
             return node
     
     # If no exact match, try case-insensitive match
     player_lower = player_name.lower()
     matches = []
-    for node, attrs in G.nodes(data=True):
-        name = attrs.get('name', '')
+    for node in G:
+        name = G.names[node]
         if isinstance(name, str) and name.lower() == player_lower:
             matches.append((node, name))
     
@@ -220,8 +187,8 @@ def get_player_id(G, player_name):
     
     # If still no match, try partial match
     matches = []
-    for node, attrs in G.nodes(data=True):
-        name = attrs.get('name', '')
+    for node in G:
+        name = G.names[node]
         if isinstance(name, str) and player_lower in name.lower():
             matches.append((node, name))
     
@@ -241,7 +208,262 @@ def get_player_id(G, player_name):
     
     return None
 
-def find_shortest_path(G, player1, player2):
+class SearchBudget:
+    """
+    Limits how much work a single path query may do
+    
+    Args:
+        time_limit: Seconds the search may run for (None for no limit)
+        max_expansions: Number of nodes the search may expand (None for no limit)
+    
+    The BFS takes from the budget a layer at a time (take()), and path
+    enumeration a path at a time (spend()). Once either limit is reached the
+    budget is exhausted and the search returns whatever it has found so far.
+    """
+    
+    def __init__(self, time_limit=None, max_expansions=None):
+        self.deadline = time.perf_counter() + time_limit if time_limit else None
+        self.max_expansions = max_expansions
+        self.expansions = 0
+        self.exhausted = False
+    
+    def spend(self, count=1):
+        """Record count units of work; returns False once the budget is used up"""
+        self.expansions += count
+        if self.max_expansions is not None and self.expansions > self.max_expansions:
+            self.exhausted = True
+        elif self.deadline is not None and time.perf_counter() > self.deadline:
+            self.exhausted = True
+        return not self.exhausted
+    
+    def take(self, count):
+        """Spend up to count units at once; returns how many were granted, fewer once the budget runs out"""
+        granted = count
+        if self.max_expansions is not None:
+            granted = max(0, min(count, self.max_expansions - self.expansions))
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            granted = 0
+        self.expansions += granted
+        if granted < count:
+            self.exhausted = True
+        return granted
+
+class _Predecessors:
+    """
+    The BFS parents of every reached node, kept per layer as arrays sorted by node
+    
+    pred[node] lists node's parents (none for the search root), which is all
+    _paths_from_root and _count_from_root need. dist maps each reached node
+    to its layer. A layer grown from a single node stores that node instead
+    of an array of parents.
+    """
+    
+    def __init__(self, dist):
+        self.dist = dist
+        self.layers = [None]
+    
+    def add_layer(self, children, parents):
+        self.layers.append((children, parents))
+    
+    def __getitem__(self, node):
+        depth = self.dist[node]
+        if depth <= 0:
+            return []
+        children, parents = self.layers[depth]
+        if isinstance(parents, int):
+            return [parents]
+        start, stop = np.searchsorted(children, (node, node + 1))
+        return parents[start:stop].tolist()
+
+def _expand_layer(G, frontier, dist, pred, other_dist, budget):
+    """
+    Expand one BFS layer, recording every predecessor of each newly reached node
+    
+    The layer is expanded in one go over the graph's arrays. Returns the next
+    frontier and the nodes already reached from the other end. If the budget
+    runs out, only as many frontier nodes as it allows are expanded.
+    """
+    depth = dist[frontier[0]] + 1
+    frontier = frontier[:budget.take(len(frontier))]
+    # The graph stores int32 IDs; numpy indexes with intp arrays much faster
+    if len(frontier) == 1:
+        # A single node's teammates come out of the graph sorted and distinct
+        parents = int(frontier[0])
+        children = G.teammates(parents).astype(np.intp)
+        next_frontier = children = children[dist[children] < 0]
+    else:
+        parents, children = G.expand(frontier)
+        children = children.astype(np.intp)
+        new = dist[children] < 0
+        order = np.argsort(children[new], kind='stable')
+        parents, children = parents[new][order], children[new][order]
+        next_frontier = unique_sorted(children)
+    dist[next_frontier] = depth
+    pred.add_layer(children, parents)
+    return next_frontier, next_frontier[other_dist[next_frontier] >= 0]
+
+def _paths_from_root(pred, node):
+    """Yield every BFS path from the search root to node by following pred links"""
+    parents = pred[node]
+    if not parents:
+        yield [node]
+        return
+    for parent in parents:
+        for path in _paths_from_root(pred, parent):
+            yield path + [node]
+
+def _bidirectional_search(G, source, target, budget):
+    """
+    Run the bidirectional BFS used by the shortest path queries
+    
+    Returns (distance, meeting, pred_s, pred_t). meeting holds the nodes where
+    the two searches met on a shortest path; pred_s/pred_t give each reached
+    node's predecessors towards source/target. distance is None if there is
+    no path or the budget ran out first.
+    """
+    teammates = G.teammates(source)
+    position = teammates.searchsorted(target)
+    if position < len(teammates) and teammates[position] == target:
+        # Teammates: expanding the source is as far as the BFS would get
+        pred_s, pred_t = _Predecessors({source: 0, target: 1}), _Predecessors({target: 0})
+        pred_s.add_layer(None, int(source))
+        if not budget.take(1):
+            return None, [], pred_s, pred_t
+        return 1, [int(target)], pred_s, pred_t
+    
+    dist_s = np.full(len(G.uuids), -1, dtype=np.int32)
+    dist_t = np.full(len(G.uuids), -1, dtype=np.int32)
+    dist_s[source] = dist_t[target] = 0
+    pred_s, pred_t = _Predecessors(dist_s), _Predecessors(dist_t)
+    frontier_s, frontier_t = np.array([source]), np.array([target])
+    meeting = frontier_s[:0]
+    
+    while len(frontier_s) and len(frontier_t) and not len(meeting):
+        if len(frontier_s) <= len(frontier_t):
+            frontier_s, meeting = _expand_layer(G, frontier_s, dist_s, pred_s, dist_t, budget)
+        else:
+            frontier_t, meeting = _expand_layer(G, frontier_t, dist_t, pred_t, dist_s, budget)
+        if budget.exhausted:
+            break
+    
+    if not len(meeting):
+        return None, [], pred_s, pred_t
+    
+    # Every meeting node found in the same layer lies on a shortest path
+    lengths = dist_s[meeting] + dist_t[meeting]
+    distance = int(lengths.min())
+    return distance, meeting[lengths == distance].tolist(), pred_s, pred_t
+
+def _timed_search(G, source, target, budget):
+    """_bidirectional_search, recorded as the 'bfs' stage in the metrics"""
+    expanded_before = budget.expansions
+    with metrics.stage('bfs'):
+        result = _bidirectional_search(G, source, target, budget)
+    metrics.inc('path_nodes_expanded_total', budget.expansions - expanded_before)
+    if budget.exhausted and result[0] is None:
+        metrics.inc('path_searches_truncated_total')
+    return result
+
+def search_shortest_paths(G, source, target, budget=None):
+    """
+    Find the distance between two nodes and lazily enumerate all shortest paths
+    
+    Runs a bidirectional BFS, always expanding the smaller frontier, so a
+    disconnected pair only costs a walk of the smaller component.
+    
+    Args:
+        G: PlayerGraph
+        source, target: Node IDs (must be in G)
+        budget: Optional SearchBudget; checked once per BFS layer and once
+            per enumerated path
+    
+    Returns:
+        (distance, paths) where paths is a generator of node lists. distance
+        is None if there is no path or the budget ran out before one was found
+        (check budget.exhausted to tell the two apart).
+    """
+    if budget is None:
+        budget = SearchBudget()
+    
+    if source == target:
+        return 0, iter([[source]])
+    
+    distance, meeting, pred_s, pred_t = _timed_search(G, source, target, budget)
+    if distance is None:
+        return None, iter(())
+    
+    def paths():
+        for m in meeting:
+            for head in _paths_from_root(pred_s, m):
+                for tail in _paths_from_root(pred_t, m):
+                    if not budget.spend():
+                        return
+                    yield head + tail[-2::-1]
+    
+    return distance, paths()
+
+def _count_from_root(pred, node, counts):
+    """Number of BFS paths from the search root to node (memoized in counts)"""
+    if node not in counts:
+        parents = pred[node]
+        counts[node] = sum(_count_from_root(pred, p, counts) for p in parents) if parents else 1
+    return counts[node]
+
+def count_shortest_paths(G, source, target, budget=None):
+    """
+    Count the shortest paths between two nodes without enumerating them
+    
+    Returns (distance, count); both are None if there is no connection or
+    the budget ran out first.
+    """
+    if budget is None:
+        budget = SearchBudget()
+    
+    if source == target:
+        return 0, 1
+    
+    distance, meeting, pred_s, pred_t = _timed_search(G, source, target, budget)
+    if distance is None:
+        return None, None
+    
+    counts_s, counts_t = {}, {}
+    count = sum(_count_from_root(pred_s, m, counts_s) * _count_from_root(pred_t, m, counts_t)
+                for m in meeting)
+    return distance, count
+
+def find_shortest_paths(G, source, target, max_paths=10, budget=None):
+    """
+    Collect up to max_paths shortest paths between two nodes
+    
+    Returns a dict with:
+        distance: Number of links, or None if no connection was found
+        paths: List of node lists (possibly fewer than exist if truncated)
+        truncated: True if the budget ran out before the search finished
+        nodes_expanded: Work done, in budget units
+    """
+    if budget is None:
+        budget = SearchBudget()
+    
+    distance, paths = search_shortest_paths(G, source, target, budget)
+    found = []
+    with metrics.stage('path_enumeration'):
+        for path in paths:
+            found.append(path)
+            if len(found) >= max_paths:
+                break
+    metrics.inc('paths_enumerated_total', len(found))
+    if budget.exhausted and distance is not None:
+        # Ran out while enumerating rather than during the BFS
+        metrics.inc('path_searches_truncated_total')
+    
+    return {
+        'distance': distance,
+        'paths': found,
+        'truncated': budget.exhausted,
+        'nodes_expanded': budget.expansions,
+    }
+
+def find_shortest_path(G, player1, player2, budget=None):
     """Find the shortest path between two players"""
     # Try to get player IDs from player names
     id1 = get_player_id(G, player1)
@@ -253,38 +475,21 @@ def find_shortest_path(G, player1, player2):
         return f"Player not found: {player2}", None, []
     
     # Convert IDs back to names for display
-    p1_name = G.nodes[id1].get('name', id1)
-    p2_name = G.nodes[id2].get('name', id2)
+    p1_name = G.name(id1, id1)
+    p2_name = G.name(id2, id2)
     
-    try:
-        # First find the shortest path length
-        path_length = nx.shortest_path_length(G, source=id1, target=id2)
-        
-        # Then find a single shortest path
-        path = nx.shortest_path(G, source=id1, target=id2)
-        path_details = get_path_details(G, path)
-        
-        # Find all simple paths with the same length (limit to 10 to avoid excessive computation)
-        all_paths = []
-        
-        # Use a generator to find paths without computing all at once (more memory efficient)
-        for p in nx.all_simple_paths(G, source=id1, target=id2, cutoff=path_length):
-            if len(p) == len(path):  # Only collect paths of the same length as the shortest
-                all_paths.append(p)
-                if len(all_paths) >= 10:  # Limit to 10 paths
-                    break
-        
-        return path, path_details, all_paths
+    # Find up to 10 shortest paths; the first one is shown by default
+    result = find_shortest_paths(G, id1, id2, max_paths=10, budget=budget)
+    all_paths = result['paths']
     
-    except nx.NetworkXNoPath:
+    if not all_paths:
+        if result['truncated']:
+            return f"Search between {p1_name} and {p2_name} stopped before finding a connection", None, []
         return f"No connection found between {p1_name} and {p2_name}", None, []
-    except nx.NodeNotFound:
-        missing = []
-        if id1 not in G:
-            missing.append(p1_name)
-        if id2 not in G:
-            missing.append(p2_name)
-        return f"Player(s) not found in graph: {', '.join(missing)}", None, []
+    
+    path = all_paths[0]
+    path_details = get_path_details(G, path)
+    return path, path_details, all_paths
 
 def display_path(G, path, index=None):
     """Display a path with connection details"""
@@ -298,9 +503,9 @@ def display_path(G, path, index=None):
     if index is not None:
         path_str = f"Path #{index+1}: "
     
-    # Get player names from node attributes for first and last player
-    first_player = G.nodes[path[0]].get('name', path[0])
-    last_player = G.nodes[path[-1]].get('name', path[-1])
+    # Get player names for first and last player
+    first_player = G.name(path[0], path[0])
+    last_player = G.name(path[-1], path[-1])
     
     print(f"\n{path_str}{first_player} to {last_player} ({len(path)-1} links):")
     
@@ -317,50 +522,824 @@ def display_path(G, path, index=None):
 def get_all_players(G):
     """Return a list of all players in the graph with names and IDs"""
     players = []
-    for node, attrs in G.nodes(data=True):
-        name = attrs.get('name', node)
-        players.append((name, node))
+    for node in G:
+        players.append((G.name(node, str(node)), node))
     
     # Sort by name
     return sorted(players, key=lambda x: x[0].lower())
 
-def save_graph(G, filename="player_graph.gml"):
-    """Save the graph to a file"""
+def build_player_index(G):
+    """
+    Build lookup tables for resolving player names to graph node IDs
+    
+    Returns a dict with:
+        exact: player name -> node ID (first node seen wins for duplicate names)
+        lower: lowercased player name -> list of node IDs
+    """
+    exact = {}
+    lower = {}
+    for node in G:
+        name = G.names[node]
+        if not isinstance(name, str) or not name.strip():
+            continue
+        if name not in exact:
+            exact[name] = node
+        lower.setdefault(name.lower(), []).append(node)
+    
+    return {'exact': exact, 'lower': lower}
+
+def normalize_name(name):
+    """Normalize player names by removing accents and special characters"""
+    # Common character replacements
+    replacements = {
+        'ö': 'o', 'ó': 'o', 'ò': 'o', 'ô': 'o', 'õ': 'o',
+        'ä': 'a', 'á': 'a', 'à': 'a', 'â': 'a', 'ã': 'a',
+        'ë': 'e', 'é': 'e', 'è': 'e', 'ê': 'e',
+        'ï': 'i', 'í': 'i', 'ì': 'i', 'î': 'i',
+        'ü': 'u', 'ú': 'u', 'ù': 'u', 'û': 'u',
+        'ñ': 'n', 'ç': 'c'
+    }
+    
+    result = name.lower()
+    for special, replacement in replacements.items():
+        result = result.replace(special, replacement)
+    
+    return result
+
+def build_normalized_name_map(name_to_id):
+    """Normalized name (see normalize_name) -> list of (node ID, name), for accent-insensitive matching"""
+    normalized_name_map = {}
+    for name, pid in name_to_id.items():
+        normalized_name_map.setdefault(normalize_name(name), []).append((pid, name))
+    return normalized_name_map
+
+def unique_sorted(values):
+    """
+    The distinct values of an integer array, sorted
+    
+    Same result as np.unique, which on current numpy hashes the values
+    first and is many times slower than sorting for the arrays used here.
+    """
+    values = np.sort(values)
+    if not len(values):
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+def intersect_sorted(a, b):
+    """
+    Intersection of two sorted arrays of distinct values
+    
+    Short arrays are intersected with a set. When one array is much shorter,
+    each of its values is binary-searched in the other (O(small log large));
+    otherwise the two are merged.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    if len(b) <= 64:
+        # Set lookups beat numpy's per-call overhead on short rows
+        keep = set(b.tolist())
+        return np.array([x for x in a.tolist() if x in keep], dtype=a.dtype)
+    if len(a) * 16 < len(b):
+        positions = np.minimum(np.searchsorted(b, a), len(b) - 1)
+        return a[b[positions] == a]
+    return np.intersect1d(a, b, assume_unique=True)
+
+class PlayerGraph:
+    """
+    The player graph: who shared a squad with whom, as sorted integer arrays
+    
+    Node IDs are positions in two tables, uuids and names; slot 0 is left
+    empty so no node ID is falsy. Team-seasons are (season, team) pairs,
+    numbered in that order. Links aren't stored with their details: the
+    team-seasons two players shared are the intersection of their seasons.
+    Every array below is in compressed sparse row form, indexed by node ID
+    or team-season number, with sorted contents:
+        neighbors: each player's teammates
+        player_team_seasons: the team-seasons each player was in
+        roster_nodes: the players in each team-season
+    A squad of one links nobody and has no team-season entry.
+    
+    Args:
+        uuids, names: Node ID -> UUID / name (None for unused IDs)
+        team_seasons: (season, team) pairs the members refer to by position;
+            identical pairs are merged
+        member_team_seasons, member_nodes: One (team-season, node) pair per
+            squad place
+        edges: Optional (u, v) pairs to link instead of squad mates (for
+            graphs whose links carry no team-seasons)
+    """
+    
+    # Candidate (player, squad mate) pairs generated at once when linking squads
+    LINK_CHUNK = 1 << 21
+    
+    def __init__(self, uuids, names, team_seasons, member_team_seasons, member_nodes, edges=None):
+        self.uuids = list(uuids)
+        self.names = list(names)
+        self.node_count = sum(uuid is not None for uuid in self.uuids)
+        size = len(self.uuids)
+        
+        # Renumber the team-seasons that have members in (season, team) order
+        codes = np.asarray(member_team_seasons, dtype=np.int64)
+        used = unique_sorted(codes)
+        self.team_seasons = sorted({tuple(team_seasons[i]) for i in used.tolist()})
+        number = {team_season: i for i, team_season in enumerate(self.team_seasons)}
+        renumber = np.array([number[tuple(team_seasons[i])] for i in used.tolist()], dtype=np.int64)
+        codes = renumber[np.searchsorted(used, codes)]
+        members = unique_sorted(codes * size + np.asarray(member_nodes, dtype=np.int64))
+        member_team_seasons = (members // size).astype(np.int32)
+        member_nodes = (members % size).astype(np.int32)
+        
+        # The pairs are sorted by team-season, then player: that's the rosters
+        self.roster_nodes = member_nodes
+        self.roster_offsets = self._offsets(member_team_seasons, len(self.team_seasons))
+        order = np.lexsort((member_team_seasons, member_nodes))
+        self.player_team_seasons = member_team_seasons[order]
+        self.player_offsets = self._offsets(member_nodes, size)
+        
+        # Teammates: both directions of every link, sorted by (node, neighbor)
+        if edges is None:
+            links = self._roster_links(size)
+        else:
+            edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+            links = unique_sorted(np.concatenate([edges[:, 0] * size + edges[:, 1],
+                                                  edges[:, 1] * size + edges[:, 0]]))
+        self.neighbors = (links % size).astype(np.int32)
+        self.neighbor_offsets = self._offsets(links // size, size)
+        
+        # Team-seasons by lowercased team name, with and without the league suffix
+        self.by_team = {}
+        for number, (_, team) in enumerate(self.team_seasons):
+            names = {team.lower(), team.split(' (')[0].lower()}
+            for name in names:
+                self.by_team.setdefault(name, []).append(number)
+    
+    def _roster_pairs(self, size):
+        """
+        Yield (team-seasons, players, squad mates) arrays for every pair of squad mates
+        
+        Whole team-seasons at a time, about LINK_CHUNK pairs per chunk; each
+        pair comes in both directions.
+        """
+        roster_sizes = np.diff(self.roster_offsets)
+        pair_ends = np.cumsum(roster_sizes * roster_sizes)
+        start = 0
+        while start < len(roster_sizes):
+            done = pair_ends[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(pair_ends, done + self.LINK_CHUNK, side='right')))
+            sizes = roster_sizes[start:stop]
+            first, last = self.roster_offsets[start], self.roster_offsets[stop]
+            # Each player is paired with every member of their own roster
+            mates = np.repeat(sizes, sizes)
+            roster_starts = np.repeat(self.roster_offsets[start:stop], sizes)
+            positions = np.repeat(roster_starts, mates) + self._ranges(mates)
+            team_seasons = np.repeat(np.repeat(np.arange(start, stop), sizes), mates)
+            source = np.repeat(self.roster_nodes[first:last].astype(np.int64), mates)
+            target = self.roster_nodes[positions].astype(np.int64)
+            keep = source != target
+            yield team_seasons[keep], source[keep], target[keep]
+            start = stop
+    
+    def _roster_links(self, size):
+        """Every (player, squad mate) pair as player * size + mate, sorted and distinct"""
+        chunks = [unique_sorted(source * size + target) for _, source, target in self._roster_pairs(size)]
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        return chunks[0] if len(chunks) == 1 else unique_sorted(np.concatenate(chunks))
+    
+    @staticmethod
+    def _ranges(counts):
+        """Concatenated range(count) for each count"""
+        total = int(counts.sum())
+        return np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    
+    @staticmethod
+    def _offsets(keys, size):
+        """CSR offsets for rows sorted by keys (values in range(size))"""
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+        return offsets
+    
+    def _row(self, values, offsets, key):
+        if key < 0 or key + 1 >= len(offsets):
+            return values[:0]
+        return values[offsets[key]:offsets[key + 1]]
+    
+    @classmethod
+    def from_networkx(cls, G, node_ids=None):
+        """
+        Build from a networkx graph (GML files and older graph files)
+        
+        Nodes carry 'uuid' and 'name' attributes and links a JSON 'details'
+        list of "season|team" strings, as build_graph used to write them.
+        node_ids maps G's nodes to node IDs; by default the nodes are the IDs.
+        """
+        if node_ids is None:
+            node_ids = {node: node for node in G}
+        size = max(node_ids.values(), default=0) + 1
+        uuids, names = [None] * size, [None] * size
+        for node, attrs in G.nodes(data=True):
+            uuids[node_ids[node]] = attrs.get('uuid', str(node))
+            names[node_ids[node]] = attrs.get('name')
+        m = G.number_of_edges()
+        edges = np.fromiter(map(node_ids.__getitem__, itertools.chain.from_iterable(G.edges())),
+                            dtype=np.int64, count=2 * m).reshape(m, 2)
+        
+        # Each distinct details string is decoded once; squads share them widely
+        detail_codes, detail_strings = pd.factorize(
+            pd.Series([details for _, _, details in G.edges(data='details', default='[]')], dtype=object))
+        entries = [json.loads(details) for details in detail_strings]
+        flat = [entry for entry_list in entries for entry in entry_list]
+        entry_codes, labels = pd.factorize(pd.Series(flat, dtype=object))
+        team_seasons = [tuple(entry.split('|', 1)) if '|' in entry else (entry, '') for entry in labels]
+        detail_lengths = np.array([len(entry_list) for entry_list in entries], dtype=np.int64)
+        detail_starts = np.concatenate([[0], np.cumsum(detail_lengths)[:-1]]).astype(np.int64)
+        
+        # Expand every link into one (team-season, player) pair per end and per shared team-season
+        counts = detail_lengths[detail_codes]
+        edge_team_seasons = entry_codes[np.repeat(detail_starts[detail_codes], counts) + cls._ranges(counts)]
+        return cls(uuids, names, team_seasons,
+                   np.concatenate([edge_team_seasons, edge_team_seasons]),
+                   np.concatenate([np.repeat(edges[:, 0], counts), np.repeat(edges[:, 1], counts)]),
+                   edges=edges)
+    
+    def link_team_seasons(self):
+        """Yield (u, v, team-season numbers the two shared) for every link, with u < v, in order"""
+        size = len(self.uuids)
+        sources = np.repeat(np.arange(size, dtype=np.int64), self.degrees())
+        forward = sources < self.neighbors
+        links = sources[forward] * size + self.neighbors[forward]
+        
+        # Every shared team-season of every link, sorted by link then team-season
+        keys, numbers = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        for team_seasons, source, target in self._roster_pairs(size):
+            forward = source < target
+            keys.append(source[forward] * size + target[forward])
+            numbers.append(team_seasons[forward])
+        keys, numbers = np.concatenate(keys), np.concatenate(numbers)
+        order = np.lexsort((numbers, keys))
+        keys, numbers = keys[order], numbers[order].tolist()
+        starts = np.searchsorted(keys, links).tolist()
+        stops = np.searchsorted(keys, links, side='right').tolist()
+        for u, v, start, stop in zip((links // size).tolist(), (links % size).tolist(), starts, stops):
+            yield u, v, tuple(numbers[start:stop])
+    
+    def __contains__(self, node):
+        return isinstance(node, (int, np.integer)) and 0 <= node < len(self.uuids) and self.uuids[node] is not None
+    
+    def __iter__(self):
+        return (node for node, uuid in enumerate(self.uuids) if uuid is not None)
+    
+    def __len__(self):
+        return self.node_count
+    
+    def number_of_nodes(self):
+        return self.node_count
+    
+    def number_of_edges(self):
+        return len(self.neighbors) // 2
+    
+    def name(self, node, default=None):
+        """The player's name, or default if the node has none"""
+        name = self.names[node] if node in self else None
+        return default if name is None else name
+    
+    def degree(self, node):
+        """Number of teammates node has"""
+        return len(self.teammates(node))
+    
+    def degrees(self):
+        """Number of teammates of every node ID, as an array"""
+        return np.diff(self.neighbor_offsets)
+    
+    def teammates(self, node):
+        """Sorted node IDs of everyone who shared a squad with node"""
+        return self._row(self.neighbors, self.neighbor_offsets, node)
+    
+    def player_seasons(self, node):
+        """Sorted team-season numbers node played in"""
+        return self._row(self.player_team_seasons, self.player_offsets, node)
+    
+    def roster(self, team_season):
+        """Sorted node IDs of the players in a team-season"""
+        return self._row(self.roster_nodes, self.roster_offsets, team_season)
+    
+    def common_teammates(self, node1, node2):
+        """Sorted node IDs of players who were teammates of both nodes"""
+        return intersect_sorted(self.teammates(node1), self.teammates(node2))
+    
+    def shared_seasons(self, node1, node2):
+        """Sorted team-season numbers both nodes played in"""
+        return intersect_sorted(self.player_seasons(node1), self.player_seasons(node2))
+    
+    def shared_team_seasons(self, node1, node2):
+        """(season, team) for each team-season both nodes played in"""
+        # Careers are short, so a set beats intersect_sorted's array round trip
+        other = set(self.player_seasons(node2).tolist())
+        return [self.team_seasons[number] for number in self.player_seasons(node1).tolist() if number in other]
+    
+    def find_team_seasons(self, team, season=None):
+        """Team-season numbers for a team name (case-insensitive, league suffix optional), optionally in one season"""
+        numbers = self.by_team.get(team.strip().lower(), [])
+        if season:
+            numbers = [n for n in numbers if self.team_seasons[n][0] == season.strip()]
+        return numbers
+    
+    def expand(self, frontier):
+        """All links out of the frontier nodes, as (parents, children) arrays"""
+        if len(frontier) == 1:
+            node = frontier[0]
+            children = self.neighbors[self.neighbor_offsets[node]:self.neighbor_offsets[node + 1]]
+            return np.full(len(children), node, dtype=np.int64), children
+        starts = self.neighbor_offsets[frontier]
+        counts = self.neighbor_offsets[frontier + 1] - starts
+        children = self.neighbors[np.repeat(starts, counts) + self._ranges(counts)]
+        return np.repeat(frontier, counts), children
+    
+    def distances_from(self, source, cutoff=None):
+        """Links from source to every node ID (-1 if unreachable or further than cutoff)"""
+        dist = np.full(len(self.uuids), -1, dtype=np.int32)
+        dist[source] = 0
+        frontier = np.array([source])
+        depth = 0
+        while len(frontier) and (cutoff is None or depth < cutoff):
+            depth += 1
+            _, children = self.expand(frontier)
+            frontier = unique_sorted(children[dist[children] < 0])
+            dist[frontier] = depth
+        return dist
+    
+    def component_labels(self):
+        """Connected component number of every node ID (-1 for unused IDs)"""
+        labels = np.full(len(self.uuids), -1, dtype=np.int32)
+        component = 0
+        for node in self:
+            if labels[node] >= 0:
+                continue
+            labels[node] = component
+            frontier = np.array([node])
+            while len(frontier):
+                _, children = self.expand(frontier)
+                frontier = unique_sorted(children[labels[children] < 0])
+                labels[frontier] = component
+            component += 1
+        return labels
+
+def pickle_path(filename):
+    """Path of the pickle snapshot that sits next to a GML graph file"""
+    return Path(filename).with_suffix('.pkl')
+
+def _snapshot(G):
+    """
+    The pickled form of a graph: a dict of its tables and arrays
+    
+    A plain dict rather than the PlayerGraph itself, so the snapshot loads
+    however the module was imported (as __main__ or player_connections).
+    """
+    return {'player_graph': 1, **vars(G)}
+
+def _from_snapshot(snapshot):
+    """Rebuild a PlayerGraph from _snapshot()"""
+    G = PlayerGraph.__new__(PlayerGraph)
+    G.__dict__.update({key: value for key, value in snapshot.items() if key != 'player_graph'})
+    return G
+
+def _gml_string(value):
+    """A GML string, with quotes, ampersands and non-ASCII characters as character references (as networkx writes them)"""
+    return '"' + re.sub('[^ -~]|[&"]', lambda m: f"&#{ord(m.group(0))};", str(value)) + '"'
+
+def write_gml(G, filename):
+    """
+    Write a PlayerGraph as GML
+    
+    The file is laid out as networkx writes the graphs build_graph used to
+    return: a node per player with its name and uuid, and an edge per link
+    with a JSON 'details' list of "season|team" strings. It is written
+    directly, so each distinct details list is encoded only once.
+    """
+    labels = [f"{season}|{team}" for season, team in G.team_seasons]
+    encoded = {}
+    with open(filename, 'w', encoding='ascii') as f:
+        f.write("graph [\n")
+        for node in G:
+            f.write(f"  node [\n    id {node}\n    label \"{node}\"\n")
+            if G.names[node] is not None:
+                f.write(f"    name {_gml_string(G.names[node])}\n")
+            f.write(f"    uuid {_gml_string(G.uuids[node])}\n  ]\n")
+        for u, v, shared in G.link_team_seasons():
+            details = encoded.get(shared)
+            if details is None:
+                details = encoded[shared] = _gml_string(json.dumps([labels[number] for number in shared]))
+            f.write(f"  edge [\n    source {u}\n    target {v}\n    details {details}\n  ]\n")
+        f.write("]\n")
+
+def save_graph(G, filename="player_graph.gml", use_pickle=False):
+    """Save the graph to a file (GML, or a much faster to load pickle snapshot)"""
+    if use_pickle:
+        snapshot = pickle_path(filename)
+        # Write to a temporary file and rename it into place, so a running
+        # server watching the snapshot never reads a half-written file
+        tmp_file = snapshot.with_suffix('.pkl.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(_snapshot(G), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_file.replace(snapshot)
+        print(f"Graph snapshot saved to {snapshot}")
+        return
+    
     print("Saving graph to file (this may take a while)...")
-    nx.write_gml(G, filename)
+    write_gml(G, filename)
     print(f"Graph saved to {filename}")
 
-def load_graph(filename="player_graph.gml"):
-    """Load a graph from a file"""
-    if Path(filename).exists():
+def graph_version(filename="player_graph.gml", use_pickle=False):
+    """
+    Short fingerprint of the graph file that load_graph would read
+    
+    Changes whenever the file is rewritten, so anything derived from the
+    graph (cached results, ETags) can be keyed by it.
+    """
+    path = pickle_path(filename) if use_pickle and pickle_path(filename).exists() else Path(filename)
+    stat = path.stat()
+    fingerprint = f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+def load_graph(filename="player_graph.gml", use_pickle=False):
+    """Load a graph from a file, preferring the pickle snapshot if requested"""
+    if use_pickle and pickle_path(filename).exists():
+        snapshot = pickle_path(filename)
+        print(f"Loading graph snapshot from {snapshot}")
+        # Unpickle straight from the mapped file instead of reading it into memory first
+        with open(snapshot, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            G = pickle.loads(mapped)
+        if isinstance(G, nx.Graph):
+            # Snapshots from before PlayerGraph are pickled networkx graphs
+            G = PlayerGraph.from_networkx(with_int_ids(G))
+            # A networkx graph refers to itself through its cached views, so
+            # only the cycle collector frees it; don't leave it until the next run
+            gc.collect()
+            return G
+        if 'player_graph' not in G:
+            raise ValueError(f"{snapshot} is in an old snapshot format; rebuild it with --rebuild")
+        return _from_snapshot(G)
+    elif Path(filename).exists():
         print(f"Loading graph from {filename}")
-        return nx.read_gml(filename)
+        # Read nodes by their GML ids, which skips read_gml's relabelling copy
+        # of the graph. Each node's key is in its label: the node ID, or the
+        # UUID in files from before integer node IDs (numbered here from 1).
+        G = nx.read_gml(filename, label=None)
+        node_ids = {}
+        for gml_id, attrs in G.nodes(data=True):
+            label = attrs.pop('label', gml_id)
+            if 'uuid' in attrs:
+                node_ids[gml_id] = int(label)
+            else:
+                attrs['uuid'] = label
+                node_ids[gml_id] = len(node_ids) + 1
+        G = PlayerGraph.from_networkx(G, node_ids)
+        gc.collect()
+        return G
     else:
         print(f"Graph file {filename} not found.")
         return None
 
+def _deep_size(obj, seen):
+    """
+    Bytes used by obj and everything it contains, skipping objects already in seen
+    
+    Counts the containers the graph is made of (dicts, lists, tuples, sets)
+    and their contents; each object is counted once across calls sharing seen.
+    """
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+def _array_size(array):
+    """Bytes used by a numpy array, including its data if it doesn't own it"""
+    return sys.getsizeof(array) + (array.nbytes if array.base is not None else 0)
+
+def _index_components(G):
+    """
+    The indexes the web app builds for G, by component
+    
+    Built with the same functions app.GraphState.build_indexes calls.
+    """
+    player_index = build_player_index(G)
+    return {
+        'player_index': player_index,
+        'all_player_names': sorted(player_index['exact']),
+        'normalized_name_map': build_normalized_name_map(player_index['exact']),
+        'node_by_uuid': build_uuid_index(G),
+    }
+
+def memory_report(G, include_indexes=True):
+    """
+    Measure where the memory of a loaded graph goes
+    
+    Returns a dict with:
+        nodes, edges: Graph size
+        memberships, team_seasons: Squad places and the team-seasons they're in
+        components: {name: bytes} for the UUID and name tables, the link,
+            membership and team-season arrays, and (optionally) the web app's
+            name indexes. Each object is counted once, in the first component
+            that reaches it.
+    """
+    seen = set()
+    components = {
+        'player UUIDs': _deep_size(G.uuids, seen),
+        'player names': _deep_size(G.names, seen),
+        'links': _array_size(G.neighbors) + _array_size(G.neighbor_offsets),
+        'squad memberships': sum(_array_size(array) for array in (
+            G.roster_nodes, G.roster_offsets, G.player_team_seasons, G.player_offsets)),
+        'team-seasons': _deep_size(G.team_seasons, seen) + _deep_size(G.by_team, seen),
+    }
+    
+    if include_indexes:
+        for name, index in _index_components(G).items():
+            components[f"index: {name}"] = _deep_size(index, seen)
+    
+    return {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(),
+            'memberships': len(G.roster_nodes), 'team_seasons': len(G.team_seasons),
+            'components': components}
+
+def print_memory_report(report):
+    """Print a memory_report() as a table with bytes per node and per edge"""
+    n, m = report['nodes'], report['edges']
+    
+    def row(name, size):
+        per_node = size / n if n else 0
+        per_edge = size / m if m else 0
+        print(f"  {name:<40} {size / (1024 * 1024):>10.1f} MB {per_node:>12.1f} B/node {per_edge:>10.1f} B/edge")
+    
+    print(f"\nGraph: {n} players, {m} connections, {report['memberships']} squad places "
+          f"in {report['team_seasons']} team-seasons")
+    print("\nMeasured (sys.getsizeof, each object counted once):")
+    total = 0
+    for name, size in report['components'].items():
+        row(name, size)
+        total += size
+    row('total', total)
+
+def resolve_player(G, query, index, uuid_index):
+    """
+    Resolve a player UUID or name to a node without prompting
+    
+    Tries the UUID, then the exact name, then the name ignoring case.
+    Returns (node, None) or (None, error) where error says whether the
+    player was not found or the name matches several players.
+    """
+    query = query.strip()
+    if query in uuid_index:
+        return uuid_index[query], None
+    candidates = index['lower'].get(query.lower(), [])
+    exact = [node for node in candidates if G.names[node] == query]
+    matches = exact or candidates
+    if len(matches) == 1:
+        return matches[0], None
+    if matches:
+        players = [{'id': player_uuid(G, node), 'name': G.names[node]} for node in matches[:10]]
+        return None, {'error': 'ambiguous', 'query': query, 'candidates': players}
+    return None, {'error': 'not_found', 'query': query}
+
+def parse_pair(line):
+    """
+    (player1, player2) from one line of batch input, or None for blank and comment lines
+    
+    A line is either a JSON object with player1/player2 (names or UUIDs) or
+    player1_id/player2_id, or two values separated by a tab or, failing
+    that, a comma.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        data = json.loads(line)
+        return (str(data.get('player1_id') or data.get('player1') or ''),
+                str(data.get('player2_id') or data.get('player2') or ''))
+    separator = '\t' if '\t' in line else ','
+    parts = [part.strip() for part in line.split(separator)]
+    if len(parts) != 2:
+        raise ValueError(f"expected two players separated by a tab or comma, got {len(parts)} fields")
+    return parts[0], parts[1]
+
+# Graph, indexes and search limits used by batch queries inside worker processes
+_batch_state = None
+
+def _init_batch_worker(state):
+    global _batch_state
+    _batch_state = state
+
+def run_batch_query(task):
+    """
+    Answer one batch input line: resolve both players and find their shortest paths
+    
+    Returns a JSON-ready dict with the distance, the paths (player IDs,
+    names and, per link, the team-seasons they shared) or an error.
+    """
+    line_number, line = task
+    G, index, uuid_index, limits = _batch_state
+    start = time.perf_counter()
+    result = {'line': line_number}
+    try:
+        pair = parse_pair(line)
+    except ValueError as e:  # includes malformed JSON
+        result.update(error='bad_input', message=str(e))
+        return result
+    if pair is None:
+        return None
+    result['player1'], result['player2'] = pair
+    
+    nodes = []
+    for query in pair:
+        node, error = resolve_player(G, query, index, uuid_index)
+        if error is not None:
+            result.update(error)
+            return result
+        nodes.append(node)
+    
+    budget = SearchBudget(limits['time_limit'], limits['max_expansions'])
+    found = find_shortest_paths(G, nodes[0], nodes[1], max_paths=limits['max_paths'], budget=budget)
+    result['from'] = {'id': player_uuid(G, nodes[0]), 'name': G.names[nodes[0]]}
+    result['to'] = {'id': player_uuid(G, nodes[1]), 'name': G.names[nodes[1]]}
+    result['distance'] = found['distance']
+    result['paths'] = []
+    for path in found['paths']:
+        links = [[{'season': season, 'team': team} for season, team in connections]
+                 for _, _, connections in get_path_details(G, path)]
+        result['paths'].append({
+            'players': [player_uuid(G, node) for node in path],
+            'names': [G.names[node] for node in path],
+            'links': links,
+        })
+    result['truncated'] = found['truncated']
+    result['nodes_expanded'] = found['nodes_expanded']
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+def run_batch(G, lines, output, workers=None, max_paths=10, time_limit=None, max_expansions=None, chunksize=16):
+    """
+    Answer many connection queries and write one JSON line per query
+    
+    Args:
+        G: Player graph
+        lines: Iterable of input lines (see parse_pair)
+        output: Text file the JSONL results are written to, in input order
+        workers: Processes to spread queries across (default: one per CPU
+            core); they are forked after the graph and indexes are built,
+            so they share them copy-on-write. 1 runs everything in this process.
+        max_paths: Most shortest paths reported per query
+        time_limit, max_expansions: SearchBudget limits for each query
+        chunksize: Queries handed to a worker at a time
+    
+    Returns a summary dict (counts by outcome, elapsed time, throughput).
+    """
+    workers = workers or os.cpu_count() or 1
+    state = (G, build_player_index(G), build_uuid_index(G),
+             {'max_paths': max_paths, 'time_limit': time_limit, 'max_expansions': max_expansions})
+    summary = {'queries': 0, 'connected': 0, 'not_connected': 0, 'truncated': 0, 'errors': {}}
+    latencies = []
+    start = time.perf_counter()
+    
+    executor = None
+    if workers > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                       initializer=_init_batch_worker, initargs=(state,))
+    else:
+        _init_batch_worker(state)
+    
+    # Hand out a block of lines at a time, so a huge input is never all in memory
+    tasks = enumerate(lines, start=1)
+    block_size = chunksize * workers * 4
+    try:
+        while True:
+            block = list(itertools.islice(tasks, block_size))
+            if not block:
+                break
+            if executor is not None:
+                results = executor.map(run_batch_query, block, chunksize=chunksize)
+            else:
+                results = map(run_batch_query, block)
+            for result in results:
+                if result is None:
+                    continue
+                summary['queries'] += 1
+                if 'error' in result:
+                    summary['errors'][result['error']] = summary['errors'].get(result['error'], 0) + 1
+                elif result['distance'] is not None:
+                    summary['connected'] += 1
+                elif result['truncated']:
+                    summary['truncated'] += 1
+                else:
+                    summary['not_connected'] += 1
+                if 'elapsed_ms' in result:
+                    latencies.append(result['elapsed_ms'])
+                output.write(json.dumps(result) + '\n')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    summary.update(
+        elapsed_seconds=round(elapsed, 3),
+        queries_per_second=round(summary['queries'] / max(elapsed, 1e-9), 1),
+        p50_ms=latencies[len(latencies) // 2] if latencies else None,
+        p95_ms=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        workers=workers,
+    )
+    return summary
+
+def print_batch_summary(summary, file=sys.stderr):
+    """Print a run_batch() summary"""
+    errors = sum(summary['errors'].values())
+    print(f"{summary['queries']} queries in {summary['elapsed_seconds']:.2f}s "
+          f"({summary['queries_per_second']:,.1f}/s on {summary['workers']} workers)", file=file)
+    print(f"  {summary['connected']} connected, {summary['not_connected']} not connected, "
+          f"{summary['truncated']} stopped by the search budget, {errors} failed", file=file)
+    for kind, count in sorted(summary['errors'].items()):
+        print(f"    {kind}: {count}", file=file)
+    if summary['p50_ms'] is not None:
+        print(f"  search time p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms", file=file)
+
 def main():
     parser = argparse.ArgumentParser(description='Football Player Connection Finder')
     parser.add_argument('--sample', type=int, help='Use a smaller sample size for testing')
     parser.add_argument('--rebuild', action='store_true', help='Force rebuilding the graph even if it exists')
-    parser.add_argument('--csv', type=str, default='squads_cleaned.csv', help='CSV file to use')
+    parser.add_argument('--csv', type=str, default='squads_cleaned.csv',
+                        help='Data file to use (.csv, .npz or .parquet)')
+    parser.add_argument('--season', action='append', help='Only build from this season (can be repeated)')
+    parser.add_argument('--league', action='append', help='Only build from this league (can be repeated)')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='Print where the loaded graph\'s memory goes and exit')
+    subparsers = parser.add_subparsers(dest='command')
+    batch = subparsers.add_parser('batch', help='Answer many connection queries without prompting',
+                                  description='Read player pairs (names or IDs) and write one JSON line of '
+                                              'results per pair')
+    batch.add_argument('input', nargs='?', default='-',
+                       help='File of pairs: "player1<TAB>player2", "player1,player2" or JSON lines '
+                            '(default: stdin)')
+    batch.add_argument('--output', '-o', default='-', help='JSONL results file (default: stdout)')
+    batch.add_argument('--workers', type=int, help='Worker processes (default: one per CPU core)')
+    batch.add_argument('--max-paths', type=int, default=10, help='Most shortest paths reported per pair')
+    batch.add_argument('--time-limit', type=float, help='Seconds each search may run for')
+    batch.add_argument('--max-expansions', type=int, help='Nodes each search may expand')
+    batch.add_argument('--chunksize', type=int, default=16, help='Pairs handed to a worker at a time')
     args = parser.parse_args()
     
+    batch_mode = args.command == 'batch'
+    
     # Check if the graph file exists, otherwise build it
     graph_file = "player_graph.gml"
     
-    if Path(graph_file).exists() and not args.rebuild:
-        print(f"Loading existing graph from {graph_file}")
-        G = load_graph(graph_file)
-    else:
-        print("Building new graph...")
-        G = build_graph(args.csv, args.sample)
-        save_graph(G, graph_file)
+    # Batch results may go to stdout, so progress messages go to stderr
+    with contextlib.redirect_stdout(sys.stderr if batch_mode else sys.stdout):
+        if Path(graph_file).exists() and not args.rebuild:
+            print(f"Loading existing graph from {graph_file}")
+            # The memory report and batch mode load the graph as the web app does
+            G = load_graph(graph_file, use_pickle=args.memory_report or batch_mode)
+        else:
+            print("Building new graph...")
+            filters = {}
+            if args.season:
+                filters['Season'] = args.season
+            if args.league:
+                filters['LeagueName'] = args.league
+            G = build_graph(args.csv, args.sample, filters or None)
+            save_graph(G, graph_file)
+            save_graph(G, graph_file, use_pickle=True)
     
     if not G:
+        if batch_mode:
+            sys.exit("Failed to load or build graph. Exiting.")
         print("Failed to load or build graph. Exiting.")
         return
     
+    if batch_mode:
+        with contextlib.ExitStack() as stack:
+            source = sys.stdin if args.input == '-' else stack.enter_context(open(args.input, encoding='utf-8'))
+            output = sys.stdout if args.output == '-' else stack.enter_context(
+                open(args.output, 'w', encoding='utf-8'))
+            summary = run_batch(G, source, output, args.workers, args.max_paths,
+                                args.time_limit, args.max_expansions, args.chunksize)
+        print_batch_summary(summary)
+        return
+    
+    if args.memory_report:
+        print_memory_report(memory_report(G))
+        return
+    
     # Interactive loop
     while True:
         print("\n--- Player Connection Finder ---")
@@ -0,0 +1,174 @@
+"""
+Persistent registry of player IDs.
+
+Maps each identity key (normalized name + first team, see
+generate_unique_player_ids.py) to the player ID it was first given, in a
+SQLite file. Looking up a chunk of keys is one indexed join against the
+registry; only identities never seen before get a new ID. IDs therefore
+stay stable across runs, including IDs from before they were hashed, and
+each run records which identities it added, so graph updates can be
+limited to the new players.
+
+    python player_id_registry.py player_ids.sqlite --import squads_cleaned.csv
+    python player_id_registry.py player_ids.sqlite --stats
+"""
+import argparse
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import dataset_io
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS players (
+    identity_key TEXT PRIMARY KEY,
+    player_id TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS players_run ON players(run_id);
+"""
+
+class PlayerIdRegistry:
+    """
+    SQLite-backed mapping of identity keys to player IDs
+
+    Args:
+        path: Registry database file, created if missing
+        source: Description of the data being processed, stored with the run
+
+    The run is recorded on the first assign() or register(), so opening a
+    registry just to read it (e.g. --stats) leaves it unchanged.
+    """
+
+    def __init__(self, path, source=None):
+        self.path = path
+        self.source = source
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.run_id = None
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS lookup (identity_key TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.commit()
+        self.added = 0
+
+    def _start_run(self):
+        """Record this run, once; call inside the transaction that first writes under it"""
+        if self.run_id is None:
+            cursor = self.conn.execute('INSERT INTO runs (started_at, source) VALUES (?, ?)',
+                                       (self.started_at, self.source))
+            self.run_id = cursor.lastrowid
+
+    def assign(self, keys, new_id):
+        """
+        Player IDs for a batch of distinct identity keys
+
+        Keys already in the registry keep their ID. Other keys get new_id(key)
+        and are stored under this run.
+
+        Args:
+            keys: Distinct identity keys
+            new_id: Function giving the ID for a key not yet registered
+        Returns:
+            List of player IDs, in the order of keys
+        """
+        with self.conn:
+            self._start_run()
+            self.conn.execute('DELETE FROM lookup')
+            self.conn.executemany('INSERT OR IGNORE INTO lookup VALUES (?)', ((key,) for key in keys))
+            known = dict(self.conn.execute(
+                'SELECT lookup.identity_key, players.player_id FROM lookup '
+                'JOIN players ON players.identity_key = lookup.identity_key'))
+            new = [(key, new_id(key), self.run_id) for key in keys if key not in known]
+            if new:
+                self.conn.executemany('INSERT INTO players VALUES (?, ?, ?)', new)
+                known.update((key, player_id) for key, player_id, _ in new)
+                self.added += len(new)
+        return [known[key] for key in keys]
+
+    def register(self, pairs):
+        """Store (identity_key, player_id) pairs, keeping existing entries; returns the number added"""
+        with self.conn:
+            self._start_run()
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO players VALUES (?, ?, ?)',
+                                  ((key, player_id, self.run_id) for key, player_id in pairs))
+            added = self.conn.total_changes - before
+        self.added += added
+        return added
+
+    def new_player_ids(self, run_id=None):
+        """IDs first assigned in a run (by default this one)"""
+        run_id = self.run_id if run_id is None else run_id
+        if run_id is None:
+            return []
+        return [row[0] for row in self.conn.execute(
+            'SELECT player_id FROM players WHERE run_id = ?', (run_id,))]
+
+    def stats(self):
+        """Number of registered identities, and the identities added by each run"""
+        total = self.conn.execute('SELECT COUNT(*) FROM players').fetchone()[0]
+        runs = self.conn.execute(
+            'SELECT runs.run_id, runs.started_at, runs.source, COUNT(players.identity_key) '
+            'FROM runs LEFT JOIN players ON players.run_id = runs.run_id '
+            'GROUP BY runs.run_id ORDER BY runs.run_id').fetchall()
+        return total, runs
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def import_ids(registry, csv_path, chunksize=200000):
+    """Seed a registry with the IDs already in a dataset's Name, First_Team and player_id columns"""
+    from generate_unique_player_ids import identity_keys
+
+    start = time.perf_counter()
+    name_cache, team_cache = {}, {}
+    added = 0
+    id_column = None
+    for df in dataset_io.iter_dataset(csv_path, chunksize=chunksize, dtype=str):
+        if id_column is None:
+            id_column = next((c for c in ('player_id', 'enhanced_player_id') if c in df.columns), None)
+            if id_column is None:
+                raise ValueError(f"{csv_path} has no player_id or enhanced_player_id column")
+        df = df.dropna(subset=[id_column])
+        keys = identity_keys(df, name_cache, team_cache)
+        pairs = pd.DataFrame({'key': keys, 'id': df[id_column].to_numpy()}).drop_duplicates('key')
+        added += registry.register(zip(pairs['key'], pairs['id']))
+    print(f"Imported {added} identities from {csv_path} in {time.perf_counter() - start:.2f} seconds")
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or seed a persistent player-ID registry')
+    parser.add_argument('registry', help='Registry database file')
+    parser.add_argument('--import', dest='import_csv',
+                        help='Register the existing IDs in a CSV (Name, First_Team, player_id)')
+    parser.add_argument('--stats', action='store_true', help='Show registry size and runs')
+    args = parser.parse_args()
+
+    with PlayerIdRegistry(args.registry, source=f"import {args.import_csv}" if args.import_csv else None) as registry:
+        if args.import_csv:
+            import_ids(registry, args.import_csv)
+        if args.stats or not args.import_csv:
+            total, runs = registry.stats()
+            print(f"{total} identities registered in {args.registry}")
+            for run_id, started_at, source, added in runs:
+                if added:
+                    print(f"  run {run_id} at {started_at}: {added} added ({source or 'unknown source'})")
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,29 @@
+import argparse
+import hashlib
+import json
+import importlib.util
+import multiprocessing
+import queue
+import threading
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import csv
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from urllib.parse import urljoin, urlparse
 import time # Added for delay
 import re # Need re for main function regex
 
+from fetcher import Fetcher, PageCache
+
 BASE_URL = "https://www.footballsquads.co.uk"
 ARCHIVE_URL = "https://www.footballsquads.co.uk/archive.htm"
 NUM_PLAYER_DATA_COLS = 15 # Define how many player columns we expect in CSV
 
+# lxml builds the tree several times faster than the pure-Python parser
+PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
 # --- Map country names to expected part of flag image source URL ---
 # (Based on common patterns and the example `images/flags/europe/eng.gif`)
 COUNTRY_FLAG_MAP = {
@@ -25,11 +39,15 @@ COUNTRY_FLAG_MAP = {
     # Add more mappings if needed by inspecting flag image URLs
 }
 
-def get_soup(url):
+def get_soup(url, fetcher=None):
     """
     Given a URL, return a BeautifulSoup object of its HTML content.
-    Includes a small delay.
+    With a Fetcher, the request goes through its pooled sessions, rate
+    limits and retries; otherwise a plain request with a small delay.
     """
+    if fetcher is not None:
+        text = fetcher.get_text(url)
+        return BeautifulSoup(text, PARSER) if text is not None else None
     try:
         print(f"Fetching: {url}") # Add print statement to see progress
         response = requests.get(url)
@@ -53,13 +71,11 @@ def is_valid_link(href):
         return False
     return True
 
-def scrape_team_roster(team_url, country, season, league, writer):
+def parse_team_roster(soup, team_url, country, season, league):
     """
-    Given the URL of a team's squad page, scrape the roster table using
-    the logic adapted from the user's example, and write to the main CSV writer.
+    Given the parsed squad page of a team, extract the roster table using
+    the logic adapted from the user's example, as CSV rows.
     """
-    soup = get_soup(team_url)
-    if not soup: return # Skip if fetching failed
 
     # --- New Table Finding Logic (adapted from user's example) ---
     roster_table = None
@@ -92,13 +108,13 @@ def scrape_team_roster(team_url, country, season, league, writer):
 
     if not roster_table:
         print(f"  - Could not identify roster table using key header check on: {team_url}")
-        return
+        return []
 
     # --- Data Extraction (adapted) ---
     rows = roster_table.find_all("tr")
     if not rows:
         print(f"  - Roster table found, but it contains no rows: {team_url}")
-        return
+        return []
 
     # Determine where data rows start (skip header row(s))
     # A simple approach: skip the first row if it contained the headers we matched.
@@ -121,11 +137,11 @@ def scrape_team_roster(team_url, country, season, league, writer):
         start_row_index = 1
     elif start_row_index == 0 and len(rows) <=1 :
          print(f"    - Table has header but no data rows found: {team_url}")
-         return # No data rows to process
+         return [] # No data rows to process
 
 
     print(f"  - Extracting player data starting from row index {start_row_index}")
-    players_extracted = 0
+    player_rows = []
     for row in rows[start_row_index:]:
         # Get text from both <td> and <th> (player number might be in <th>)
         cols = [cell.get_text(strip=True) for cell in row.find_all(["td", "th"])]
@@ -139,28 +155,33 @@ def scrape_team_roster(team_url, country, season, league, writer):
 
             # Construct the full data row including metadata
             data_row = [country, season, league, team_url] + player_data
-            writer.writerow(data_row)
-            players_extracted += 1
+            player_rows.append(data_row)
         # else: # Optional: Log skipped rows
             # print(f"    - Skipping row with insufficient data: {cols}")
 
-    print(f"  - Extracted {players_extracted} players from: {team_url}")
+    print(f"  - Extracted {len(player_rows)} players from: {team_url}")
+    return player_rows
 
-def scrape_league_page(league_url, country, season, league, writer):
+def scrape_team_roster(team_url, country, season, league, writer, fetcher=None):
     """
-    Scrape a single league page to find all teams, then scrape each team roster.
+    Given the URL of a team's squad page, scrape the roster table and write
+    it to the main CSV writer.
     """
-    soup = get_soup(league_url)
+    soup = get_soup(team_url, fetcher)
     if not soup: return # Skip if fetching failed
+    writer.writerows(parse_team_roster(soup, team_url, country, season, league))
 
-    print(f"Scraping League Page: {league_url} ({country}/{season}/{league})")
+def find_team_links(soup, league_url):
+    """
+    Find the links on a league page that likely lead to team pages.
+    """
     # Find links that likely lead to team pages within the main content area
     main_div = soup.find('div', id='main')
     if not main_div:
          print(f"  - No 'main' div found on league page: {league_url}")
          main_div = soup # Fallback to searching the whole page
 
-    team_links_found = 0
+    team_links = []
     for a_tag in main_div.find_all("a", href=True):
         href = a_tag["href"]
         # Check if it looks like a team page link (ends in .htm, not index/main page)
@@ -169,91 +190,464 @@ def scrape_league_page(league_url, country, season, league, writer):
             team_page_url = urljoin(league_url, href)
             # Basic check to ensure we're not looping back to the league page itself
             if urlparse(team_page_url).path != urlparse(league_url).path:
-                 team_links_found += 1
-                 scrape_team_roster(team_page_url, country, season, league, writer)
+                 team_links.append(team_page_url)
 
-    if team_links_found == 0:
+    if not team_links:
         print(f"  - No team links found on league page: {league_url}")
+    return team_links
 
+def scrape_league_page(league_url, country, season, league, writer, fetcher=None):
+    """
+    Scrape a single league page to find all teams, then scrape each team roster.
+    """
+    soup = get_soup(league_url, fetcher)
+    if not soup: return # Skip if fetching failed
 
-def main():
-    output_filename = "footballsquads_archive.csv"
-    try:
-        with open(output_filename, mode="w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-
-            # --- Define Header ---
-            header = ["Country", "Season", "LeagueName", "TeamURL"]
-            # Add generic player data column headers
-            header.extend([f"PlayerData_{i+1}" for i in range(NUM_PLAYER_DATA_COLS)])
-            writer.writerow(header)
-
-            archive_soup = get_soup(ARCHIVE_URL)
-            if not archive_soup:
-                print("Failed to fetch archive page. Exiting.")
-                return
+    print(f"Scraping League Page: {league_url} ({country}/{season}/{league})")
+    for team_page_url in find_team_links(soup, league_url):
+        scrape_team_roster(team_page_url, country, season, league, writer, fetcher)
 
-            processed_leagues = set() # Keep track of processed league URLs to avoid duplicates
+def find_league_links(archive_soup, base_url=BASE_URL):
+    """
+    Find the league/season pages linked from the archive page, with the
+    country, season and league guessed from each link's path.
+    """
+    leagues = []
+    processed_leagues = set() # Keep track of processed league URLs to avoid duplicates
 
-            print("\nStarting link extraction from archive page...")
-            # Find links within the main content for better targeting
-            main_div = archive_soup.find('div', id='main')
-            if not main_div:
-                 print("Could not find main div on archive page, searching whole page.")
-                 main_div = archive_soup # Fallback
+    print("\nStarting link extraction from archive page...")
+    # Find links within the main content for better targeting
+    main_div = archive_soup.find('div', id='main')
+    if not main_div:
+         print("Could not find main div on archive page, searching whole page.")
+         main_div = archive_soup # Fallback
 
-            for a_tag in main_div.find_all("a", href=True):
-                href = a_tag["href"]
-                link_text = a_tag.get_text(strip=True)
+    for a_tag in main_div.find_all("a", href=True):
+        href = a_tag["href"]
+        link_text = a_tag.get_text(strip=True)
+
+        # Focus on links likely to be league/season pages based on path structure
+        if is_valid_link(href) and href.lower().endswith(".htm"):
+            full_link = urljoin(base_url + "/", href)
+
+            # Avoid processing the same league URL multiple times
+            if full_link in processed_leagues:
+                continue
+
+            # Parse metadata from URL path
+            parsed_path = urlparse(full_link).path
+            path_parts = parsed_path.strip("/").split("/")
+
+            # Expecting structure like: /country/season/league/page.htm
+            # Or sometimes /country/league/page.htm (if season implicit)
+            if len(path_parts) >= 3:
+                country_guess = path_parts[0]
+                # Try to identify season vs league based on common patterns
+                part1 = path_parts[1]
+                part2 = path_parts[2]
+
+                # Simple heuristic: if part1 looks like YYYY-YYYY or YYYY, assume it's season
+                if re.match(r"^\d{4}(-\d{4})?$", part1):
+                    season_guess = part1
+                    league_guess = part2
+                # Maybe the season is implicit in the page itself?
+                # Fallback if structure is different
+                else:
+                     season_guess = link_text # Or extract from page title later
+                     league_guess = part1 # Assume part1 is league if not season format
+
+                print(f"\nFound potential league link: {full_link}")
+                print(f"  -> Guessed Metadata: Country={country_guess}, Season={season_guess}, League={league_guess}")
+                leagues.append((full_link, country_guess, season_guess, league_guess))
+                processed_leagues.add(full_link) # Mark as processed
+
+            else:
+                 print(f"Skipping link with unexpected path structure: {full_link}")
+    return leagues
+
+def is_historical(url, current_year=None):
+    """
+    Whether a page belongs to a finished season, so it will never change.
+    Seasons ending this year or later, and pages without a season in their
+    path (like the archive index), count as current.
+    """
+    current_year = current_year or datetime.now().year
+    match = re.search(r"/(\d{4})-(\d{4})/", urlparse(url).path + "/")
+    return bool(match) and int(match.group(2)) < current_year
 
-                # Focus on links likely to be league/season pages based on path structure
-                if is_valid_link(href) and href.lower().endswith(".htm"):
-                    full_link = urljoin(BASE_URL, href)
+class Checkpoint:
+    """
+    Record of finished pages, kept as JSON lines next to the output CSV.
+
+    Each team entry holds the digest of the page its rows came from and
+    where those rows sit in the CSV. Every entry holds the CSV's size after
+    the rows it covers were flushed; on resume the CSV is cut back to the
+    last recorded size, so rows written after the last entry (by a run that
+    died) are never duplicated. A torn last line is cut off the checkpoint
+    itself before new entries are appended.
+    """
 
-                    # Avoid processing the same league URL multiple times
-                    if full_link in processed_leagues:
-                        continue
+    def __init__(self, path):
+        self.path = path
+        self.teams = {}
+        self.spans = {}
+        self.leagues = set()
+        self.offset = None
+        self.rows = 0
+        self.superseded = False
+        self.size = None
+        self.file = None
+
+    def load(self):
+        # Bytes of complete entries, so a torn tail can be cut off in open()
+        self.size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated entry")
+                    entry = json.loads(line)
+                except ValueError:
+                    break # A torn last line from an interrupted run
+                if entry["kind"] == "team":
+                    self.superseded |= entry["url"] in self.teams
+                    self.teams[entry["url"]] = entry["digest"]
+                    self.spans[entry["url"]] = (entry["first_row"], entry["rows"])
+                    self.rows = entry["first_row"] + entry["rows"]
+                elif entry["kind"] == "league":
+                    self.leagues.add(entry["url"])
+                self.offset = entry["offset"]
+                self.size += len(line)
+        return self
+
+    def open(self, mode="a"):
+        if mode == "a" and self.size is not None:
+            # Appending after a torn line would hide every new entry from the
+            # next load(), which stops at the tear
+            os.truncate(self.path, self.size)
+        self.file = open(self.path, mode, encoding="utf-8")
+        return self
+
+    def record(self, kind, csv_file, **fields):
+        """Append an entry once everything written to csv_file so far is flushed"""
+        csv_file.flush()
+        entry = {"kind": kind, **fields, "offset": csv_file.tell()}
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        self.offset = entry["offset"]
+
+    def record_team(self, csv_file, url, digest, rows):
+        self.superseded |= url in self.teams
+        self.teams[url] = digest
+        self.spans[url] = (self.rows, rows)
+        self.record("team", csv_file, url=url, digest=digest, first_row=self.rows, rows=rows)
+        self.rows += rows
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class StageStats:
+    """Items handled and time spent by one pipeline stage"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self.lock:
+            self.items += items
+            self.busy += seconds
+
+    def summary(self, elapsed, unit="pages"):
+        # Utilization near 100% marks the stage that limits the crawl
+        with self.lock:
+            utilization = self.busy / max(elapsed * self.workers, 1e-9) * 100
+            return f"{self.name} {self.items / max(elapsed, 1e-9):.1f} {unit}/s ({utilization:.0f}% busy)"
+
+def parse_roster_page(text, team_url, country, season, league):
+    """
+    Parse a team page into CSV rows; runs in the parser processes.
+    Only <table> elements are built, with lxml when it is installed.
+    Returns the rows and the seconds spent parsing.
+    """
+    started = time.perf_counter()
+    soup = BeautifulSoup(text, PARSER, parse_only=SoupStrainer("table"))
+    rows = parse_team_roster(soup, team_url, country, season, league)
+    return rows, time.perf_counter() - started
 
-                    # Parse metadata from URL path
-                    parsed_path = urlparse(full_link).path
-                    path_parts = parsed_path.strip("/").split("/")
+def _fetch_league(fetcher, league_url, results, stats):
+    started = time.perf_counter()
+    try:
+        soup = get_soup(league_url, fetcher)
+        team_urls = find_team_links(soup, league_url) if soup else []
+    except Exception as e:
+        print(f"Error reading league page {league_url}: {e}")
+        team_urls = []
+    stats.add(1, time.perf_counter() - started)
+    results.put(("league", league_url, team_urls))
+
+def _fetch_team(fetcher, team_url, league_url, known_digest, pages, results, stats):
+    """Fetch a team page and queue it for parsing, unless it is unchanged or failed"""
+    started = time.perf_counter()
+    try:
+        text = fetcher.get_text(team_url)
+    except Exception as e:
+        print(f"Error fetching {team_url}: {e}")
+        text = None
+    stats.add(1, time.perf_counter() - started)
+    if text is None:
+        results.put(("team", team_url, (league_url, None, None)))
+        return
+    digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+    if digest == known_digest:
+        results.put(("team", team_url, (league_url, None, digest)))
+        return
+    # Blocks while the queue is full, so fetching never runs far ahead of parsing
+    pages.put((team_url, league_url, text, digest))
+
+def _dispatch_parsing(pages, parse_pool, league_context, results, stats, max_in_flight):
+    """Feed queued pages to the parser processes until the None sentinel arrives"""
+    slots = threading.BoundedSemaphore(max_in_flight)
+    while True:
+        item = pages.get()
+        if item is None:
+            return
+        team_url, league_url, text, digest = item
+
+        def done(future, team_url=team_url, league_url=league_url, digest=digest):
+            slots.release()
+            try:
+                rows, seconds = future.result()
+            except Exception as e:
+                print(f"Error parsing {team_url}: {e}")
+                rows, seconds, digest = None, 0.0, None
+            stats.add(1, seconds)
+            results.put(("team", team_url, (league_url, rows, digest)))
+
+        slots.acquire()
+        future = parse_pool.submit(parse_roster_page, text, team_url, *league_context[league_url])
+        future.add_done_callback(done)
+
+def crawl(fetcher, writer, base_url=BASE_URL, workers=8, report_interval=10.0,
+          checkpoint=None, csv_file=None, parse_workers=None, queue_size=64):
+    """
+    Scrape the whole archive as a fetch -> parse -> write pipeline.
 
-                    # Expecting structure like: /country/season/league/page.htm
-                    # Or sometimes /country/league/page.htm (if season implicit)
-                    if len(path_parts) >= 3:
-                        country_guess = path_parts[0]
-                        # Try to identify season vs league based on common patterns
-                        part1 = path_parts[1]
-                        part2 = path_parts[2]
+    I/O threads fetch league and team pages through the shared fetcher,
+    which enforces the per-host limits, and put team pages on a bounded
+    queue. A process pool parses them, and only this thread writes to the
+    CSV. Progress reports show each stage's rate and how busy it is, so the
+    slowest stage (network or CPU) stands out.
 
-                        # Simple heuristic: if part1 looks like YYYY-YYYY or YYYY, assume it's season
-                        if re.match(r"^\d{4}(-\d{4})?$", part1):
-                            season_guess = part1
-                            league_guess = part2
-                        # Maybe the season is implicit in the page itself?
-                        # Fallback if structure is different
-                        else:
-                             season_guess = link_text # Or extract from page title later
-                             league_guess = part1 # Assume part1 is league if not season format
+    With a checkpoint, finished historical pages are skipped, finished
+    current pages are only re-parsed if their content changed, and each
+    team's rows are checkpointed as soon as they are written.
 
+    Returns the number of player rows written.
+    """
+    archive_soup = get_soup(base_url + "/archive.htm", fetcher)
+    if not archive_soup:
+        print("Failed to fetch archive page. Exiting.")
+        return 0
+
+    done_teams = dict(checkpoint.teams) if checkpoint else {}
+    done_leagues = set(checkpoint.leagues) if checkpoint else set()
+    parse_workers = parse_workers or os.cpu_count()
+    fetch_stats = StageStats("fetch", workers)
+    parse_stats = StageStats("parse", parse_workers)
+    write_stats = StageStats("write", 1)
+    pages = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+    league_context = {}
+    teams_left = {}
+    rows_written = 0
+    skipped = 0
+    outstanding = 0
+    started = time.monotonic()
+
+    # Fork where available so parser processes start quickly. The first
+    # submit starts every worker, before any I/O threads exist to fork from.
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(max_workers=parse_workers, mp_context=context) as parse_pool, \
+            ThreadPoolExecutor(max_workers=workers) as fetch_pool:
+        parse_pool.submit(int).result()
+        dispatcher = threading.Thread(target=_dispatch_parsing, daemon=True,
+                                      args=(pages, parse_pool, league_context, results, parse_stats,
+                                            parse_workers * 2))
+        dispatcher.start()
+
+        for league_url, country, season, league in find_league_links(archive_soup, base_url):
+            if league_url in done_leagues and is_historical(league_url):
+                skipped += 1
+                continue
+            league_context[league_url] = (country, season, league)
+            fetch_pool.submit(_fetch_league, fetcher, league_url, results, fetch_stats)
+            outstanding += 1
+
+        last_report = time.monotonic()
+        while outstanding:
+            try:
+                kind, url, payload = results.get(timeout=report_interval)
+            except queue.Empty:
+                kind = None
+            if kind == "league":
+                outstanding -= 1
+                todo = [team_url for team_url in payload
+                        if not (team_url in done_teams and is_historical(team_url))]
+                skipped += len(payload) - len(todo)
+                teams_left[url] = len(todo)
+                for team_url in todo:
+                    fetch_pool.submit(_fetch_team, fetcher, team_url, url, done_teams.get(team_url),
+                                      pages, results, fetch_stats)
+                    outstanding += 1
+                if payload and not todo and checkpoint:
+                    checkpoint.record("league", csv_file, url=url)
+            elif kind == "team":
+                outstanding -= 1
+                league_url, rows, digest = payload
+                if digest is not None:
+                    if rows is not None:
+                        write_started = time.perf_counter()
+                        writer.writerows(rows)
+                        rows_written += len(rows)
+                        if checkpoint:
+                            checkpoint.record_team(csv_file, url, digest, len(rows))
+                        write_stats.add(len(rows), time.perf_counter() - write_started)
+                    teams_left[league_url] -= 1
+                    if teams_left[league_url] == 0 and checkpoint:
+                        checkpoint.record("league", csv_file, url=league_url)
+                # A failed page leaves its league unfinished, so a re-run retries it
+
+            if time.monotonic() - last_report >= report_interval:
+                last_report = time.monotonic()
+                elapsed = last_report - started
+                print(f"Progress: {rows_written} players, {outstanding} pages pending, "
+                      f"{skipped} finished pages skipped; {fetch_stats.summary(elapsed)}, "
+                      f"queue {pages.qsize()}/{queue_size}, {parse_stats.summary(elapsed)}, "
+                      f"{write_stats.summary(elapsed, 'rows')}; {fetcher.stats.summary()}")
+
+        pages.put(None)
+        dispatcher.join()
+
+    elapsed = time.monotonic() - started
+    print(f"Stages: {fetch_stats.summary(elapsed)}, {parse_stats.summary(elapsed)}, "
+          f"{write_stats.summary(elapsed, 'rows')}")
+    if skipped:
+        print(f"Skipped {skipped} league/team pages finished in an earlier run")
+    return rows_written
+
+def drop_replaced_rows(output_filename, checkpoint):
+    """
+    Remove the old rows of team pages that changed since they were first
+    scraped, keeping only the rows from each page's latest checkpoint entry,
+    then rewrite the checkpoint to match the compacted CSV.
+    """
+    tmp_filename = output_filename + ".tmp"
+    new_first_rows = {}
+    kept = dropped = 0
+    with open(output_filename, newline="", encoding="utf-8") as src, \
+            open(tmp_filename, "w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        header = next(reader)
+        writer.writerow(header)
+        url_column = header.index("TeamURL")
+        for index, row in enumerate(reader):
+            span = checkpoint.spans.get(row[url_column])
+            if span is not None and not span[0] <= index < span[0] + span[1]:
+                dropped += 1
+                continue
+            if span is not None:
+                new_first_rows.setdefault(row[url_column], kept)
+            writer.writerow(row)
+            kept += 1
+        dst.flush()
+        size = dst.tell()
+
+    tmp_checkpoint = checkpoint.path + ".tmp"
+    with open(tmp_checkpoint, "w", encoding="utf-8") as f:
+        for url, first_row in sorted(new_first_rows.items(), key=lambda item: item[1]):
+            entry = {"kind": "team", "url": url, "digest": checkpoint.teams[url],
+                     "first_row": first_row, "rows": checkpoint.spans[url][1], "offset": size}
+            f.write(json.dumps(entry) + "\n")
+        for url in sorted(checkpoint.leagues):
+            f.write(json.dumps({"kind": "league", "url": url, "offset": size}) + "\n")
+    os.replace(tmp_filename, output_filename)
+    os.replace(tmp_checkpoint, checkpoint.path)
+    print(f"Dropped {dropped} outdated rows of changed team pages")
 
-                        print(f"\nFound potential league link: {full_link}")
-                        print(f"  -> Guessed Metadata: Country={country_guess}, Season={season_guess}, League={league_guess}")
+def main():
+    parser = argparse.ArgumentParser(description="Scrape the footballsquads.co.uk archive into a CSV")
+    parser.add_argument("--output", "-o", default="footballsquads_archive.csv", help="Output CSV file")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="Site to scrape; point it at a local stand-in server for testing")
+    parser.add_argument("--workers", type=int, default=8, help="Threads fetching pages")
+    parser.add_argument("--parse-workers", type=int, help="Processes parsing team pages (default: one per CPU core)")
+    parser.add_argument("--queue-size", type=int, default=64, help="Fetched pages that may wait for a parser")
+    parser.add_argument("--per-host", type=int, default=4, help="Most requests in flight to one host")
+    parser.add_argument("--rate", type=float, default=5.0, help="Most requests per second to one host")
+    parser.add_argument("--burst", type=float, help="Requests allowed at once after an idle spell (default: rate)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries for failed requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for a response")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between progress reports")
+    parser.add_argument("--cache-dir", default="http_cache", help="Directory for cached pages")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the page cache")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Start over instead of resuming from the output's checkpoint")
+    args = parser.parse_args()
+
+    output_filename = args.output
+    checkpoint_filename = output_filename + ".checkpoint"
+    cache = None if args.no_cache else PageCache(args.cache_dir)
+    fetcher = Fetcher(per_host=args.per_host, rate=args.rate, burst=args.burst,
+                      retries=args.retries, timeout=args.timeout, cache=cache, immutable=is_historical)
+
+    # Resume when a checkpoint from an earlier run exists, cutting the CSV
+    # back to the rows the checkpoint covers
+    checkpoint = Checkpoint(checkpoint_filename)
+    resume = (not args.fresh and os.path.exists(output_filename) and os.path.exists(checkpoint_filename)
+              and checkpoint.load().offset is not None)
+    if resume:
+        with open(output_filename, "r+b") as f:
+            f.truncate(checkpoint.offset)
+        print(f"Resuming: {len(checkpoint.teams)} team pages and {checkpoint.rows} rows already scraped")
+    else:
+        checkpoint = Checkpoint(checkpoint_filename)
 
-                        # Scrape the identified league page
-                        scrape_league_page(full_link, country_guess, season_guess, league_guess, writer)
-                        processed_leagues.add(full_link) # Mark as processed
+    try:
+        with open(output_filename, mode="a" if resume else "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            checkpoint.open("a" if resume else "w")
 
-                    else:
-                         print(f"Skipping link with unexpected path structure: {full_link}")
+            if not resume:
+                # --- Define Header ---
+                header = ["Country", "Season", "LeagueName", "TeamURL"]
+                # Add generic player data column headers
+                header.extend([f"PlayerData_{i+1}" for i in range(NUM_PLAYER_DATA_COLS)])
+                writer.writerow(header)
+                checkpoint.record("start", f)
 
+            rows_written = crawl(fetcher, writer, args.base_url.rstrip("/"), args.workers,
+                                 args.report_interval, checkpoint, f, args.parse_workers, args.queue_size)
+            print(f"\nWrote {rows_written} player rows; {fetcher.stats.summary()}")
 
     except IOError as e:
         print(f"Error writing to CSV file {output_filename}: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        checkpoint.close()
+
+    if checkpoint.superseded:
+        drop_replaced_rows(output_filename, checkpoint)
 
     print(f"\nScraping attempt complete. Data saved to {output_filename}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
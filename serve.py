@@ -0,0 +1,292 @@
+"""
+Production entry point for the player connections web app.
+
+The graph is loaded once in the parent process and frozen with gc.freeze()
+so the garbage collector never writes to those objects again. The parent
+then forks worker processes that accept connections on one shared listening
+socket. Workers share the graph's memory pages copy-on-write instead of each
+re-running load_data, so adding workers costs only their private pages.
+
+Graph reloads happen in the parent too. It watches the graph file, and also
+reloads on SIGHUP or when a worker passes on a POST /api/admin/reload. Once
+the new graph and its indexes are built, the parent replaces the workers one
+at a time (a rolling restart). Each new worker shares the new graph
+copy-on-write, so every worker serves the same version. An old worker stops
+accepting connections and finishes its in-flight requests before it exits.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import app as web
+
+# Seconds a retiring worker waits for in-flight requests before exiting
+DRAIN_TIMEOUT = 30
+
+def read_memory(pid):
+    """
+    Return memory usage for a process in bytes, or None if unavailable
+
+    Reads /proc/<pid>/smaps_rollup (Linux) so shared and private pages can be
+    told apart: 'private' is what the process would free if it exited, which
+    for a worker is its real cost on top of the parent's graph.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return None
+
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+def format_mb(num_bytes):
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+def report_memory(workers):
+    """Print RSS and private (per-worker overhead) memory for the parent and each worker"""
+    parent = read_memory(os.getpid())
+    if parent is None:
+        print("Memory report unavailable (no /proc/<pid>/smaps_rollup on this platform)")
+        return
+
+    print(f"Parent  (pid {os.getpid()}): rss {format_mb(parent['rss'])}, "
+          f"private {format_mb(parent['private'])}")
+    total_private = 0
+    for worker_id, pid in sorted(workers.items()):
+        mem = read_memory(pid)
+        if mem is None:
+            continue
+        total_private += mem['private']
+        print(f"Worker {worker_id} (pid {pid}): rss {format_mb(mem['rss'])}, "
+              f"shared {format_mb(mem['shared'])}, private {format_mb(mem['private'])}")
+    if workers:
+        print(f"Average per-worker overhead: {format_mb(total_private / len(workers))}")
+
+def run_worker(sock, worker_id, threaded, reload_pipe):
+    """Serve requests on the inherited listening socket until terminated"""
+    # Drop the parent's handlers (forked along with it) until the server is up
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    # The parent reloads the graph and re-forks the workers; an admin reload
+    # that reaches this worker is written to the parent's pipe
+    def request_reload(graph_file):
+        os.write(reload_pipe, (graph_file or '').encode() + b'\n')
+    web.reload_hook = request_reload
+
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, web.app, threaded=threaded, fd=sock.fileno())
+    # Keep track of request threads, so server_close() can wait for them
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    # SIGTERM stops accepting connections; shutdown() has to be called from
+    # another thread than the one running serve_forever()
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Worker {worker_id} (pid {os.getpid()}) serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+        # Let in-flight requests finish, but don't wait on them forever
+        threading.Timer(DRAIN_TIMEOUT, os._exit, args=(0,)).start()
+        server.server_close()
+    finally:
+        os._exit(0)
+
+def spawn_worker(sock, worker_id, threaded, reload_pipe):
+    """Fork one worker process and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        run_worker(sock, worker_id, threaded, reload_pipe)
+    return pid
+
+def freeze_heap():
+    """
+    Move everything loaded so far into the permanent generation
+
+    Without this, the first collection in each worker would touch every
+    object header and copy the whole graph into the worker's private memory.
+    """
+    gc.collect()
+    gc.freeze()
+
+def read_reload_requests(reload_fd, buffer):
+    """
+    Reload requests the workers wrote to the pipe since the last call
+
+    Returns the snapshot path of the latest request ('' for GRAPH_FILE), or
+    None if there were none. Several requests in a row are served by one reload.
+    """
+    try:
+        while True:
+            data = os.read(reload_fd, 4096)
+            if not data:
+                break
+            buffer += data
+    except BlockingIOError:
+        pass
+    *requests, rest = buffer.split(b'\n')
+    buffer[:] = rest
+    return requests[-1].decode() if requests else None
+
+def reload_parent(graph_file):
+    """Load a new graph snapshot in the parent; returns True if a new version went live"""
+    # Let the old graph be collected once nothing uses it any more
+    gc.unfreeze()
+    reloaded = web.reload_graph(graph_file or None)
+    freeze_heap()
+    return reloaded
+
+def restart_workers(workers, sock, threaded, reload_pipe):
+    """
+    Replace the workers one at a time, so they all serve the parent's graph
+
+    Each new worker is forked before its predecessor is told to stop, so
+    there is always a worker accepting connections.
+    """
+    for worker_id, old_pid in list(workers.items()):
+        workers[worker_id] = spawn_worker(sock, worker_id, threaded, reload_pipe)
+        try:
+            os.kill(old_pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    print(f"Restarted {len(workers)} workers on graph version {web.live_state.version}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-fork server for the player connections web app')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind to')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes (default: one per core)')
+    parser.add_argument('--no-threads', action='store_true',
+                        help='Handle one request at a time in each worker')
+    parser.add_argument('--report-interval', type=float, default=0,
+                        help='Seconds between memory reports (0 = only at startup)')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("serve.py needs os.fork(); use 'python app.py' on this platform.")
+        sys.exit(1)
+
+    startup_start = time.time()
+    if not web.load_data(wait_for_indexes=True):
+        print("Failed to load data. Exiting.")
+        sys.exit(1)
+    load_time = time.time() - startup_start
+
+    freeze_heap()
+
+    sock = socket.create_server((args.host, args.port), backlog=128)
+    sock.set_inheritable(True)
+    # Workers write reload requests here; the parent polls it without blocking
+    reload_fd, reload_pipe = os.pipe()
+    os.set_blocking(reload_fd, False)
+    reload_buffer = bytearray()
+
+    threaded = not args.no_threads
+    workers = {}
+    fork_start = time.time()
+    for worker_id in range(args.workers):
+        workers[worker_id] = spawn_worker(sock, worker_id, threaded, reload_pipe)
+    fork_time = time.time() - fork_start
+
+    print(f"Graph loaded in {load_time:.2f} seconds")
+    print(f"Forked {len(workers)} workers in {fork_time:.2f} seconds "
+          f"(startup {time.time() - startup_start:.2f} seconds total)")
+
+    shutting_down = False
+    reload_requested = False
+
+    def request_reload(signum, frame):
+        nonlocal reload_requested
+        reload_requested = True
+
+    def shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in workers.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, request_reload)
+
+    poll_interval = web.app.config['RELOAD_POLL_INTERVAL']
+    last_seen = web.live_state.version
+    last_poll = time.time()
+
+    # Give workers a moment to start before measuring them
+    time.sleep(1)
+    report_memory(workers)
+    last_report = time.time()
+
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+
+        if pid:
+            worker_id = next((wid for wid, wpid in workers.items() if wpid == pid), None)
+            if worker_id is not None:
+                del workers[worker_id]
+                if not shutting_down:
+                    print(f"Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+                    workers[worker_id] = spawn_worker(sock, worker_id, threaded, reload_pipe)
+            continue
+
+        # Reload on SIGHUP, on a worker's admin request, or when the graph file changes
+        graph_file = read_reload_requests(reload_fd, reload_buffer)
+        if reload_requested:
+            reload_requested = False
+            graph_file = graph_file or ''
+        if graph_file is None and poll_interval and time.time() - last_poll >= poll_interval:
+            last_poll = time.time()
+            try:
+                version = web.pc.graph_version(web.app.config['GRAPH_FILE'], use_pickle=True)
+            except OSError:
+                version = last_seen  # Mid-replace or removed; check again later
+            if version != last_seen:
+                last_seen = version
+                if version != web.live_state.version:
+                    graph_file = ''
+        if graph_file is not None and not shutting_down:
+            if reload_parent(graph_file) and not shutting_down:
+                restart_workers(workers, sock, threaded, reload_pipe)
+            continue
+
+        if args.report_interval and time.time() - last_report >= args.report_interval:
+            report_memory(workers)
+            last_report = time.time()
+        time.sleep(0.5)
+
+    sock.close()
+    print("All workers stopped.")
+
+if __name__ == '__main__':
+    main()
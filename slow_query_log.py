@@ -0,0 +1,165 @@
+"""
+Slow-query log for path searches.
+
+Any tracked query that takes longer than the threshold is written as one JSON
+line: the resolved player IDs, distance, number of paths, nodes expanded and
+elapsed time. A configurable fraction of queries also runs under cProfile;
+if one of those turns out slow, its hottest functions are attached to the
+entry. Files rotate by size (slow_queries.jsonl, .1, .2, ...).
+
+The entries double as benchmark inputs. read_entries() reads a log and its
+rotated files back, and the command line lists the worst queries:
+    python slow_query_log.py logs/slow_queries.jsonl --top 20
+"""
+import argparse
+import cProfile
+import json
+import logging
+import logging.handlers
+import pstats
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# cProfile can only run one profiler at a time, so sampled queries take turns
+_profile_lock = threading.Lock()
+
+class TrackedQuery:
+    """
+    Timing (and optional profile) of one query
+
+    Use as a context manager, or call start() and finish() when the query
+    spans a streamed response. Add details with record(). With log=None
+    nothing is timed or written.
+    """
+
+    def __init__(self, log, endpoint):
+        self.log = log
+        self.entry = {'endpoint': endpoint}
+        self.profiler = None
+        self.started = None
+
+    def record(self, **fields):
+        self.entry.update(fields)
+
+    def start(self):
+        if self.log is None:
+            return self
+        if self.log.profile_rate and random.random() < self.log.profile_rate:
+            if _profile_lock.acquire(blocking=False):
+                self.profiler = cProfile.Profile()
+                try:
+                    self.profiler.enable()
+                except ValueError:  # Another profiler (e.g. a debugger) is active
+                    self.profiler = None
+                    _profile_lock.release()
+        self.started = time.perf_counter()
+        return self
+
+    def finish(self):
+        if self.started is None:
+            return
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.started = None
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profile_lock.release()
+
+        if elapsed_ms >= self.log.threshold_ms:
+            self.entry['elapsed_ms'] = round(elapsed_ms, 2)
+            if self.profiler is not None:
+                self.entry['profile'] = top_functions(self.profiler, self.log.profile_lines)
+            self.log.write(self.entry)
+        self.profiler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.finish()
+        return False
+
+class SlowQueryLog:
+    """
+    Rotating JSONL log of queries slower than a threshold
+
+    Args:
+        path: Log file; rotated copies get .1, .2, ... suffixes
+        threshold_ms: Queries at least this slow are logged
+        profile_rate: Fraction of queries (0-1) run under cProfile
+        max_bytes: Size at which the file is rotated
+        backup_count: Number of rotated files to keep
+        profile_lines: Functions to keep from each profile
+    """
+
+    def __init__(self, path='logs/slow_queries.jsonl', threshold_ms=500, profile_rate=0.0,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, profile_lines=25):
+        self.path = Path(path)
+        self.threshold_ms = threshold_ms
+        self.profile_rate = profile_rate
+        self.profile_lines = profile_lines
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(f'football_links.slow_queries.{self.path.resolve()}')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+
+    def track(self, endpoint):
+        """Start tracking a query for the given endpoint"""
+        return TrackedQuery(self, endpoint)
+
+    def write(self, entry):
+        entry = {'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'), **entry}
+        self.logger.info(json.dumps(entry, default=str))
+
+def top_functions(profiler, limit):
+    """The functions with the most cumulative time in a profile, as JSON-friendly dicts"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': f"{Path(filename).name}:{line}({name})" if line else name,
+        'calls': calls,
+        'total_ms': round(total * 1000, 3),
+        'cumulative_ms': round(cumulative * 1000, 3),
+    } for (filename, line, name), (_, calls, total, cumulative, _) in rows]
+
+def read_entries(path):
+    """Yield entries from a slow-query log and its rotated files, oldest file first"""
+    path = Path(path)
+    rotated = [p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()]
+    rotated.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    for log_file in rotated + ([path] if path.exists() else []):
+        with open(log_file) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the slowest queries in a slow-query log')
+    parser.add_argument('path', nargs='?', default='logs/slow_queries.jsonl', help='Slow-query log file')
+    parser.add_argument('--top', type=int, default=10, help='Number of queries to show')
+    parser.add_argument('--profile', action='store_true', help='Also print attached profiles')
+    args = parser.parse_args()
+
+    entries = sorted(read_entries(args.path), key=lambda e: e.get('elapsed_ms', 0), reverse=True)
+    print(f"{len(entries)} slow queries logged")
+    for entry in entries[:args.top]:
+        print(f"{entry.get('elapsed_ms', 0):9.1f} ms  {entry.get('endpoint')}  "
+              f"{entry.get('player1_id')} -> {entry.get('player2_id')}  "
+              f"distance={entry.get('distance')} nodes_expanded={entry.get('nodes_expanded')}"
+              f"{' truncated' if entry.get('truncated') else ''}")
+        if args.profile:
+            for row in entry.get('profile', []):
+                print(f"    {row['cumulative_ms']:9.2f} ms cumulative  {row['calls']:>8} calls  {row['function']}")
+
+if __name__ == '__main__':
+    main()
@@ -15,15 +15,23 @@ $(document).ready(function() {
         },
         minLength: 2,
         select: function(event, ui) {
+            // Remember the selected player's ID so the search doesn't have to
+            // resolve the display label back to a name on the server
             $(this).val(ui.item.value);
+            $(this).data("player-id", ui.item.id);
             return false;
         }
     });
 
+    // Typing after a selection means the stored ID no longer matches the text
+    $(".player-autocomplete").on("input", function() {
+        $(this).removeData("player-id");
+    });
+
     // Clear button functionality
     $(".clear-btn").on("click", function() {
         const targetId = $(this).data("target");
-        $("#" + targetId).val("");
+        $("#" + targetId).val("").removeData("player-id");
     });
 
     // Form submission
@@ -32,6 +40,8 @@ $(document).ready(function() {
         
         const player1 = $("#player1").val().trim();
         const player2 = $("#player2").val().trim();
+        const player1_id = $("#player1").data("player-id") || null;
+        const player2_id = $("#player2").data("player-id") || null;
         
         if (!player1 || !player2) {
             showError("Please enter both player names");
@@ -43,31 +53,111 @@ $(document).ready(function() {
         $("#results").addClass("d-none");
         $("#error-message").addClass("d-none");
         
-        // Send the request to find connections
-        $.ajax({
-            url: "/api/find_connection",
-            type: "POST",
-            contentType: "application/json",
-            data: JSON.stringify({ player1, player2 }),
-            dataType: "json",
-            success: function(data) {
+        // Stream the connection: paths are rendered as soon as each one arrives
+        const paths = [];
+        const tables = { players: [], teams: [] };
+        let activeIndex = 0;
+        streamConnection({ player1, player2, player1_id, player2_id, format: "compact" }, function(message) {
+            if (message.type === "distance") {
+                // Sent before any path, so the degree shows while paths are still being found
                 $("#loading").addClass("d-none");
-                
-                if (data.success) {
-                    displayResults(data.paths, player1, player2);
-                } else {
-                    showError(data.error);
+                displayDistance(message.distance, player1, player2);
+            } else if (message.type === "path") {
+                $("#loading").addClass("d-none");
+                paths.push(decodeStreamedPath(message, tables));
+                displayResults(paths, player1, player2, false, activeIndex, index => { activeIndex = index; });
+            } else if (message.type === "done") {
+                $("#loading").addClass("d-none");
+                if (paths.length === 0) {
+                    showError(`No valid paths found between ${player1} and ${player2}`);
+                } else if (message.truncated) {
+                    displayResults(paths, player1, player2, true, activeIndex, index => { activeIndex = index; });
                 }
-            },
-            error: function(xhr) {
+            } else if (message.type === "error") {
                 $("#loading").addClass("d-none");
-                showError("Error connecting to server. Please try again.");
+                showError(message.error);
             }
+        }).catch(function(error) {
+            $("#loading").addClass("d-none");
+            showError(error.message || "Error connecting to server. Please try again.");
         });
     });
 
+    // Expand a compact path ({players, links} index arrays) using the player
+    // and team-season tables; each stream message adds its new table entries
+    function decodeStreamedPath(message, tables) {
+        if (message.path.nodes) {
+            // Already in the full format
+            return message.path;
+        }
+        tables.players.push(...(message.players || []));
+        tables.teams.push(...(message.teams || []));
+        return decodeCompactPath(message.path, tables.players, tables.teams);
+    }
+
+    function decodeCompactPath(path, players, teams) {
+        const nodes = path.players.map(index => ({ id: players[index][0], name: players[index][1] }));
+        const connections = path.links.map((link, i) => ({
+            from: nodes[i].name,
+            to: nodes[i + 1].name,
+            details: link.map(index => ({ season: teams[index][0], team: teams[index][1] }))
+        }));
+        return { nodes, connections, length: nodes.length - 1 };
+    }
+
+    // POST to the streaming endpoint and call onMessage for each NDJSON line
+    async function streamConnection(payload, onMessage) {
+        const response = await fetch("/api/find_connection/stream", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(payload)
+        });
+        
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.error || "Error connecting to server. Please try again.");
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Handle every complete line; keep any partial line for the next chunk
+            let newline;
+            while ((newline = buffer.indexOf("\n")) >= 0) {
+                const line = buffer.slice(0, newline).trim();
+                buffer = buffer.slice(newline + 1);
+                if (line) {
+                    onMessage(JSON.parse(line));
+                }
+            }
+        }
+        
+        if (buffer.trim()) {
+            onMessage(JSON.parse(buffer));
+        }
+    }
+
+    // Show how many links separate the players, with an empty results pane for the paths to come
+    function displayDistance(distance, player1, player2) {
+        $("#path-selector").empty();
+        $("#connection-summary").html(`
+            <h5>${player1} and ${player2} are connected through ${distance} link${distance > 1 ? 's' : ''}.</h5>
+        `);
+        $("#path-display").html(`<p class="text-muted">Finding paths...</p>`);
+        $("#results").removeClass("d-none");
+    }
+
     // Function to display the results
-    function displayResults(paths, player1, player2) {
+    // activeIndex selects the path to show; onSelect is told when the user picks another
+    function displayResults(paths, player1, player2, truncated, activeIndex = 0, onSelect = null) {
         if (!paths || paths.length === 0) {
             showError("No connection found between these players");
             return;
@@ -80,7 +170,7 @@ $(document).ready(function() {
         if (paths.length > 1) {
             pathSelector.append(`<span class="me-2">Paths:</span>`);
             paths.forEach((path, index) => {
-                const activeClass = index === 0 ? "active" : "";
+                const activeClass = index === activeIndex ? "active" : "";
                 pathSelector.append(`
                     <button type="button" class="btn btn-outline-primary btn-sm path-button ${activeClass}" 
                             data-path-index="${index}">
@@ -95,10 +185,11 @@ $(document).ready(function() {
         $("#connection-summary").html(`
             <h5>${player1} and ${player2} are connected through ${firstPath.length} link${firstPath.length > 1 ? 's' : ''}.</h5>
             ${paths.length > 1 ? `<p class="text-muted">Found ${paths.length} different paths with the same number of links.</p>` : ''}
+            ${truncated ? `<p class="text-warning">The search was stopped early, so these are only the paths found so far.</p>` : ''}
         `);
         
-        // Display the first path
-        displayPath(paths[0]);
+        // Display the selected path
+        displayPath(paths[activeIndex]);
         
         // Add click handlers for path buttons
         $(".path-button").on("click", function() {
@@ -106,6 +197,9 @@ $(document).ready(function() {
             $(".path-button").removeClass("active");
             $(this).addClass("active");
             displayPath(paths[pathIndex]);
+            if (onSelect) {
+                onSelect(pathIndex);
+            }
         });
         
         // Show results
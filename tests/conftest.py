@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules are scripts at the top of the repository, not an installed package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
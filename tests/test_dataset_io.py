@@ -0,0 +1,91 @@
+"""Round trips through dataset_io's formats, with projections and filters."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_io import DatasetWriter, dataset_columns, iter_dataset, read_dataset, write_dataset
+
+@pytest.fixture
+def squads():
+    return pd.DataFrame({
+        'PlayerName': ['Ann Lee', 'Bo Kim', None, 'Cy Dunn', 'Ann Lee', 'Dee Ray'],
+        'Season': ['2018-2019', '2019-2020', '2019-2020', '2020-2021', '2020-2021', '2019-2020'],
+        'LeagueName': ['Premier', 'Premier', 'Liga', 'Liga', 'Premier', 'Liga'],
+        'Number': [7, 9, 1, 10, 7, 4],
+        'Height': [1.8, 1.75, np.nan, 1.9, 1.8, 1.7],
+    })
+
+def assert_same(actual, expected):
+    expected = expected.reset_index(drop=True)
+    expected = expected.astype(object).where(expected.notna(), None)
+    actual = actual.astype(object).where(actual.notna(), None)
+    assert actual.to_dict('records') == expected.to_dict('records')
+
+@pytest.fixture(params=['csv', 'npz', 'parquet'])
+def extension(request):
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    return request.param
+
+def test_round_trip(squads, extension, tmp_path):
+    path = tmp_path / f"squads.{extension}"
+    write_dataset(squads, path)
+    assert dataset_columns(path) == squads.columns.tolist()
+    assert_same(read_dataset(path), squads)
+
+def test_projection_and_filters(squads, extension, tmp_path):
+    path = tmp_path / f"squads.{extension}"
+    write_dataset(squads, path)
+    df = read_dataset(path, columns=['PlayerName', 'Number'],
+                      filters={'Season': ['2019-2020', '2020-2021'], 'LeagueName': ['Liga']})
+    assert df.columns.tolist() == ['PlayerName', 'Number']
+    expected = squads[squads.Season.isin(['2019-2020', '2020-2021']) & (squads.LeagueName == 'Liga')]
+    assert_same(df, expected[['PlayerName', 'Number']])
+
+def test_filter_on_numeric_column(squads, extension, tmp_path):
+    path = tmp_path / f"squads.{extension}"
+    write_dataset(squads, path)
+    assert_same(read_dataset(path, filters={'Number': [7]}), squads[squads.Number == 7])
+
+def test_filter_matching_nothing(squads, extension, tmp_path):
+    path = tmp_path / f"squads.{extension}"
+    write_dataset(squads, path)
+    df = read_dataset(path, columns=['PlayerName'], filters={'Season': ['1999-2000']})
+    assert len(df) == 0
+    assert df.columns.tolist() == ['PlayerName']
+
+def test_chunked_write_and_read(squads, extension, tmp_path):
+    path = tmp_path / f"squads.{extension}"
+    with DatasetWriter(path) as writer:
+        for start in range(0, len(squads), 4):
+            writer.write(squads.iloc[start:start + 4])
+    assert writer.rows == len(squads)
+    chunks = list(iter_dataset(path, chunksize=4))
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+    assert_same(read_dataset(path, nrows=5), squads.iloc[:5])
+
+def test_npz_column_that_turns_out_to_hold_strings(tmp_path):
+    path = tmp_path / "mixed.npz"
+    with DatasetWriter(path) as writer:
+        writer.write(pd.DataFrame({'Number': [1, 2]}))
+        writer.write(pd.DataFrame({'Number': ['3a', None]}))
+    df = read_dataset(path)
+    assert df.Number.tolist()[:3] == ['1', '2', '3a']
+    assert pd.isna(df.Number[3])
+
+def test_npz_categorical(squads, tmp_path):
+    path = tmp_path / "squads.npz"
+    write_dataset(squads, path)
+    df = read_dataset(path, categorical=True, chunksize=4)
+    assert df.LeagueName.dtype == 'category'
+    assert df.LeagueName.astype(str).tolist() == squads.LeagueName.tolist()
+
+def test_unknown_extension(squads, tmp_path):
+    with pytest.raises(ValueError):
+        write_dataset(squads, tmp_path / "squads.xlsx")
+
+def test_unknown_column(squads, extension, tmp_path):
+    path = tmp_path / f"squads.{extension}"
+    write_dataset(squads, path)
+    with pytest.raises(ValueError):
+        read_dataset(path, columns=['Club'])
@@ -0,0 +1,63 @@
+"""Graph files written by save_graph and read back by load_graph."""
+import pickle
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import player_connections as pc
+
+@pytest.fixture
+def graph():
+    G = nx.Graph()
+    G.add_node(3, name='Mesut Özil "&" Isolated', uuid='c')
+    for u, v in [(1000, 2000), (2000, 4000), (1000, 4000)]:
+        G.add_node(u, name=f"Player {u}", uuid=str(u))
+        G.add_node(v, name=f"Player {v}", uuid=str(v))
+        G.add_edge(u, v, details=f'["2019-2020|Team {u}"]')
+    return pc.PlayerGraph.from_networkx(G)
+
+def assert_same_graph(loaded, G):
+    assert type(loaded) is pc.PlayerGraph
+    assert vars(loaded).keys() == vars(G).keys()
+    for key, value in vars(G).items():
+        if isinstance(value, np.ndarray):
+            assert np.array_equal(getattr(loaded, key), value), key
+        else:
+            assert getattr(loaded, key) == value, key
+
+@pytest.mark.parametrize('use_pickle', [True, False])
+def test_round_trip(tmp_path, graph, use_pickle):
+    filename = tmp_path / "player_graph.gml"
+    pc.save_graph(graph, filename, use_pickle=use_pickle)
+    assert_same_graph(pc.load_graph(filename, use_pickle=use_pickle), graph)
+
+def test_loads_snapshot_of_pickled_graph(tmp_path):
+    G = nx.path_graph(4)
+    nx.set_node_attributes(G, {node: str(node) for node in G}, 'uuid')
+    filename = tmp_path / "player_graph.gml"
+    with open(pc.pickle_path(filename), 'wb') as f:
+        pickle.dump(G, f)
+    loaded = pc.load_graph(filename, use_pickle=True)
+    assert loaded.number_of_edges() == 3
+    assert [loaded.teammates(node).tolist() for node in loaded] == [[1], [0, 2], [1, 3], [2]]
+
+def test_old_snapshot_format_needs_rebuild(tmp_path):
+    filename = tmp_path / "player_graph.gml"
+    with open(pc.pickle_path(filename), 'wb') as f:
+        pickle.dump({'snapshot': 1}, f)
+    with pytest.raises(ValueError, match='--rebuild'):
+        pc.load_graph(filename, use_pickle=True)
+
+def test_loads_gml_keyed_by_uuid(tmp_path):
+    # GML files from before integer node IDs: UUID labels, no 'uuid' attribute
+    G = nx.Graph()
+    G.add_nodes_from([('a', {'name': 'A'}), ('b', {'name': 'B'}), ('c', {'name': 'C'})])
+    G.add_edge('a', 'b', details='["2019-2020|Team X"]')
+    filename = tmp_path / "player_graph.gml"
+    nx.write_gml(G, filename)
+    loaded = pc.load_graph(filename)
+    assert loaded.uuids == [None, 'a', 'b', 'c']
+    assert loaded.names == [None, 'A', 'B', 'C']
+    assert loaded.shared_team_seasons(1, 2) == [('2019-2020', 'Team X')]
+    assert loaded.degree(3) == 0
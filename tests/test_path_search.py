@@ -0,0 +1,83 @@
+"""Bidirectional shortest path search and SearchBudget, checked against networkx."""
+import itertools
+
+import networkx as nx
+import pytest
+
+from player_connections import (PlayerGraph, SearchBudget, count_shortest_paths, find_shortest_paths,
+                                search_shortest_paths)
+
+GRAPHS = [
+    nx.gnp_random_graph(40, 0.08, seed=1),
+    nx.gnp_random_graph(60, 0.04, seed=2),
+    nx.convert_node_labels_to_integers(nx.grid_2d_graph(4, 5)),
+    # Two components
+    nx.disjoint_union(nx.cycle_graph(7), nx.complete_graph(4)),
+]
+
+@pytest.mark.parametrize('G', GRAPHS)
+def test_paths_match_networkx(G):
+    graph = PlayerGraph.from_networkx(G)
+    for source, target in itertools.combinations(G, 2):
+        distance, paths = search_shortest_paths(graph, source, target)
+        if not nx.has_path(G, source, target):
+            assert distance is None
+            assert list(paths) == []
+            assert count_shortest_paths(graph, source, target) == (None, None)
+            continue
+        expected = sorted(nx.all_shortest_paths(G, source, target))
+        assert distance == len(expected[0]) - 1
+        assert sorted(paths) == expected
+        assert count_shortest_paths(graph, source, target) == (distance, len(expected))
+
+def test_same_node():
+    G = PlayerGraph.from_networkx(nx.path_graph(3))
+    distance, paths = search_shortest_paths(G, 1, 1)
+    assert (distance, list(paths)) == (0, [[1]])
+    assert count_shortest_paths(G, 1, 1) == (0, 1)
+
+def test_find_shortest_paths_caps_paths():
+    G = PlayerGraph.from_networkx(nx.convert_node_labels_to_integers(nx.grid_2d_graph(4, 4), ordering='sorted'))
+    result = find_shortest_paths(G, 0, 15, max_paths=5)
+    assert result['distance'] == 6
+    assert len(result['paths']) == 5
+    assert all(len(path) == 7 for path in result['paths'])
+    assert not result['truncated']
+
+def test_expansion_limit_stops_the_search():
+    G = PlayerGraph.from_networkx(nx.path_graph(50))
+    budget = SearchBudget(max_expansions=10)
+    distance, paths = search_shortest_paths(G, 0, 49, budget)
+    assert distance is None
+    assert list(paths) == []
+    assert budget.exhausted
+    assert budget.expansions == 10
+
+    result = find_shortest_paths(G, 0, 49, budget=SearchBudget(max_expansions=10))
+    assert result['truncated']
+    assert result['paths'] == []
+
+def test_expansion_limit_large_enough():
+    G = PlayerGraph.from_networkx(nx.path_graph(50))
+    budget = SearchBudget(max_expansions=60)
+    distance, paths = search_shortest_paths(G, 0, 49, budget)
+    assert distance == 49
+    assert list(paths) == [list(range(50))]
+    assert not budget.exhausted
+
+def test_budget_running_out_while_enumerating():
+    # 20 choose 10 shortest paths across the grid; the search itself is cheap
+    G = PlayerGraph.from_networkx(nx.convert_node_labels_to_integers(nx.grid_2d_graph(11, 11), ordering='sorted'))
+    unlimited = SearchBudget()
+    search_shortest_paths(G, 0, 120, unlimited)
+    budget = SearchBudget(max_expansions=unlimited.expansions + 25)
+    result = find_shortest_paths(G, 0, 120, max_paths=1000, budget=budget)
+    assert result['distance'] == 20
+    assert len(result['paths']) == 25
+    assert result['truncated']
+
+def test_time_limit():
+    budget = SearchBudget(time_limit=1e-9)
+    assert not budget.spend()
+    assert budget.exhausted
+    assert SearchBudget(time_limit=60).spend()
@@ -0,0 +1,143 @@
+"""PlayerGraph, unique_sorted and intersect_sorted, checked against brute force and networkx over a small graph."""
+import itertools
+import json
+import random
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from player_connections import PlayerGraph, build_graph, intersect_sorted, unique_sorted, write_gml
+
+def squad_graph(squads, nodes=()):
+    """A networkx player graph as build_graph used to make it, from {(season, team): [node IDs]}"""
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    details = {}
+    for (season, team), players in squads.items():
+        G.add_nodes_from(players)
+        for u, v in itertools.combinations(players, 2):
+            G.add_edge(u, v)
+            details.setdefault((min(u, v), max(u, v)), []).append(f"{season}|{team}")
+    for u, v in G.edges():
+        G[u][v]['details'] = json.dumps(details[(min(u, v), max(u, v))])
+    return G
+
+@pytest.fixture
+def squads():
+    rng = random.Random(5)
+    squads = {}
+    for season in ['2018-2019', '2019-2020', '2020-2021']:
+        for team in ['Ajax (Eredivisie)', 'Celtic (Premiership)', 'Porto (Liga)']:
+            squads[(season, team)] = sorted(rng.sample(range(0, 60, 2), 8))
+    # A squad of one has no edges, so no roster
+    squads[('2020-2021', 'Lone FC')] = [61]
+    return squads
+
+@pytest.fixture
+def index(squads):
+    # Node 99 has no teammates at all
+    return PlayerGraph.from_networkx(squad_graph(squads, nodes=[99]))
+
+def test_intersect_sorted_matches_sets():
+    rng = np.random.default_rng(0)
+    for small, large in [(0, 10), (3, 1000), (50, 60), (200, 200), (1000, 3)]:
+        a = np.sort(rng.choice(5000, small, replace=False))
+        b = np.sort(rng.choice(5000, large, replace=False))
+        result = intersect_sorted(a, b)
+        assert result.tolist() == sorted(set(a.tolist()) & set(b.tolist()))
+
+def test_unique_sorted_matches_numpy():
+    rng = np.random.default_rng(1)
+    for size in [0, 1, 7, 1000]:
+        values = rng.integers(-50, 50, size)
+        assert unique_sorted(values).tolist() == np.unique(values).tolist()
+
+def test_intersect_sorted_past_the_end():
+    assert intersect_sorted(np.array([1, 99]), np.arange(40)).tolist() == [1]
+
+def test_teammates(squads, index):
+    G = squad_graph(squads, nodes=[99])
+    for node in list(G) + [1, 1000, -1]:
+        expected = sorted(G[node]) if node in G else []
+        assert index.teammates(node).tolist() == expected
+
+def test_rosters(squads, index):
+    numbered = sorted(key for key, players in squads.items() if len(players) > 1)
+    assert index.team_seasons == numbered
+    for number, key in enumerate(index.team_seasons):
+        assert index.roster(number).tolist() == squads[key]
+    assert index.roster(len(numbered)).tolist() == []
+
+def test_player_seasons_and_shared_seasons(squads, index):
+    numbers = {key: number for number, key in enumerate(index.team_seasons)}
+    seasons = {}
+    for key, players in squads.items():
+        if key in numbers:
+            for node in players:
+                seasons.setdefault(node, set()).add(numbers[key])
+    for node in range(62):
+        assert index.player_seasons(node).tolist() == sorted(seasons.get(node, ()))
+    for u, v in itertools.combinations(range(0, 60, 2), 2):
+        shared = sorted(seasons.get(u, set()) & seasons.get(v, set()))
+        assert index.shared_seasons(u, v).tolist() == shared
+
+def test_common_teammates(squads, index):
+    G = squad_graph(squads, nodes=[99])
+    for u, v in itertools.combinations(G, 2):
+        assert index.common_teammates(u, v).tolist() == sorted(nx.common_neighbors(G, u, v))
+
+def test_find_team_seasons(index):
+    celtic = index.find_team_seasons(' celtic ')
+    assert [index.team_seasons[n] for n in celtic] == [
+        (season, 'Celtic (Premiership)') for season in ['2018-2019', '2019-2020', '2020-2021']]
+    assert index.find_team_seasons('Celtic (Premiership)', season='2019-2020') == [
+        index.team_seasons.index(('2019-2020', 'Celtic (Premiership)'))]
+    assert index.find_team_seasons('Lone FC') == []
+    assert index.find_team_seasons('Rangers') == []
+
+def test_empty_graph():
+    index = PlayerGraph.from_networkx(nx.Graph())
+    assert index.teammates(0).tolist() == []
+    assert index.team_seasons == []
+    assert len(index) == index.number_of_edges() == 0
+
+def test_distances_and_components(squads, index):
+    G = squad_graph(squads, nodes=[99])
+    for source in [0, 61, 99]:
+        dist = index.distances_from(source)
+        assert {node: int(dist[node]) for node in G if dist[node] >= 0} == \
+            nx.single_source_shortest_path_length(G, source)
+    assert np.flatnonzero(index.distances_from(0, cutoff=1) >= 0).tolist() == sorted([0, *G[0]])
+    labels = index.component_labels()
+    components = {frozenset(np.flatnonzero(labels == label).tolist()) for label in set(labels.tolist()) - {-1}}
+    assert components == {frozenset(c) for c in nx.connected_components(G)}
+
+def test_gml_reads_as_the_networkx_graph(tmp_path, squads, index):
+    filename = tmp_path / 'player_graph.gml'
+    write_gml(index, filename)
+    G = nx.read_gml(filename)
+    expected = squad_graph(squads, nodes=[99])
+    assert sorted(int(node) for node in G) == sorted(expected)
+    for u, v, details in expected.edges(data='details'):
+        assert sorted(json.loads(G[str(u)][str(v)]['details'])) == sorted(json.loads(details))
+    assert G.number_of_edges() == expected.number_of_edges()
+
+def test_build_graph(tmp_path, squads):
+    rows = [{'Name': f"Player {node}", 'team': team.split(' (')[0], 'Season': season,
+             'LeagueName': team.split(' (')[1].rstrip(')') if ' (' in team else None,
+             'enhanced_player_id': f"uuid-{node}"}
+            for (season, team), players in squads.items() for node in players]
+    csv_file = tmp_path / 'squads.csv'
+    pd.DataFrame(rows).to_csv(csv_file, index=False)
+    G = build_graph(str(csv_file))
+    expected = squad_graph(squads)
+    assert len(G) == expected.number_of_nodes()
+    assert G.number_of_edges() == expected.number_of_edges()
+    node = {G.uuids[n]: n for n in G}
+    for u, v, details in expected.edges(data='details'):
+        shared = sorted(tuple(entry.split('|')) for entry in json.loads(details))
+        assert G.shared_team_seasons(node[f"uuid-{u}"], node[f"uuid-{v}"]) == shared
+        assert G.name(node[f"uuid-{u}"]) == f"Player {u}"
+    assert G.degree(node['uuid-61']) == 0
@@ -0,0 +1,120 @@
+"""Crawls of the fixture site: resuming after a crash, and compacting changed pages."""
+import csv
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+from conftest import ROOT
+from fixture_server import FixtureServer, build_site
+from scrape_footballsquads import Checkpoint, is_historical
+
+# Seasons ending last year, this year and next year: one finished, two current
+FIRST_SEASON = datetime.now().year - 2
+
+@pytest.fixture
+def site():
+    pages, rows = build_site(countries=1, leagues_per_country=1, teams_per_league=3, seasons=3,
+                             first_season=FIRST_SEASON, squad_size=6, seed=0)
+    server = FixtureServer(("127.0.0.1", 0), pages)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.rows = rows
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def scrape(site, output, *args):
+    """Run the scraper against the fixture site; returns the rows it left in output"""
+    command = [sys.executable, os.path.join(ROOT, "scrape_footballsquads.py"), "--base-url", site.base_url,
+               "-o", str(output), "--rate", "1000", "--parse-workers", "1", "--no-cache", *args]
+    subprocess.run(command, check=True, capture_output=True, cwd=output.parent)
+    with open(output, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+def checkpoint_lines(output):
+    with open(f"{output}.checkpoint", encoding="utf-8") as f:
+        return f.readlines()
+
+def change_page(site, path):
+    """Drop the last player from a team page, giving it new content under the same URL"""
+    page = site.pages[path].decode("utf-8")
+    last_row = page.rindex("<tr>")
+    site.pages[path] = (page[:last_row] + page[page.index("</tr>", last_row) + len("</tr>"):]).encode("utf-8")
+    site.etags[path] = f'"changed-{path}"'
+
+def test_is_historical():
+    assert is_historical("http://x/eng/2001-2002/engprem/arsenal.htm", current_year=2026)
+    assert not is_historical("http://x/eng/2025-2026/engprem/arsenal.htm", current_year=2026)
+    assert not is_historical("http://x/archive.htm", current_year=2026)
+
+def test_fresh_crawl_writes_every_row(site, tmp_path):
+    rows = scrape(site, tmp_path / "out.csv")
+    assert len(rows) - 1 == site.rows
+    checkpoint = Checkpoint(f"{tmp_path / 'out.csv'}.checkpoint").load()
+    assert checkpoint.rows == site.rows
+    assert checkpoint.offset == os.path.getsize(tmp_path / "out.csv")
+
+def test_resume_after_crash(site, tmp_path):
+    output = tmp_path / "out.csv"
+    complete = scrape(site, output)
+
+    # A run that died part way: a few entries checkpointed, rows written past
+    # the last entry, and a torn checkpoint line
+    lines = checkpoint_lines(output)
+    kept = lines[:4]
+    offset = json.loads(kept[-1])["offset"]
+    with open(output, "r+b") as f:
+        f.truncate(offset + 40)
+    with open(f"{output}.checkpoint", "w", encoding="utf-8") as f:
+        f.writelines(kept)
+        f.write('{"kind": "team", "url": "http://torn')
+
+    resumed = scrape(site, output)
+    assert resumed[0] == complete[0]
+    assert sorted(resumed[1:]) == sorted(complete[1:])
+    # The torn line is gone, so the next run sees every entry
+    entries = [json.loads(line) for line in checkpoint_lines(output)]
+    assert entries[:3] == [json.loads(line) for line in kept[:3]]
+    assert Checkpoint(f"{output}.checkpoint").load().rows == site.rows
+
+def test_rerun_skips_finished_pages(site, tmp_path):
+    output = tmp_path / "out.csv"
+    first = scrape(site, output)
+    requests = site.requests
+    second = scrape(site, output)
+    assert second == first
+    # Only the archive, the current leagues and their teams are fetched again
+    historical = [path for path in site.pages if is_historical(site.base_url + path)]
+    assert site.requests - requests == len(site.pages) - len(historical)
+
+def test_changed_page_is_compacted(site, tmp_path):
+    output = tmp_path / "out.csv"
+    before = scrape(site, output)
+    header = before[0]
+    url_column = header.index("TeamURL")
+    current = sorted(path for path in site.pages
+                     if path.count("/") == 4 and not is_historical(site.base_url + path))
+    changed_url = site.base_url + current[0]
+    change_page(site, current[0])
+
+    after = scrape(site, output)
+    old_rows = [row for row in before[1:] if row[url_column] == changed_url]
+    new_rows = [row for row in after[1:] if row[url_column] == changed_url]
+    assert len(new_rows) == len(old_rows) - 1
+    assert sorted(new_rows) == sorted(old_rows[:-1])
+    # Every other page's rows are untouched, and none are duplicated
+    others = lambda rows: sorted(row for row in rows[1:] if row[url_column] != changed_url)
+    assert others(after) == others(before)
+
+    # The rewritten checkpoint matches the compacted CSV, so another run changes nothing
+    checkpoint = Checkpoint(f"{output}.checkpoint").load()
+    assert checkpoint.rows == len(after) - 1
+    first_row, count = checkpoint.spans[changed_url]
+    assert [row[url_column] for row in after[1 + first_row:1 + first_row + count]] == [changed_url] * count
+    assert scrape(site, output) == after